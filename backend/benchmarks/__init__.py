@@ -0,0 +1,2 @@
+# Smart Irrigation System (SIS) Benchmarks
+# Run benchmarks from the backend directory, e.g. python -m benchmarks.decision_engine
@@ -0,0 +1,300 @@
+"""
+Load benchmark for the REST API
+Starts the API under gunicorn against a stub weather server and a stand-in MongoDB
+(in-memory mongomock by default, or a real server with --mongodb-uri), seeds irrigation
+logs, then drives the decision, history, CSV export and crop endpoints at several
+concurrency levels. Reports p50/p95/p99 latency, throughput and server RSS per endpoint
+and level, and saves the results as JSON to compare between commits.
+
+--server asgi runs the ASGI entry point on uvicorn workers instead of sync threads. To
+see the difference under upstream latency, disable the weather cache so every decision
+waits on the stub weather API:
+
+    python -m benchmarks.api_load --endpoints decision --concurrency 64 --weather-latency 0.2 \
+        --no-weather-cache --server wsgi
+    python -m benchmarks.api_load --endpoints decision --concurrency 64 --weather-latency 0.2 \
+        --no-weather-cache --server asgi --compare benchmarks/results/api_load_<wsgi run>.json
+
+Usage:
+    python -m benchmarks.api_load [--concurrency 1 8 32] [--duration 10] [--seed-logs 2000]
+    python -m benchmarks.api_load --mongodb-uri mongodb://localhost:27017/sis_bench --workers 4
+    python -m benchmarks.api_load --compare benchmarks/results/api_load_<earlier>.json
+
+The in-memory stand-in needs the packages in benchmarks/requirements.txt. RSS is read
+from /proc and is only reported on Linux.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import requests
+
+from benchmarks.stub_weather_server import start_stub_server
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'results')
+
+DECISION_BODY = {'crop_type': 'rice', 'soil_type': 'Red Soil', 'latitude': 11.0, 'longitude': 78.0}
+
+# Endpoint name -> (method, path, JSON body)
+ENDPOINTS = {
+    'decision': ('POST', '/api/irrigation/decision/', DECISION_BODY),
+    'history': ('GET', '/api/irrigation/history/?limit=50', None),
+    'export_csv': ('GET', '/api/irrigation/export-csv/', None),
+    'crops': ('GET', '/api/crops/', None),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def process_tree_rss(pid):
+    """Resident memory in MB of a process and its direct children (Linux only)"""
+    pids = [pid]
+    try:
+        for entry in os.listdir('/proc'):
+            if entry.isdigit():
+                with open(f'/proc/{entry}/stat') as stat:
+                    # ppid is the 4th field, after the parenthesised command name
+                    if int(stat.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        pids.append(int(entry))
+    except OSError:
+        return None
+
+    total_kb = 0
+    for process_id in pids:
+        try:
+            with open(f'/proc/{process_id}/status') as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+        except OSError:
+            continue
+    return round(total_kb / 1024, 1)
+
+
+def start_server(args, weather_base_url, spill_dir):
+    """Starts gunicorn and waits until the API answers"""
+    port = free_port()
+    env = dict(
+        os.environ,
+        API_REQUIRE_AUTH='False',
+        DEBUG='False',
+        OPENWEATHERMAP_API_KEY='stub',
+        OPENWEATHERMAP_BASE_URL=weather_base_url,
+        LOG_WRITE_SPILL_PATH=os.path.join(spill_dir, 'irrigation_logs.spill.jsonl'),
+        WEATHER_CACHE_ENABLED=str(args.weather_cache),
+    )
+    if args.mongodb_uri:
+        env['MONGODB_URI'] = args.mongodb_uri
+        application = f'sis.{args.server}:application'
+        workers = args.workers
+    else:
+        application = f'benchmarks.mock_mongo_{args.server}:application'
+        workers = 1  # each worker would get its own in-memory database
+
+    if args.server == 'asgi':
+        worker_options = ['--worker-class', 'uvicorn.workers.UvicornWorker']
+    else:
+        worker_options = ['--threads', str(args.threads)]
+    process = subprocess.Popen(
+        [
+            sys.executable, '-m', 'gunicorn', application,
+            '--bind', f'127.0.0.1:{port}',
+            '--workers', str(workers),
+            *worker_options,
+            '--log-level', 'warning',
+        ],
+        cwd=BACKEND_DIR,
+        env=env
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("gunicorn exited during startup")
+        try:
+            # The first request loads the catalogue and can take a few seconds
+            requests.get(f'{base_url}/api/crops/', timeout=10)
+            return process, base_url
+        except (requests.ConnectionError, requests.Timeout):
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("gunicorn did not start within 30 seconds")
+
+
+def seed_logs(base_url, count):
+    """Creates irrigation logs through the batch endpoint"""
+    session = requests.Session()
+    for start in range(0, count, 500):
+        fields = [
+            dict(DECISION_BODY, latitude=10.0 + (start + index) % 100 * 0.01)
+            for index in range(min(500, count - start))
+        ]
+        session.post(f'{base_url}/api/irrigation/decisions/batch/', json={'fields': fields}).raise_for_status()
+
+
+def run_level(base_url, endpoint, concurrency, duration, warmup):
+    """
+    Sends requests to one endpoint from concurrency threads for duration seconds
+
+    Returns:
+        dict: requests, errors, throughput and latency percentiles in milliseconds
+    """
+    method, path, body = ENDPOINTS[endpoint]
+    url = base_url + path
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    start_barrier = threading.Barrier(concurrency + 1)
+    stop_at = [float('inf')]  # set once every client has warmed up
+
+    def worker(index):
+        session = requests.Session()
+        for _ in range(warmup):
+            session.request(method, url, json=body).content
+        start_barrier.wait()
+        while time.perf_counter() < stop_at[0]:
+            started = time.perf_counter()
+            try:
+                response = session.request(method, url, json=body)
+                response.content  # read streamed bodies completely
+                if response.status_code >= 400:
+                    errors[index] += 1
+            except requests.RequestException:
+                errors[index] += 1
+            latencies[index].append((time.perf_counter() - started) * 1000)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    started = time.perf_counter()
+    stop_at[0] = started + duration
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    all_latencies = np.concatenate([np.array(values) for values in latencies]) if any(latencies) else np.array([])
+    p50, p95, p99 = np.percentile(all_latencies, [50, 95, 99]) if all_latencies.size else (None, None, None)
+    return {
+        'endpoint': endpoint,
+        'concurrency': concurrency,
+        'requests': int(all_latencies.size),
+        'errors': sum(errors),
+        'throughput_rps': round(all_latencies.size / elapsed, 1),
+        'p50_ms': round(float(p50), 2) if p50 is not None else None,
+        'p95_ms': round(float(p95), 2) if p95 is not None else None,
+        'p99_ms': round(float(p99), 2) if p99 is not None else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def print_results(results, baseline=None):
+    baseline_by_key = {
+        (result['endpoint'], result['concurrency']): result for result in (baseline or {}).get('results', [])
+    }
+    header = f"{'endpoint':<12} {'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'rss MB':>8}"
+    if baseline:
+        header += f" {'d req/s':>9} {'d p95':>8}"
+    print(header)
+    for result in results:
+        line = (f"{result['endpoint']:<12} {result['concurrency']:>5} {result['throughput_rps']:>9.1f} "
+                f"{result['p50_ms'] or 0:>9.2f} {result['p95_ms'] or 0:>9.2f} {result['p99_ms'] or 0:>9.2f} "
+                f"{result['errors']:>7} {result['rss_mb'] or 0:>8.1f}")
+        previous = baseline_by_key.get((result['endpoint'], result['concurrency']))
+        if previous and previous['throughput_rps'] and previous['p95_ms']:
+            throughput_change = (result['throughput_rps'] / previous['throughput_rps'] - 1) * 100
+            p95_change = (result['p95_ms'] / previous['p95_ms'] - 1) * 100
+            line += f" {throughput_change:>+8.1f}% {p95_change:>+7.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--endpoints', nargs='+', choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds per endpoint and level")
+    parser.add_argument('--warmup', type=int, default=5, help="Unmeasured requests per client thread")
+    parser.add_argument('--seed-logs', type=int, default=2000, help="Irrigation logs created before measuring")
+    parser.add_argument('--weather-latency', type=float, default=0.05, help="Stub weather API latency in seconds")
+    parser.add_argument('--no-weather-cache', dest='weather_cache', action='store_false',
+                        help="Call the stub weather API on every decision")
+    parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi',
+                        help="Sync gunicorn threads (wsgi) or uvicorn workers (asgi)")
+    parser.add_argument('--mongodb-uri', help="Use this MongoDB instead of the in-memory stand-in")
+    parser.add_argument('--workers', type=int, default=2, help="gunicorn workers (real MongoDB only)")
+    parser.add_argument('--threads', type=int, default=8, help="gunicorn threads per worker (wsgi only)")
+    parser.add_argument('--output', help="Results file (default: benchmarks/results/api_load_<time>_<commit>.json)")
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    weather_server = start_stub_server(latency=args.weather_latency)
+    with tempfile.TemporaryDirectory() as spill_dir:
+        server, base_url = start_server(args, weather_server.base_url, spill_dir)
+        try:
+            seed_logs(base_url, args.seed_logs)
+            results = []
+            for endpoint in args.endpoints:
+                for concurrency in args.concurrency:
+                    result = run_level(base_url, endpoint, concurrency, args.duration, args.warmup)
+                    result['rss_mb'] = process_tree_rss(server.pid)
+                    results.append(result)
+                    print(f"  {endpoint} x{concurrency}: {result['throughput_rps']} req/s, p95 {result['p95_ms']} ms",
+                          file=sys.stderr)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+            weather_server.shutdown()
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'created': datetime.datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {
+            key: value for key, value in vars(args).items() if key not in ('output', 'compare')
+        } | {'mongodb': 'external' if args.mongodb_uri else 'mongomock'},
+        'results': results,
+    }
+    report['config'].pop('mongodb_uri')
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+        output = os.path.join(RESULTS_DIR, f'api_load_{stamp}_{commit}.json')
+    with open(output, 'w') as results_file:
+        json.dump(report, results_file, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        print(f"Compared with {baseline.get('commit')} ({baseline.get('created')})")
+    print_results(results, baseline)
+    print(f"Saved results to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark for the batch decision engine
+Compares the per-row scalar decision engine (compiling the rules on every call), the
+precompiled rules evaluated row by row, alone and behind a warm decision cache, and the
+vectorized batch engine, and checks that all produce identical decisions
+
+Usage:
+    python -m benchmarks.decision_engine [--sizes 10000 1000000] [--seed 42]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from sis.core.utils.batch_engine import (
+    CropTable, SoilTable, calculate_irrigation_decisions, decisions_to_dicts
+)
+from sis.core.utils.crop_database import DEFAULT_CROPS, DEFAULT_SOILS
+from sis.core.utils.decision_cache import DecisionCache
+from sis.core.utils.decision_engine import calculate_irrigation_decision
+from sis.core.utils.decision_rules import apply_crop_rules
+
+
+def generate_zones(size, seed):
+    """Generates random field zone inputs in the same ranges as the sensor simulator"""
+    rng = np.random.default_rng(seed)
+    return {
+        'crop_index': rng.integers(0, len(DEFAULT_CROPS), size),
+        'soil_index': rng.integers(0, len(DEFAULT_SOILS), size),
+        'soil_moisture': np.round(rng.uniform(30.0, 90.0, size), 1),
+        'temperature': np.round(rng.uniform(15.0, 40.0, size), 1),
+        'rain_probability': rng.choice([0.0, 20.0, 30.0, 40.0, 50.0, 70.0, 80.0, 90.0], size)
+    }
+
+
+def run_scalar(crops, soils, zones, crop_table=None, decision_cache=None):
+    """
+    Evaluates every zone with the scalar decision engine, or with the rules precompiled in
+    crop_table (optionally memoized)
+    """
+    decisions = []
+    for crop_position, soil_position, moisture, temperature, rain in zip(
+        zones['crop_index'].tolist(),
+        zones['soil_index'].tolist(),
+        zones['soil_moisture'].tolist(),
+        zones['temperature'].tolist(),
+        zones['rain_probability'].tolist()
+    ):
+        sensor_data = {'soil_moisture': moisture, 'temperature': temperature, 'humidity': 60.0}
+        weather_data = {'temperature': temperature, 'humidity': 60.0, 'rain_probability': rain}
+        if decision_cache is not None:
+            decisions.append(decision_cache.decide(
+                'benchmark', crop_table.crop_rules[crop_position], soils[soil_position], sensor_data, weather_data
+            ))
+        elif crop_table is not None:
+            decisions.append(apply_crop_rules(
+                crop_table.crop_rules[crop_position], soils[soil_position]['absorption_rate'],
+                moisture, temperature, rain
+            ))
+        else:
+            decisions.append(calculate_irrigation_decision(
+                crop_data=crops[crop_position],
+                soil_data=soils[soil_position],
+                sensor_data=sensor_data,
+                weather_data=weather_data
+            ))
+    return decisions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 1_000_000])
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    crops = [dict(data, name=name) for name, data in DEFAULT_CROPS.items()]
+    soils = [dict(data, name=name) for name, data in DEFAULT_SOILS.items()]
+    crop_table = CropTable(crops)
+    soil_table = SoilTable(soils)
+
+    print(f"{'zones':>10} {'scalar (s)':>12} {'compiled (s)':>13} {'cached (s)':>12} {'hit rate':>9} "
+          f"{'batch (s)':>12} {'speedup':>9} {'identical':>10}")
+    for size in args.sizes:
+        zones = generate_zones(size, args.seed)
+
+        start = time.perf_counter()
+        scalar_decisions = run_scalar(crops, soils, zones)
+        scalar_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        compiled_decisions = run_scalar(crops, soils, zones, crop_table)
+        compiled_seconds = time.perf_counter() - start
+
+        # Warm the cache with a first pass, then time a pass over the same zones
+        decision_cache = DecisionCache(max_entries=size)
+        run_scalar(crops, soils, zones, crop_table, decision_cache)
+        warm_hits = decision_cache.stats()['hits']
+        start = time.perf_counter()
+        cached_decisions = run_scalar(crops, soils, zones, crop_table, decision_cache)
+        cached_seconds = time.perf_counter() - start
+        hit_rate = (decision_cache.stats()['hits'] - warm_hits) / size
+
+        start = time.perf_counter()
+        batch_arrays = calculate_irrigation_decisions(crop_table, soil_table, **zones)
+        batch_seconds = time.perf_counter() - start
+
+        identical = (
+            decisions_to_dicts(batch_arrays) == scalar_decisions == compiled_decisions == cached_decisions
+        )
+        print(f"{size:>10} {scalar_seconds:>12.4f} {compiled_seconds:>13.4f} {cached_seconds:>12.4f} "
+              f"{hit_rate:>8.0%} {batch_seconds:>12.4f} {scalar_seconds / batch_seconds:>8.1f}x {str(identical):>10}")
+
+if __name__ == '__main__':
+    main()
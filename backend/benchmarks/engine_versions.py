@@ -0,0 +1,240 @@
+"""
+Parity properties and throughput of every decision engine version
+For each version in decision_engine.ENGINE_VERSIONS, generates random field zones (plus zones
+on every rule threshold) and checks these properties:
+    - reference: decisions equal a plain reference implementation of the version
+    - paths: the dict API, the precompiled rules and the batch engine agree row by row
+    - bounds: non-negative water, duration within the version's bounds, a valid status,
+      the version recorded as engine_version
+    - monotonic: less soil moisture, a lower absorption rate or a lower rain probability
+      never decrease the water amount
+Then measures the cost per decision of each path. Exits with status 1 when a property is
+violated, after printing counterexamples.
+
+Usage:
+    python -m benchmarks.engine_versions [--cases 100000] [--calls 20000] [--seed 42]
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from sis.core.utils.batch_engine import CropTable, SoilTable, calculate_irrigation_decisions, decisions_to_dicts
+from sis.core.utils.crop_database import DEFAULT_CROPS, DEFAULT_SOILS
+from sis.core.utils.decision_engine import ENGINE_VERSIONS, calculate_irrigation_decision
+from sis.core.utils.decision_rules import RULE_SETS, STATUS_LABELS, apply_crop_rules
+
+
+def reference_proportional(crop_data, soil_data, soil_moisture, temperature, rain_probability):
+    """Reference implementation of proportional-1, the rules of the original decision engine"""
+    moisture_min, moisture_max = crop_data['ideal_moisture']
+    water_amount = crop_data['base_water_lph']
+    if soil_moisture < moisture_min:
+        water_amount *= 1.0 + min((moisture_min - soil_moisture) / moisture_min, 0.5)
+    elif soil_moisture > moisture_max:
+        water_amount *= max(0.5, 1.0 - (soil_moisture - moisture_max) / moisture_max)
+    if temperature > crop_data['ideal_temp'][1]:
+        water_amount *= 1.0 + min((temperature - crop_data['ideal_temp'][1]) / 10, 0.3)
+    if rain_probability > 60.0:
+        water_amount *= 0.5
+    water_amount /= soil_data['absorption_rate']
+    duration = 2.0 * (1.0 + max(0, (moisture_min - soil_moisture) / moisture_min))
+    duration = max(0.5, min(duration, 4.0))
+    if rain_probability > 80.0:
+        status = 'Pending'
+    elif soil_moisture > moisture_max * 1.2:
+        status = 'Cancelled'
+    else:
+        status = 'Active'
+    return {'water_amount': round(water_amount, 2), 'duration': round(duration, 1), 'status': status}
+
+
+def reference_simplified(crop_data, soil_data, soil_moisture, temperature, rain_probability):
+    """Reference implementation of simplified-1, the rules of the original API engine"""
+    moisture_min, moisture_max = crop_data['ideal_moisture']
+    water_amount = crop_data['base_water_lph']
+    if soil_moisture < moisture_min:
+        water_amount *= 1.2
+    elif soil_moisture > moisture_max:
+        water_amount *= 0.8
+    if temperature > crop_data['ideal_temp'][1]:
+        water_amount *= 1.1
+    if rain_probability > 60.0:
+        water_amount *= 0.5
+    water_amount /= soil_data['absorption_rate']
+    duration = 3.0 if soil_moisture < moisture_min else 2.0
+    if rain_probability > 80.0:
+        status = 'Pending'
+    elif soil_moisture > moisture_max * 1.2:
+        status = 'Cancelled'
+    else:
+        status = 'Active'
+    return {'water_amount': round(water_amount, 2), 'duration': round(duration, 1), 'status': status}
+
+
+REFERENCES = {
+    'proportional-1': reference_proportional,
+    'simplified-1': reference_simplified
+}
+
+
+def generate_cases(crops, soils, size, seed):
+    """
+    Generates random zones over and beyond the sensor ranges, half of them rounded to 0.1
+    like probe readings, with a share placed exactly on the crop thresholds of the rules
+    """
+    rng = np.random.default_rng(seed)
+    crop_index = rng.integers(0, len(crops), size)
+    soil_index = rng.integers(0, len(soils), size)
+    soil_moisture = rng.uniform(0.0, 120.0, size)
+    temperature = rng.uniform(-5.0, 50.0, size)
+    rain_probability = rng.uniform(0.0, 100.0, size)
+    rounded = rng.random(size) < 0.5
+    for values in (soil_moisture, temperature, rain_probability):
+        values[rounded] = np.round(values[rounded], 1)
+
+    moisture_min = np.array([crop['ideal_moisture'][0] for crop in crops])[crop_index]
+    moisture_max = np.array([crop['ideal_moisture'][1] for crop in crops])[crop_index]
+    temp_max = np.array([crop['ideal_temp'][1] for crop in crops])[crop_index]
+    edges = rng.integers(0, 8, size)
+    on_edge = rng.random(size) < 0.2
+    moisture_edges = np.choose(edges % 4, [moisture_min, moisture_max, moisture_max * 1.2, moisture_min * 0.5])
+    soil_moisture = np.where(on_edge, moisture_edges, soil_moisture)
+    temperature = np.where(on_edge & (edges < 4), temp_max + (edges % 4) * 1.0, temperature)
+    rain_probability = np.where(on_edge & (edges >= 4), np.choose(edges % 2, [60.0, 80.0]), rain_probability)
+    return {
+        'crop_index': crop_index,
+        'soil_index': soil_index,
+        'soil_moisture': soil_moisture,
+        'temperature': temperature,
+        'rain_probability': rain_probability
+    }
+
+
+def zone_rows(cases):
+    return zip(
+        cases['crop_index'].tolist(),
+        cases['soil_index'].tolist(),
+        cases['soil_moisture'].tolist(),
+        cases['temperature'].tolist(),
+        cases['rain_probability'].tolist()
+    )
+
+
+def check_properties(version, crops, soils, crop_table, soil_table, cases):
+    """Returns {property: [counterexample, ...]} for the cases"""
+    rules = RULE_SETS[version]
+    reference = REFERENCES.get(version)
+    violations = {'reference': [], 'paths': [], 'bounds': [], 'monotonic': []}
+    batch = decisions_to_dicts(calculate_irrigation_decisions(crop_table, soil_table, **cases))
+    duration_min = rules['duration']['min'] if rules['duration']['min'] is not None else 0.0
+    duration_max = rules['duration']['max'] if rules['duration']['max'] is not None else np.inf
+
+    for row, (crop_position, soil_position, moisture, temperature, rain) in enumerate(zone_rows(cases)):
+        crop, soil = crops[crop_position], soils[soil_position]
+        case = (crop['name'], soil['name'], moisture, temperature, rain)
+        compiled = apply_crop_rules(crop_table.crop_rules[crop_position], soil['absorption_rate'],
+                                    moisture, temperature, rain)
+        dict_api = calculate_irrigation_decision(
+            crop_data=crop,
+            soil_data=soil,
+            sensor_data={'soil_moisture': moisture, 'temperature': temperature, 'humidity': 60.0},
+            weather_data={'temperature': temperature, 'humidity': 60.0, 'rain_probability': rain},
+            engine_version=version
+        )
+
+        if reference is not None:
+            expected = dict(reference(crop, soil, moisture, temperature, rain), engine_version=version)
+            if compiled != expected:
+                violations['reference'].append((case, compiled, expected))
+        if not dict_api == compiled == batch[row]:
+            violations['paths'].append((case, dict_api, compiled, batch[row]))
+        if (compiled['water_amount'] < 0 or not duration_min <= compiled['duration'] <= duration_max
+                or compiled['status'] not in STATUS_LABELS or compiled['engine_version'] != version):
+            violations['bounds'].append((case, compiled))
+
+        # Each input moved in the direction that must not decrease the water amount
+        for changed in (
+            (soil['absorption_rate'] * 0.9, max(moisture - 5.0, 0.0), temperature, rain),
+            (soil['absorption_rate'], moisture, temperature, max(rain - 30.0, 0.0))
+        ):
+            other = apply_crop_rules(crop_table.crop_rules[crop_position], *changed)
+            if other['water_amount'] < compiled['water_amount']:
+                violations['monotonic'].append((case, changed, compiled, other))
+    return violations
+
+
+def measure(version, crops, soils, crop_table, soil_table, cases, calls):
+    """Returns the cost per decision in microseconds of each path"""
+    rows = list(zone_rows({key: values[:calls] for key, values in cases.items()}))
+    reference = REFERENCES.get(version)
+    costs = {}
+
+    start = time.perf_counter()
+    for crop_position, soil_position, moisture, temperature, rain in rows:
+        calculate_irrigation_decision(
+            crop_data=crops[crop_position],
+            soil_data=soils[soil_position],
+            sensor_data={'soil_moisture': moisture, 'temperature': temperature, 'humidity': 60.0},
+            weather_data={'temperature': temperature, 'humidity': 60.0, 'rain_probability': rain},
+            engine_version=version
+        )
+    costs['dict API'] = (time.perf_counter() - start) / len(rows) * 1e6
+
+    crop_rules = crop_table.crop_rules
+    absorption_rates = [soil['absorption_rate'] for soil in soils]
+    start = time.perf_counter()
+    for crop_position, soil_position, moisture, temperature, rain in rows:
+        apply_crop_rules(crop_rules[crop_position], absorption_rates[soil_position], moisture, temperature, rain)
+    costs['compiled'] = (time.perf_counter() - start) / len(rows) * 1e6
+
+    start = time.perf_counter()
+    calculate_irrigation_decisions(crop_table, soil_table, **cases)
+    costs['batch'] = (time.perf_counter() - start) / len(cases['crop_index']) * 1e6
+
+    if reference is not None:
+        start = time.perf_counter()
+        for crop_position, soil_position, moisture, temperature, rain in rows:
+            reference(crops[crop_position], soils[soil_position], moisture, temperature, rain)
+        costs['reference'] = (time.perf_counter() - start) / len(rows) * 1e6
+    return costs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cases', type=int, default=100_000, help="Zones checked per version")
+    parser.add_argument('--calls', type=int, default=20_000, help="Scalar calls timed per path")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    crops = [dict(data, name=name) for name, data in DEFAULT_CROPS.items()]
+    soils = [dict(data, name=name) for name, data in DEFAULT_SOILS.items()]
+    soil_table = SoilTable(soils)
+    cases = generate_cases(crops, soils, args.cases, args.seed)
+
+    failed = False
+    print(f"{'version':>16} {'reference':>10} {'paths':>6} {'bounds':>7} {'monotonic':>10} "
+          f"{'dict API (us)':>14} {'compiled (us)':>14} {'batch (us)':>11} {'reference (us)':>15}")
+    for version in ENGINE_VERSIONS:
+        crop_table = CropTable(crops, RULE_SETS[version])
+        violations = check_properties(version, crops, soils, crop_table, soil_table, cases)
+        costs = measure(version, crops, soils, crop_table, soil_table, cases, args.calls)
+
+        results = {
+            name: 'n/a' if name == 'reference' and version not in REFERENCES else ('ok' if not found else len(found))
+            for name, found in violations.items()
+        }
+        print(f"{version:>16} {results['reference']:>10} {results['paths']:>6} {results['bounds']:>7} "
+              f"{results['monotonic']:>10} {costs['dict API']:>14.2f} {costs['compiled']:>14.2f} "
+              f"{costs['batch']:>11.3f} {costs.get('reference', float('nan')):>15.2f}")
+        for name, found in violations.items():
+            for counterexample in found[:3]:
+                failed = True
+                print(f"    {name} violated: {counterexample}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Micro-benchmark for irrigation history serialization
+Compares the per-row cost of the old read path (MongoEngine documents, hand-copied
+into nested dicts, DRF JSONRenderer) with the raw projection path (projected raw
+documents, FastJSONRenderer). Cursor I/O is excluded: both paths start from the raw
+documents a PyMongo cursor would return.
+
+Usage:
+    python -m benchmarks.history_serialization [--sizes 50 1000 10000] [--repeat 5]
+"""
+import argparse
+import copy
+import datetime
+import os
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sis.settings')
+django.setup()
+
+from bson import ObjectId  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from sis.core.models import IrrigationLog  # noqa: E402
+from sis.core.renderers import FastJSONRenderer  # noqa: E402
+from sis.core.utils.serializers import history_entries  # noqa: E402
+
+
+def generate_raw_logs(size):
+    """Generates raw irrigation log documents as stored in MongoDB"""
+    now = datetime.datetime.utcnow()
+    return [
+        {
+            '_id': ObjectId(),
+            'timestamp': now - datetime.timedelta(minutes=index),
+            'user': 'guest',
+            'crop_type': 'rice',
+            'soil_type': 'Red Soil',
+            'latitude': 10.0 + index * 1e-4,
+            'longitude': 20.0,
+            'sensor_data': {'soil_moisture': 61.2, 'temperature': 27.4, 'humidity': 70.1},
+            'weather_data': {'temperature': 26.0, 'humidity': 65.0, 'rain_probability': 20.0},
+            'decision': {'water_amount': 1.92, 'duration': 2.1, 'status': 'Active'}
+        }
+        for index in range(size)
+    ]
+
+
+def serialize_documents(raw_logs):
+    """Old read path: build MongoEngine documents and copy every field by hand"""
+    history = []
+    for log in (IrrigationLog._from_son(raw_log) for raw_log in raw_logs):
+        history.append({
+            'id': str(log.id),
+            'timestamp': log.timestamp.isoformat(),
+            'user': log.user,
+            'crop_type': log.crop_type,
+            'soil_type': log.soil_type,
+            'latitude': log.latitude,
+            'longitude': log.longitude,
+            'sensor_data': {
+                'soil_moisture': log.sensor_data.soil_moisture,
+                'temperature': log.sensor_data.temperature,
+                'humidity': log.sensor_data.humidity
+            },
+            'weather_data': {
+                'temperature': log.weather_data.temperature,
+                'humidity': log.weather_data.humidity,
+                'rain_probability': log.weather_data.rain_probability
+            },
+            'decision': {
+                'water_amount': log.decision.water_amount,
+                'duration': log.decision.duration,
+                'status': log.decision.status
+            }
+        })
+    return JSONRenderer().render({'history': history})
+
+
+def serialize_raw(raw_logs):
+    """Raw projection path: projected documents already have the response shape"""
+    return FastJSONRenderer().render({'history': history_entries(raw_logs)})
+
+
+def time_per_row(serialize, raw_logs, repeat):
+    """Returns the best per-row time in microseconds over repeat runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        rows = copy.deepcopy(raw_logs)  # history_entries converts in place
+        start = time.perf_counter()
+        serialize(rows)
+        best = min(best, time.perf_counter() - start)
+    return best / len(raw_logs) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 1_000, 10_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'documents (us/row)':>20} {'raw (us/row)':>14} {'speedup':>9}")
+    for size in args.sizes:
+        raw_logs = generate_raw_logs(size)
+        before = time_per_row(serialize_documents, raw_logs, args.repeat)
+        after = time_per_row(serialize_raw, raw_logs, args.repeat)
+        print(f"{size:>8} {before:>20.2f} {after:>14.2f} {before / after:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark for the forecast-aware irrigation scheduler
+Plans a synthetic farm of fields spread over many forecast grid cells and reports the
+time spent building the hourly forecast grid, planning and building plan documents
+(everything the plan_irrigation command does besides MongoDB and the weather API)
+
+Usage:
+    python -m benchmarks.irrigation_planner [--fields 50000] [--cells 500] [--horizon 48]
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sis.settings')
+django.setup()
+
+import numpy as np  # noqa: E402
+
+from benchmarks.stub_weather_server import forecast_response  # noqa: E402
+from sis.core.utils.batch_engine import CropTable, SoilTable  # noqa: E402
+from sis.core.utils.crop_database import DEFAULT_CROPS, DEFAULT_SOILS  # noqa: E402
+from sis.core.utils.scheduler import ForecastGrid, plan_irrigation, plans_to_documents  # noqa: E402
+from sis.core.utils.weather_api import FALLBACK_WEATHER, parse_forecast_response  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fields', type=int, default=50_000)
+    parser.add_argument('--cells', type=int, default=500, help="Forecast grid cells the fields are spread over")
+    parser.add_argument('--horizon', type=int, default=48, help="Planning horizon in hours")
+    parser.add_argument('--batch-size', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    crop_table = CropTable(dict(data, name=name) for name, data in DEFAULT_CROPS.items())
+    soil_table = SoilTable(dict(data, name=name) for name, data in DEFAULT_SOILS.items())
+    field_ids = [f"field-{index:06d}" for index in range(args.fields)]
+    crop_index = rng.integers(0, len(crop_table.names), args.fields)
+    soil_index = rng.integers(0, len(soil_table.names), args.fields)
+    cell_index = rng.integers(0, args.cells, args.fields)
+    soil_moisture = np.round(rng.uniform(30.0, 90.0, args.fields), 1)
+    forecasts = [parse_forecast_response(forecast_response(cell)) for cell in range(args.cells)]
+
+    planned_at = datetime.utcnow().replace(microsecond=0)
+    start = time.perf_counter()
+    grid = ForecastGrid(forecasts, planned_at, args.horizon, FALLBACK_WEATHER)
+    grid_seconds = time.perf_counter() - start
+
+    plan_seconds = documents_seconds = 0.0
+    scheduled = 0
+    for offset in range(0, args.fields, args.batch_size):
+        batch = slice(offset, offset + args.batch_size)
+
+        start = time.perf_counter()
+        plans = plan_irrigation(
+            crop_table, soil_table, crop_index[batch], soil_index[batch], cell_index[batch],
+            soil_moisture[batch], grid
+        )
+        plan_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        plans_to_documents(
+            plans, field_ids[batch], soil_moisture[batch], ['simulated'] * len(field_ids[batch]), grid, planned_at
+        )
+        documents_seconds += time.perf_counter() - start
+        scheduled += int(plans['needed'].sum())
+
+    total = grid_seconds + plan_seconds + documents_seconds
+    print(f"{args.fields} fields, {args.cells} grid cells, {args.horizon} hour horizon: {scheduled} scheduled")
+    print(f"  forecast grid   {grid_seconds:>8.3f} s")
+    print(f"  planning        {plan_seconds:>8.3f} s")
+    print(f"  documents       {documents_seconds:>8.3f} s")
+    print(f"  total           {total:>8.3f} s  ({args.fields / total:,.0f} fields/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+"""
+ASGI entry point backed by an in-memory mongomock database
+The ASGI counterpart of mock_mongo_wsgi. motor cannot talk to mongomock, so the async
+views run their pymongo calls in worker threads (MONGODB_ASYNC_DRIVER=thread). Run a
+single worker, every worker process has its own database.
+Requires the packages in benchmarks/requirements.txt.
+
+Usage:
+    gunicorn benchmarks.mock_mongo_asgi:application -k uvicorn.workers.UvicornWorker --workers 1
+"""
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sis.settings')
+os.environ['ASYNC_VIEWS_ENABLED'] = 'True'
+os.environ['MONGODB_ASYNC_DRIVER'] = 'thread'
+django.setup()
+
+import mongoengine  # noqa: E402
+import mongomock  # noqa: E402
+
+# Settings connected to MONGODB_URI lazily; nothing has used that connection yet
+mongoengine.disconnect()
+mongoengine.connect('irrigation_system', host='mongodb://localhost', mongo_client_class=mongomock.MongoClient)
+
+from sis.asgi import application  # noqa: E402,F401
@@ -0,0 +1,25 @@
+"""
+WSGI entry point backed by an in-memory mongomock database
+Lets the API load benchmark run without a MongoDB server. Every worker process has its
+own database, so run a single worker (use threads for concurrency). mongomock is not
+built for concurrent access, so treat occasional fallbacks under load as stand-in noise.
+Requires the packages in benchmarks/requirements.txt.
+
+Usage:
+    gunicorn benchmarks.mock_mongo_wsgi:application --workers 1 --threads 8
+"""
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sis.settings')
+django.setup()
+
+import mongoengine  # noqa: E402
+import mongomock  # noqa: E402
+
+# Settings connected to MONGODB_URI lazily; nothing has used that connection yet
+mongoengine.disconnect()
+mongoengine.connect('irrigation_system', host='mongodb://localhost', mongo_client_class=mongomock.MongoClient)
+
+from sis.wsgi import application  # noqa: E402,F401
@@ -0,0 +1,114 @@
+"""
+Scaling benchmark for the recompute_decisions worker pool
+Runs the per-batch work of a recompute worker (decisions, log documents and their BSON
+encoding, i.e. everything but the MongoDB round trips) on synthetic shards with an
+increasing number of worker processes, and reports throughput and parallel efficiency
+
+Usage:
+    python -m benchmarks.recompute_scaling [--fields 200000] [--workers 1 2 4 8]
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sis.settings')
+django.setup()
+
+import bson  # noqa: E402
+import numpy as np  # noqa: E402
+
+from sis.core.management.commands.recompute_decisions import recompute_fields, weather_cell  # noqa: E402
+from sis.core.utils.catalogue import Catalogue  # noqa: E402
+from sis.core.utils.crop_database import DEFAULT_CROPS, DEFAULT_SOILS  # noqa: E402
+
+CATALOGUE = Catalogue(
+    [dict(data, name=name) for name, data in DEFAULT_CROPS.items()],
+    [dict(data, name=name) for name, data in DEFAULT_SOILS.items()],
+    version=None
+)
+
+
+def synthetic_fields(shard, size, seed):
+    """Generates the fields of one shard, with probe readings for about half of them"""
+    rng = np.random.default_rng(seed + shard)
+    crops = list(DEFAULT_CROPS)
+    soils = list(DEFAULT_SOILS)
+    fields = [
+        {
+            'field_id': f"field-{shard:04d}-{index:06d}",
+            'user': 'benchmark',
+            'crop_type': crops[crop],
+            'soil_type': soils[soil],
+            'latitude': round(float(latitude), 5),
+            'longitude': round(float(longitude), 5)
+        }
+        for index, (crop, soil, latitude, longitude) in enumerate(zip(
+            rng.integers(0, len(crops), size).tolist(),
+            rng.integers(0, len(soils), size).tolist(),
+            rng.uniform(10.0, 12.0, size).tolist(),
+            rng.uniform(77.0, 79.0, size).tolist()
+        ))
+    ]
+    sensor_by_field = {
+        field['field_id']: {'soil_moisture': moisture, 'temperature': 28.0, 'humidity': 60.0}
+        for field, moisture in zip(fields[::2], np.round(rng.uniform(30.0, 90.0, len(fields[::2])), 1).tolist())
+    }
+    return fields, sensor_by_field
+
+
+def run_shard(shard, size, batch_size, seed):
+    """Recomputes one synthetic shard in batches; returns the number of decisions"""
+    fields, sensor_by_field = synthetic_fields(shard, size, seed)
+    weather_by_cell = {
+        weather_cell(field['latitude'], field['longitude']): {
+            'temperature': 30.0, 'humidity': 55.0, 'rain_probability': 20.0
+        }
+        for field in fields
+    }
+    timestamp = datetime.utcnow()
+    count = 0
+    for offset in range(0, len(fields), batch_size):
+        documents = recompute_fields(
+            fields[offset:offset + batch_size], sensor_by_field, weather_by_cell, CATALOGUE, 'benchmark', timestamp
+        )
+        # What insert_many would send to MongoDB
+        for document in documents:
+            bson.encode(document)
+        count += len(documents)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fields', type=int, default=200_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--shards-per-worker', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.fields} fields")
+    print(f"{'workers':>8} {'seconds':>9} {'fields/s':>10} {'speedup':>8} {'efficiency':>11}")
+    baseline = None
+    for workers in args.workers:
+        shards = workers * args.shards_per_worker
+        size = -(-args.fields // shards)
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+            count = sum(executor.map(
+                run_shard, range(shards), [size] * shards, [args.batch_size] * shards, [args.seed] * shards
+            ))
+        seconds = time.perf_counter() - start
+        rate = count / seconds
+        baseline = baseline or rate / workers if workers == args.workers[0] else baseline
+        speedup = rate / baseline
+        print(f"{workers:>8} {seconds:>9.2f} {rate:>10.0f} {speedup:>7.2f}x {speedup / workers:>10.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""
+Sensor replay for load generation and benchmarks
+Generates correlated sensor time series with FieldSimulator and either writes them to
+disk or replays them at a controlled rate against the ingestion and decision paths,
+in process (validation, latest-reading index and batch engine, no database) or over
+HTTP against a running server.
+
+Usage:
+    python -m benchmarks.sensor_replay generate --fields 10000 --steps 100 --output readings.ndjson.gz
+    python -m benchmarks.sensor_replay replay --fields 10000 --steps 100 --rate 50000
+    python -m benchmarks.sensor_replay replay --input readings.ndjson.gz --url http://127.0.0.1:8000/api \
+        --rate 5000 --decisions 100
+"""
+import argparse
+import gzip
+import itertools
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sis.settings')
+django.setup()
+
+import numpy as np  # noqa: E402
+
+from sis.core.utils.batch_engine import CropTable, SoilTable, calculate_irrigation_decisions  # noqa: E402
+from sis.core.utils.crop_database import DEFAULT_CROPS, DEFAULT_SOILS  # noqa: E402
+from sis.core.utils.sensor_readings import LatestReadings, validate_readings  # noqa: E402
+from sis.core.utils.sensor_simulator import FieldSimulator  # noqa: E402
+
+
+def read_ndjson(path):
+    """Yields readings from a JSON lines file written by generate"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as readings:
+        for line in readings:
+            if line.strip():
+                yield json.loads(line)
+
+
+def chunked(readings, size):
+    """Groups readings into lists of at most size"""
+    iterator = iter(readings)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class InProcessTarget:
+    """Ingestion and decision paths without HTTP or MongoDB"""
+
+    def __init__(self, decisions):
+        self.decisions = decisions
+        self.latest = LatestReadings(max_age=float('inf'))
+        crops = [dict(data, name=name) for name, data in DEFAULT_CROPS.items()]
+        soils = [dict(data, name=name) for name, data in DEFAULT_SOILS.items()]
+        self.crop_table = CropTable(crops)
+        self.soil_table = SoilTable(soils)
+
+    def send(self, batch):
+        documents, errors = validate_readings(batch)
+        self.latest.update(documents)
+        if self.decisions and documents:
+            sample = documents[:self.decisions]
+            size = len(sample)
+            calculate_irrigation_decisions(
+                self.crop_table,
+                self.soil_table,
+                crop_index=np.arange(size) % len(self.crop_table.names),
+                soil_index=np.arange(size) % len(self.soil_table.names),
+                soil_moisture=[reading['soil_moisture'] for reading in sample],
+                temperature=[reading['temperature'] for reading in sample],
+                rain_probability=np.zeros(size)
+            )
+        return len(errors)
+
+
+class HTTPTarget:
+    """Posts batches to a running server, optionally followed by a batch decision request"""
+
+    def __init__(self, url, decisions, latitude, longitude):
+        import requests
+
+        self.url = url.rstrip('/')
+        self.decisions = decisions
+        self.latitude = latitude
+        self.longitude = longitude
+        self.session = requests.Session()
+        self.crops = list(DEFAULT_CROPS)
+        self.soils = list(DEFAULT_SOILS)
+
+    def send(self, batch):
+        body = '\n'.join(json.dumps(reading, separators=(',', ':')) for reading in batch)
+        response = self.session.post(
+            f"{self.url}/sensors/readings/",
+            data=body.encode(),
+            headers={'Content-Type': 'application/x-ndjson'}
+        )
+        response.raise_for_status()
+        rejected = response.json()['rejected']
+
+        if self.decisions:
+            field_ids = sorted({
+                reading[0] if isinstance(reading, list) else reading['field_id'] for reading in batch
+            })[:self.decisions]
+            fields = [
+                {
+                    'field_id': field_id,
+                    'crop_type': self.crops[index % len(self.crops)],
+                    'soil_type': self.soils[index % len(self.soils)],
+                    'latitude': self.latitude,
+                    'longitude': self.longitude
+                }
+                for index, field_id in enumerate(field_ids)
+            ]
+            self.session.post(f"{self.url}/irrigation/decisions/batch/", json={'fields': fields}).raise_for_status()
+        return rejected
+
+
+def replay(readings, target, batch_size, rate):
+    """
+    Sends readings in batches, paced to rate readings per second (0 for unpaced)
+
+    Returns:
+        dict: sent, rejected, seconds and per-batch latencies in milliseconds
+    """
+    latencies = []
+    sent = rejected = 0
+    start = time.perf_counter()
+    for batch in chunked(readings, batch_size):
+        if rate:
+            delay = start + sent / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        batch_start = time.perf_counter()
+        rejected += target.send(batch)
+        latencies.append((time.perf_counter() - batch_start) * 1000)
+        sent += len(batch)
+    return {'sent': sent, 'rejected': rejected, 'seconds': time.perf_counter() - start, 'latencies': latencies}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate = subparsers.add_parser('generate', help="Write simulated readings to a JSON lines file")
+    generate.add_argument('--output', required=True, help="Output path, gzip-compressed if it ends in .gz")
+
+    replay_parser = subparsers.add_parser('replay', help="Replay readings against the ingestion path")
+    replay_parser.add_argument('--input', help="JSON lines file from generate (default: simulate live)")
+    replay_parser.add_argument('--url', help="API base URL, e.g. http://127.0.0.1:8000/api (default: in process)")
+    replay_parser.add_argument('--rate', type=float, default=0, help="Readings per second (0: as fast as possible)")
+    replay_parser.add_argument('--batch-size', type=int, default=5000)
+    replay_parser.add_argument('--decisions', type=int, default=0,
+                               help="Fields to decide for after every batch (0: ingestion only)")
+
+    for subparser in (generate, replay_parser):
+        subparser.add_argument('--fields', type=int, default=10_000)
+        subparser.add_argument('--steps', type=int, default=100, help="Readings per field (30 s apart)")
+        subparser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    # End the series now, so the ingestion clock-skew check accepts every reading
+    start = datetime.utcnow() - timedelta(seconds=args.steps * 30.0)
+    simulator = FieldSimulator(args.fields, seed=args.seed, interval=30.0, start=start)
+    if args.command == 'generate':
+        start = time.perf_counter()
+        written = simulator.write_ndjson(args.output, args.steps)
+        print(f"Wrote {written} readings to {args.output} in {time.perf_counter() - start:.1f}s")
+        return
+
+    readings = read_ndjson(args.input) if args.input else simulator.readings(args.steps)
+    if args.url:
+        target = HTTPTarget(args.url, args.decisions, *simulator.latitude[:1], *simulator.longitude[:1])
+    else:
+        target = InProcessTarget(args.decisions)
+
+    result = replay(readings, target, args.batch_size, args.rate)
+    latencies = np.array(result['latencies'])
+    print(f"sent {result['sent']} readings ({result['rejected']} rejected) in {result['seconds']:.2f}s "
+          f"= {result['sent'] / result['seconds']:,.0f} readings/s")
+    if latencies.size:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"batch latency ms: p50 {p50:.1f}  p95 {p95:.1f}  p99 {p99:.1f}  max {latencies.max():.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Process startup profile
+Measures the cold start of the stages every process goes through, each in a fresh
+interpreter: Django setup (what every manage.py command pays), a management command,
+and a WSGI/ASGI worker boot up to the point where it can serve requests (URL conf and
+views imported). Also reports whether a MongoDB client and its monitor threads exist
+once a stage is done, and optionally the packages slowest to import (-X importtime).
+
+MongoDB points at an unreachable address by default, so a stage that connects eagerly
+shows up as extra threads (or stalls) instead of silently using a local server.
+
+Usage:
+    python -m benchmarks.startup_profile [--repeat 5] [--importtime 15]
+    python -m benchmarks.startup_profile --output before.json
+    python -m benchmarks.startup_profile --compare before.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Code run in the child interpreter for each stage; prints one JSON line
+STAGES = {
+    'setup': "import django; django.setup()",
+    'command': "from django.core import management; management.execute_from_command_line(['manage.py', 'check'])",
+    'wsgi': "import sis.wsgi; from django.urls import get_resolver; get_resolver().url_patterns",
+    'asgi': "import sis.asgi; from django.urls import get_resolver; get_resolver().url_patterns",
+}
+
+PROBE = """
+import json, os, sys, threading, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sis.settings')
+{stage}
+elapsed = time.perf_counter() - started
+from mongoengine import connection
+print(json.dumps({{
+    'seconds': elapsed,
+    'mongo_clients': len(connection._connections),
+    'threads': sorted(thread.name for thread in threading.enumerate()),
+    'modules': len(sys.modules),
+}}))
+"""
+
+
+def run_stage(stage, env, importtime=False):
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', PROBE.format(stage=STAGES[stage])]
+    completed = subprocess.run(command, cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=120)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{stage} failed:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def slowest_imports(importtime_output, count):
+    """Sums -X importtime self times by top-level package and returns the slowest ones"""
+    packages = {}
+    for line in importtime_output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_time, _, module = line[len('import time:'):].split('|')
+        package = module.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(self_time) / 1000
+    return sorted(((milliseconds, package) for package, milliseconds in packages.items()), reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--repeat', type=int, default=5, help="Fresh interpreters per stage")
+    parser.add_argument('--mongodb-uri', default='mongodb://10.255.255.1:27017/irrigation_system',
+                        help="MongoDB the processes are configured with (default: unreachable)")
+    parser.add_argument('--importtime', type=int, default=0, metavar='N',
+                        help="Show the N packages slowest to import during the worker boot")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as spill_dir:
+        env = dict(
+            os.environ,
+            MONGODB_URI=args.mongodb_uri,
+            LOG_WRITE_SPILL_PATH=os.path.join(spill_dir, 'irrigation_logs.spill.jsonl'),
+        )
+        # Warm the OS file cache and bytecode so every stage measures the same thing
+        run_stage('setup', env)
+
+        results = {}
+        for stage in args.stages:
+            runs = [run_stage(stage, env)[0] for _ in range(args.repeat)]
+            seconds = [run['seconds'] for run in runs]
+            results[stage] = {
+                'median_ms': round(statistics.median(seconds) * 1000, 1),
+                'min_ms': round(min(seconds) * 1000, 1),
+                'mongo_clients': runs[-1]['mongo_clients'],
+                'threads': runs[-1]['threads'],
+                'modules': runs[-1]['modules'],
+            }
+
+        importtime = None
+        if args.importtime:
+            _, output = run_stage('wsgi', env, importtime=True)
+            importtime = slowest_imports(output, args.importtime)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)['stages']
+
+    print(f"{'stage':<8} {'median ms':>10} {'min ms':>8} {'modules':>8} {'mongo clients':>14}  threads")
+    for stage, result in results.items():
+        line = (f"{stage:<8} {result['median_ms']:>10.1f} {result['min_ms']:>8.1f} {result['modules']:>8} "
+                f"{result['mongo_clients']:>14}  {', '.join(result['threads'])}")
+        previous = baseline.get(stage)
+        if previous:
+            line += f"  (was {previous['median_ms']:.1f} ms, {len(previous['threads'])} threads)"
+        print(line)
+
+    if importtime:
+        print("\nPackages slowest to import during the worker boot:")
+        for milliseconds, module in importtime:
+            print(f"  {milliseconds:>8.1f} ms  {module}")
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump({'stages': results, 'importtime': importtime}, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
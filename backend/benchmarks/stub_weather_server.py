@@ -0,0 +1,134 @@
+"""
+Stub OpenWeatherMap server for local testing and benchmarks
+Serves canned current-weather and 5 day / 3 hour forecast responses with configurable
+latency and failure rate
+
+Usage:
+    python -m benchmarks.stub_weather_server [--port 8099] [--latency 0.2] [--failure-rate 0.1]
+
+Point the backend at it with:
+    OPENWEATHERMAP_BASE_URL=http://127.0.0.1:8099/data/2.5 OPENWEATHERMAP_API_KEY=stub
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StubWeatherHandler(BaseHTTPRequestHandler):
+    """Answers /data/2.5/weather and /data/2.5/forecast with a deterministic response per coordinate"""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+    def do_GET(self):
+        server = self.server
+        with server.stats_lock:
+            server.request_count += 1
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        url = urlparse(self.path)
+        if not url.path.endswith(('/weather', '/forecast')):
+            self._send(404, {'cod': '404', 'message': 'not found'})
+            return
+        if server.failure_rate and random.random() < server.failure_rate:
+            self._send(503, {'cod': '503', 'message': 'stub failure'})
+            return
+
+        query = parse_qs(url.query)
+        latitude = float(query.get('lat', ['0'])[0])
+        longitude = float(query.get('lon', ['0'])[0])
+
+        # Derive stable weather from the coordinates
+        seed = int(abs(latitude * 1000) + abs(longitude * 1000))
+        if url.path.endswith('/forecast'):
+            self._send(200, forecast_response(seed))
+            return
+        weather_ids = [200, 300, 500, 701, 800, 801, 803]
+        self._send(200, {
+            'weather': [{'id': weather_ids[seed % len(weather_ids)]}],
+            'main': {'temp': 15.0 + seed % 20, 'humidity': 40 + seed % 50},
+            'clouds': {'all': seed % 100}
+        })
+
+    def _send(self, status_code, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def forecast_response(seed, steps=40):
+    """Builds a forecast of 3-hour steps from now, with a daily temperature cycle and rain spells"""
+    start = int(time.time()) // 10800 * 10800
+    forecast = []
+    for step in range(steps):
+        hour = (step * 3 + seed) % 24
+        raining = (step + seed) % 8 < 2
+        entry = {
+            'dt': start + step * 10800,
+            'main': {
+                'temp': 15.0 + seed % 15 + 8.0 * math.sin((hour - 9) / 24 * 2 * math.pi),
+                'humidity': 40 + (seed + step * 7) % 50
+            },
+            'pop': 0.8 if raining else 0.1
+        }
+        if raining:
+            entry['rain'] = {'3h': 1.0 + seed % 5}
+        forecast.append(entry)
+    return {'cod': '200', 'cnt': steps, 'list': forecast}
+
+
+def start_stub_server(port=0, latency=0.0, failure_rate=0.0):
+    """
+    Starts the stub server in a background thread
+
+    Args:
+        port (int): Port to listen on (0 picks a free port)
+        latency (float): Seconds to wait before answering each request
+        failure_rate (float): Fraction of requests answered with HTTP 503
+
+    Returns:
+        ThreadingHTTPServer: Running server; base_url holds the API base URL
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubWeatherHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.failure_rate = failure_rate
+    server.request_count = 0
+    server.stats_lock = threading.Lock()
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}/data/2.5"
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = start_stub_server(args.port, args.latency, args.failure_rate)
+    print(f"Stub weather server listening on {server.base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,10 @@
+"""
+pytest configuration for the backend: sets up Django so the test modules under
+sis/core/tests run with pytest as well as with manage.py test
+"""
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sis.settings')
+django.setup()
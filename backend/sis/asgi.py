@@ -0,0 +1,22 @@
+"""
+ASGI config for Smart Irrigation System project.
+
+Serves the async decision and history views. Run under uvicorn, e.g.
+    gunicorn sis.asgi:application -k uvicorn.workers.UvicornWorker --workers 4
+"""
+
+import os
+
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sis.settings')
+os.environ.setdefault('ASYNC_VIEWS_ENABLED', 'True')
+
+# Serves /static/ in place of WhiteNoise, which is sync-only
+application = ASGIStaticFilesHandler(get_asgi_application())
+
+# Start the irrigation log writer in each server process so spilled logs are replayed on startup
+from sis.core.utils.write_behind import start_log_writer  # noqa: E402
+
+start_log_writer()
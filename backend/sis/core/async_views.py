@@ -0,0 +1,231 @@
+"""
+Async API views for Smart Irrigation System
+Native async versions of the decision and history endpoints for the ASGI deployment
+(sis/asgi.py). The weather API call and MongoDB queries are awaited instead of blocking,
+so one worker can keep thousands of decisions in flight. Responses match the synchronous
+views in views.py, which remain in use under WSGI.
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime
+
+from bson import ObjectId
+from django.conf import settings
+from django.http import HttpResponse
+from django.views import View
+
+from .renderers import FastJSONRenderer
+from .utils.async_mongo import find
+from .utils.catalogue import get_catalogue
+from .utils.log_store import get_log_store, persist_irrigation_logs
+from .utils.metrics import DECISIONS, MONGO_FALLBACKS, stage
+from .utils.pagination import decode_cursor, keyset_query, page_cursors
+from .utils.sensor_readings import current_sensor_data
+from .utils.sensor_simulator import simulate_sensor_data
+from .utils.serializers import HISTORY_PROJECTION, history_entries
+from .utils.weather_api import FALLBACK_WEATHER, get_weather_data_async
+from .utils.write_behind import get_log_writer
+from .views import (
+    IRRIGATION_HISTORY, build_irrigation_log, decide_irrigation, parse_log_filters,
+    validate_decision_request
+)
+
+logger = logging.getLogger(__name__)
+
+_renderer = FastJSONRenderer()
+
+
+def json_response(data, status=200):
+    """Renders data like the DRF views do"""
+    return HttpResponse(_renderer.render(data), status=status, content_type='application/json')
+
+
+def error_response(message, status):
+    return json_response({"error": message}, status=status)
+
+
+def unexpected_error_response(e):
+    return json_response({"error": "An unexpected error occurred", "details": str(e)}, status=500)
+
+
+async def request_username(request):
+    user = await request.auser()
+    return user.username if user.is_authenticated else 'guest'
+
+
+class AsyncIrrigationDecisionView(View):
+    """
+    Async API view for making irrigation decisions
+    POST: Process inputs and return irrigation decision
+    """
+    http_method_names = ['post', 'options']
+
+    async def post(self, request):
+        try:
+            try:
+                data = json.loads(request.body or b'{}')
+            except ValueError:
+                return error_response("Request body must be valid JSON", 400)
+            if not isinstance(data, dict):
+                return error_response("Request body must be a JSON object", 400)
+
+            with stage('decision.validation'):
+                # Loads or refreshes the catalogue from MongoDB when it is missing or stale
+                catalogue = await asyncio.to_thread(get_catalogue)
+                latitude, longitude, error = validate_decision_request(data, catalogue)
+            if error:
+                return error_response(error, 400)
+
+            crop = catalogue.crops[data['crop_type']]
+            soil = catalogue.soils[data['soil_type']]
+
+            # Use the field's latest probe reading, or simulate sensor data without one;
+            # a lookup may fall through to MongoDB, so it runs in a worker thread
+            field_id = data.get('field_id')
+            with stage('decision.sensor'):
+                sensor_data = await asyncio.to_thread(current_sensor_data, field_id) if field_id else None
+                sensor_source = 'probe' if sensor_data else 'simulated'
+                if sensor_data is None:
+                    sensor_data = simulate_sensor_data()
+
+            # Get weather data or use fallback
+            with stage('decision.weather'):
+                try:
+                    weather_data = await get_weather_data_async(latitude, longitude)
+                except Exception as e:
+                    logger.error(f"Weather API error: {str(e)}")
+                    weather_data = dict(FALLBACK_WEATHER)
+
+            # Calculate irrigation decision
+            with stage('decision.decision'):
+                decision = decide_irrigation(
+                    catalogue=catalogue,
+                    crop_data=crop,
+                    soil_data=soil,
+                    sensor_data=sensor_data,
+                    weather_data=weather_data
+                )
+            DECISIONS.inc(status=decision['status'], endpoint='single', engine=decision['engine_version'])
+
+            # Create log entry
+            log_entry = {
+                'id': None,
+                'timestamp': datetime.now().isoformat(),
+                'user': await request_username(request),
+                'crop_type': data['crop_type'],
+                'soil_type': data['soil_type'],
+                'latitude': latitude,
+                'longitude': longitude,
+                'field_id': field_id,
+                'sensor_data': sensor_data,
+                'weather_data': weather_data,
+                'decision': decision
+            }
+
+            # Save to MongoDB, through the write-behind buffer when enabled; both can
+            # block (a full queue or the insert itself), so they run in a worker thread
+            with stage('decision.persist'):
+                try:
+                    irrigation_log = build_irrigation_log(
+                        user=log_entry['user'],
+                        crop_type=data['crop_type'],
+                        soil_type=data['soil_type'],
+                        latitude=latitude,
+                        longitude=longitude,
+                        sensor_data=sensor_data,
+                        weather_data=weather_data,
+                        decision=decision,
+                        field_id=field_id
+                    )
+                    irrigation_log.validate()
+                    document = irrigation_log.to_mongo().to_dict()
+                    document['_id'] = ObjectId()
+
+                    log_writer = get_log_writer()
+                    if log_writer is not None:
+                        await asyncio.to_thread(log_writer.submit, document)
+                    else:
+                        await asyncio.to_thread(persist_irrigation_logs, [document])
+
+                    # Use MongoDB ID for response
+                    log_entry['id'] = str(document['_id'])
+                except Exception as e:
+                    logger.error(f"Error saving to MongoDB: {str(e)}")
+                    MONGO_FALLBACKS.inc(operation='save')
+
+            # Add to history (numbered in memory if MongoDB did not assign an id)
+            log_entry['id'] = IRRIGATION_HISTORY.append(log_entry)
+
+            return json_response({
+                'id': log_entry['id'],
+                'timestamp': log_entry['timestamp'],
+                'field_id': field_id,
+                'sensor_data': sensor_data,
+                'sensor_source': sensor_source,
+                'weather_data': weather_data,
+                'decision': decision
+            }, status=201)
+
+        except Exception as e:
+            logger.error(f"Error processing irrigation decision: {str(e)}")
+            return unexpected_error_response(e)
+
+
+class AsyncIrrigationHistoryView(View):
+    """
+    Async API view for retrieving irrigation history
+    GET: Same parameters and response as IrrigationHistoryView
+    """
+    http_method_names = ['get', 'head', 'options']
+
+    async def get(self, request):
+        try:
+            try:
+                limit = int(request.GET.get('limit', 50))
+                if not 1 <= limit <= settings.HISTORY_MAX_PAGE_SIZE:
+                    raise ValueError()
+            except ValueError:
+                return error_response(f"limit must be between 1 and {settings.HISTORY_MAX_PAGE_SIZE}", 400)
+            try:
+                cursor = request.GET.get('cursor')
+                cursor = decode_cursor(cursor) if cursor else None
+                query, filters, start, end = parse_log_filters(request.GET)
+            except ValueError as e:
+                return error_response(str(e), 400)
+
+            # Try to get data from MongoDB first
+            try:
+                page_query, sort = keyset_query(query, cursor)
+                store = get_log_store()
+                with stage('history.query'):
+                    # The first call creates the time-series collection and its indexes
+                    collection = await asyncio.to_thread(store.collection)
+                    mongo_logs = await find(
+                        collection, store.query(page_query), store.projection(HISTORY_PROJECTION),
+                        sort=sort, limit=limit + 1
+                    )
+                mongo_logs, next_cursor, prev_cursor = page_cursors(mongo_logs, limit, cursor)
+                mongo_history = history_entries(mongo_logs)
+
+                # If we have MongoDB data (or are paging through it), use it
+                if mongo_history or cursor:
+                    return json_response({
+                        'history': mongo_history,
+                        'next': next_cursor,
+                        'prev': prev_cursor
+                    })
+            except Exception as e:
+                logger.error(f"Error retrieving from MongoDB: {str(e)}")
+                MONGO_FALLBACKS.inc(operation='history')
+
+            # Fall back to in-memory data (first page only, it holds recent logs)
+            return json_response({
+                'history': IRRIGATION_HISTORY.latest(limit, filters, start, end),
+                'next': None,
+                'prev': None
+            })
+
+        except Exception as e:
+            logger.error(f"Error retrieving irrigation history: {str(e)}")
+            return unexpected_error_response(e)
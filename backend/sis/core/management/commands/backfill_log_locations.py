@@ -0,0 +1,24 @@
+"""
+Management command to set the GeoJSON location of irrigation logs saved before it existed
+"""
+from django.core.management.base import BaseCommand
+
+from sis.core.models import IrrigationLog
+
+
+class Command(BaseCommand):
+    help = "Sets the GeoJSON location of irrigation logs from their latitude and longitude"
+
+    def handle(self, *args, **options):
+        # Build the index first so nearby queries work as soon as the backfill is done
+        IrrigationLog.ensure_indexes()
+
+        # A single server-side update: no documents travel through the application
+        result = IrrigationLog._get_collection().update_many(
+            {'location': {'$exists': False}},
+            [{'$set': {'location': {
+                'type': 'Point',
+                'coordinates': ['$longitude', '$latitude']
+            }}}]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Set the location of {result.modified_count} irrigation logs"))
@@ -0,0 +1,79 @@
+"""
+Management command to rebuild the hourly and daily irrigation rollups from existing logs
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from sis.core.models import IrrigationRollup, RollupBackfill
+from sis.core.utils.rollups import rebuild_rollups, rebuild_stale_rollups
+from sis.core.views import parse_time_filter
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the hourly and daily irrigation rollups from irrigation logs. Run it once "
+        "without --start/--end after deploying, so the stats endpoint uses the rollups"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clear', action='store_true',
+            help=(
+                "Delete the existing rollups first, only those within --start/--end when given "
+                "(drops rollups of logs that no longer exist)"
+            )
+        )
+        parser.add_argument('--start', help="Only roll up logs at or after this ISO 8601 date (UTC)")
+        parser.add_argument('--end', help="Only roll up logs before this ISO 8601 date (UTC)")
+        parser.add_argument(
+            '--stale', action='store_true',
+            help="Only rebuild the days whose rollup updates failed when their logs were saved"
+        )
+
+    def handle(self, *args, **options):
+        if options['stale']:
+            if options['clear'] or options['start'] or options['end']:
+                raise CommandError("--stale cannot be combined with --clear, --start or --end")
+            days = rebuild_stale_rollups()
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebuilt the rollups of {len(days)} stale days"
+                + (f": {', '.join(day.date().isoformat() for day in days)}" if days else "")
+            ))
+            return
+
+        try:
+            start = parse_time_filter(options['start'])
+            end = parse_time_filter(options['end'])
+        except ValueError:
+            raise CommandError("--start and --end must be ISO 8601 dates")
+
+        # Partial rebuilds must cover whole days, or the boundary rollups would be replaced
+        # by totals of only part of their logs
+        for bound in (start, end):
+            if bound and bound != bound.replace(hour=0, minute=0, second=0, microsecond=0):
+                raise CommandError("--start and --end must be midnight UTC")
+
+        query = {}
+        clear_query = {}
+        if start or end:
+            query['timestamp'] = {}
+            clear_query['period'] = {}
+            if start:
+                query['timestamp']['$gte'] = start
+                clear_query['period']['$gte'] = start
+            if end:
+                query['timestamp']['$lt'] = end
+                clear_query['period']['$lt'] = end
+
+        if options['clear']:
+            # Hourly and daily periods of the range both fall within [start, end) as the
+            # bounds are midnight
+            deleted = IrrigationRollup._get_collection().delete_many(clear_query).deleted_count
+            self.stdout.write(f"Deleted {deleted} rollup documents")
+
+        counts = rebuild_rollups(query)
+        if not query:
+            # Every log is rolled up now, so the stats endpoint can answer from rollups
+            RollupBackfill.mark_completed()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt rollups: {counts['hour']} hourly and {counts['day']} daily documents"
+        ))
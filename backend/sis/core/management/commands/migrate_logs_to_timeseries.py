@@ -0,0 +1,62 @@
+"""
+Management command to copy irrigation logs into the time-series collection
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from sis.core.models import IrrigationLog
+from sis.core.utils.geo import geo_point
+from sis.core.utils.log_store import TimeSeriesLogStore
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies irrigation logs from irrigation_logs into the time-series collection, oldest "
+        "first. Safe to re-run: it resumes after the newest log already copied. Set "
+        "IRRIGATION_LOG_STORAGE=timeseries once it has caught up."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Logs inserted per insert_many")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        store = TimeSeriesLogStore(
+            collection_name=settings.IRRIGATION_TIMESERIES_COLLECTION,
+            granularity=settings.IRRIGATION_TIMESERIES_GRANULARITY
+        )
+        source = IrrigationLog._get_collection()
+        target = store.collection()
+
+        # Resume after the newest copied timestamp; logs sharing that timestamp are
+        # checked one by one since the copy may have stopped in the middle of them
+        query = {}
+        newest = next(target.find({}, {'timestamp': 1}, sort=[('timestamp', -1)], limit=1), None)
+        if newest:
+            copied_ids = {log['_id'] for log in target.find({'timestamp': newest['timestamp']}, {'_id': 1})}
+            query = {'$or': [
+                {'timestamp': {'$gt': newest['timestamp']}},
+                {'timestamp': newest['timestamp'], '_id': {'$nin': list(copied_ids)}}
+            ]}
+            self.stdout.write(f"Resuming after {newest['timestamp'].isoformat()}")
+
+        total = source.count_documents(query)
+        copied = 0
+        batch = []
+        cursor = source.find(query, sort=[('timestamp', 1), ('_id', 1)], batch_size=batch_size)
+        for log in cursor:
+            # Logs saved before the location field existed
+            log.setdefault('location', geo_point(log['latitude'], log['longitude']))
+            batch.append(store.to_storage(log))
+            if len(batch) >= batch_size:
+                target.insert_many(batch, ordered=True)
+                copied += len(batch)
+                batch = []
+                self.stdout.write(f"Copied {copied}/{total} logs")
+        if batch:
+            target.insert_many(batch, ordered=True)
+            copied += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Copied {copied} logs into {settings.IRRIGATION_TIMESERIES_COLLECTION}"
+        ))
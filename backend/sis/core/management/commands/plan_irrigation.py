@@ -0,0 +1,137 @@
+"""
+Management command to plan irrigation of every registered field over the forecast horizon
+"""
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from pymongo import ReplaceOne
+
+from sis.core.models import Field, IrrigationPlan
+from sis.core.utils.catalogue import get_catalogue
+from sis.core.utils.scheduler import ForecastGrid, plan_irrigation, plans_to_documents
+from sis.core.utils.sensor_readings import latest_sensor_data
+from sis.core.utils.weather_api import FALLBACK_WEATHER, get_forecasts_many
+
+
+class Command(BaseCommand):
+    help = "Plans the irrigation start time and volume of every registered field from the weather forecast"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horizon', type=int, default=settings.SCHEDULER_HORIZON_HOURS,
+            help="Planning horizon in hours (the forecast covers up to 120)"
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.SCHEDULER_BATCH_SIZE,
+            help="Fields planned and written per batch"
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Plan without writing irrigation_plans")
+
+    def handle(self, *args, **options):
+        horizon = options['horizon']
+        batch_size = options['batch_size']
+        if not 0 < horizon <= 120:
+            raise CommandError("--horizon must be between 1 and 120 hours")
+        if batch_size <= 0:
+            raise CommandError("--batch-size must be positive")
+
+        started = time.perf_counter()
+        planned_at = datetime.utcnow().replace(microsecond=0)
+        catalogue = get_catalogue()
+
+        # Field columns are small (50k fields are a few MB): load them once, so every
+        # grid cell's forecast is fetched exactly once whatever the batch
+        field_ids, crop_names, soil_names, latitudes, longitudes = [], [], [], [], []
+        projection = {'_id': 0, 'field_id': 1, 'crop_type': 1, 'soil_type': 1, 'latitude': 1, 'longitude': 1}
+        for document in Field._get_collection().find({}, projection, batch_size=batch_size):
+            field_ids.append(document['field_id'])
+            crop_names.append(document['crop_type'])
+            soil_names.append(document['soil_type'])
+            latitudes.append(document['latitude'])
+            longitudes.append(document['longitude'])
+        if not field_ids:
+            self.stdout.write("No registered fields to plan")
+            return
+
+        # Fields with a crop or soil missing from the catalogue cannot be planned
+        known = np.array([
+            crop in catalogue.crop_table.positions and soil in catalogue.soil_table.positions
+            for crop, soil in zip(crop_names, soil_names)
+        ], dtype=bool)
+        skipped = int((~known).sum())
+        if skipped:
+            self.stderr.write(f"Skipping {skipped} fields with an unknown crop or soil type")
+        keep = np.flatnonzero(known)
+        if not len(keep):
+            raise CommandError("No registered field has a crop and soil type in the catalogue")
+        field_ids = [field_ids[index] for index in keep.tolist()]
+        crop_index = catalogue.crop_table.indices([crop_names[index] for index in keep.tolist()])
+        soil_index = catalogue.soil_table.indices([soil_names[index] for index in keep.tolist()])
+
+        grid_size = settings.SCHEDULER_FORECAST_GRID_DEGREES
+        cells = np.stack([
+            np.round(np.asarray(latitudes, dtype=np.float64)[keep] / grid_size),
+            np.round(np.asarray(longitudes, dtype=np.float64)[keep] / grid_size)
+        ], axis=1)
+        unique_cells, cell_index = np.unique(cells, axis=0, return_inverse=True)
+        cell_index = cell_index.reshape(-1)
+
+        forecasts = get_forecasts_many([(row * grid_size, column * grid_size) for row, column in unique_cells.tolist()])
+        missing = sum(forecast is None for forecast in forecasts)
+        self.stdout.write(
+            f"Fetched forecasts for {len(forecasts) - missing} of {len(forecasts)} grid cells "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+        if missing:
+            self.stderr.write(f"Using fallback weather without rain for {missing} grid cells")
+
+        grid = ForecastGrid(forecasts, planned_at, horizon, FALLBACK_WEATHER)
+        since = planned_at - timedelta(seconds=settings.SENSOR_READING_MAX_AGE)
+        rng = np.random.default_rng()
+        collection = IrrigationPlan._get_collection()
+        totals = {'planned': 0, 'scheduled': 0, 'simulated': 0}
+
+        for offset in range(0, len(field_ids), batch_size):
+            batch = slice(offset, offset + batch_size)
+            batch_ids = field_ids[batch]
+
+            # Fields without a recent probe reading get simulated moisture, like decisions do
+            readings = latest_sensor_data(batch_ids, since)
+            soil_moisture = np.array(
+                [readings[field_id]['soil_moisture'] if field_id in readings else np.nan for field_id in batch_ids],
+                dtype=np.float64
+            )
+            simulated = np.isnan(soil_moisture)
+            soil_moisture[simulated] = np.round(rng.uniform(30.0, 90.0, int(simulated.sum())), 1)
+
+            plans = plan_irrigation(
+                catalogue.crop_table, catalogue.soil_table,
+                crop_index[batch], soil_index[batch], cell_index[batch], soil_moisture, grid
+            )
+            documents = plans_to_documents(
+                plans, batch_ids, soil_moisture,
+                ['simulated' if flag else 'probe' for flag in simulated.tolist()],
+                grid, planned_at
+            )
+            if not options['dry_run']:
+                collection.bulk_write(
+                    [ReplaceOne({'field_id': document['field_id']}, document, upsert=True) for document in documents],
+                    ordered=False
+                )
+
+            totals['planned'] += len(documents)
+            totals['scheduled'] += int(plans['needed'].sum())
+            totals['simulated'] += int(simulated.sum())
+            self.stdout.write(
+                f"Planned {totals['planned']} of {len(field_ids)} fields "
+                f"({time.perf_counter() - started:.1f}s)"
+            )
+
+        action = "Planned (dry run)" if options['dry_run'] else "Planned"
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {totals['planned']} fields over {horizon} hours in {time.perf_counter() - started:.1f}s: "
+            f"{totals['scheduled']} scheduled, {totals['simulated']} on simulated soil moisture"
+        ))
@@ -0,0 +1,299 @@
+"""
+Management command to recompute the irrigation decision of every registered field in parallel
+"""
+import hashlib
+import itertools
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from sis.core.models import Field, RecomputeCheckpoint
+from sis.core.utils.batch_engine import calculate_irrigation_decisions, decisions_to_dicts
+from sis.core.utils.catalogue import get_catalogue
+from sis.core.utils.decision_engine import get_engine_version
+from sis.core.utils.log_store import TimeSeriesLogStore, get_log_store, persist_irrigation_logs
+from sis.core.utils.sensor_readings import latest_sensor_data
+from sis.core.utils.sensor_simulator import simulate_sensor_data
+from sis.core.utils.weather_api import FALLBACK_WEATHER, get_weather_data_many
+from sis.core.views import build_irrigation_log
+
+FIELD_PROJECTION = {
+    '_id': 0, 'field_id': 1, 'user': 1, 'crop_type': 1, 'soil_type': 1, 'latitude': 1, 'longitude': 1
+}
+
+
+def decision_log_id(job, field_id):
+    """
+    Returns the id of a field's decision log in a job
+
+    Ids are derived from the job and field, so with the regular log collection a batch
+    written again after an interruption is skipped as duplicates instead of being logged
+    twice. Time-series collections have no unique _id, which is why their jobs cannot
+    be resumed.
+    """
+    return ObjectId(hashlib.blake2b(f"{job}:{field_id}".encode(), digest_size=12).digest())
+
+
+def weather_cell(latitude, longitude):
+    """Returns the weather cache grid cell of the coordinates"""
+    grid_size = settings.WEATHER_CACHE_GRID_DEGREES
+    return (round(latitude / grid_size), round(longitude / grid_size))
+
+
+def recompute_fields(fields, sensor_by_field, weather_by_cell, catalogue, job, timestamp):
+    """
+    Computes the decision logs of a batch of fields with the configured engine version
+
+    Args:
+        fields (list): Field documents (FIELD_PROJECTION)
+        sensor_by_field (dict): Latest sensor data by field_id; other fields are simulated
+        weather_by_cell (dict): Weather data by weather_cell; other cells get the fallback
+        catalogue (Catalogue): Crop and soil catalogue snapshot
+        job (str): Job name, part of every log id
+        timestamp (datetime): Naive UTC timestamp of the logs
+
+    Returns:
+        list: Raw irrigation log documents; fields with a crop or soil type missing from
+              the catalogue are left out
+    """
+    crop_table = catalogue.crop_table_for(get_engine_version())
+    fields = [
+        field for field in fields
+        if field['crop_type'] in crop_table.positions and field['soil_type'] in catalogue.soil_table.positions
+    ]
+    sensor_data = [sensor_by_field.get(field['field_id']) or simulate_sensor_data() for field in fields]
+    weather_data = [
+        weather_by_cell.get(weather_cell(field['latitude'], field['longitude'])) or FALLBACK_WEATHER
+        for field in fields
+    ]
+    decisions = decisions_to_dicts(calculate_irrigation_decisions(
+        crop_table=crop_table,
+        soil_table=catalogue.soil_table,
+        crop_index=crop_table.indices(field['crop_type'] for field in fields),
+        soil_index=catalogue.soil_table.indices(field['soil_type'] for field in fields),
+        soil_moisture=[reading['soil_moisture'] for reading in sensor_data],
+        temperature=[reading['temperature'] for reading in sensor_data],
+        rain_probability=[weather['rain_probability'] for weather in weather_data]
+    ))
+
+    documents = []
+    for field, sensor, weather, decision in zip(fields, sensor_data, weather_data, decisions):
+        document = build_irrigation_log(
+            user=field.get('user', 'guest'),
+            crop_type=field['crop_type'],
+            soil_type=field['soil_type'],
+            latitude=field['latitude'],
+            longitude=field['longitude'],
+            sensor_data=sensor,
+            weather_data=weather,
+            decision=decision,
+            field_id=field['field_id']
+        ).to_mongo().to_dict()
+        document['_id'] = decision_log_id(job, field['field_id'])
+        document['timestamp'] = timestamp
+        documents.append(document)
+    return documents
+
+
+# State of a pool worker, set by _init_worker (inherited through fork, not pickled)
+_worker = {}
+
+
+def _init_worker(job, weather_by_cell, batch_size):
+    _worker.update(job=job, weather_by_cell=weather_by_cell, batch_size=batch_size)
+
+
+def recompute_shard(shard):
+    """
+    Recomputes the decisions of one shard in a pool worker, resuming from its checkpoint
+
+    Streams the shard's fields from MongoDB in field_id order and, for every batch, reads
+    the latest sensor data with one aggregation, writes the logs with one insert_many and
+    then advances the checkpoint.
+
+    Args:
+        shard (int): Shard number within the job
+
+    Returns:
+        tuple: (processed, skipped) fields in this run
+    """
+    job = _worker['job']
+    checkpoints = RecomputeCheckpoint._get_collection()
+    checkpoint = checkpoints.find_one({'job': job, 'shard': shard})
+    catalogue = get_catalogue()
+
+    field_range = {'$lte': checkpoint['upper']}
+    after = checkpoint.get('last_field_id') or checkpoint.get('lower')
+    if after is not None:
+        field_range['$gt'] = after
+    cursor = Field._get_collection().find(
+        {'field_id': field_range}, FIELD_PROJECTION, sort=[('field_id', 1)], batch_size=_worker['batch_size']
+    )
+
+    processed = skipped = 0
+    while True:
+        fields = list(itertools.islice(cursor, _worker['batch_size']))
+        if not fields:
+            break
+        since = datetime.utcnow() - timedelta(seconds=settings.SENSOR_READING_MAX_AGE)
+        sensor_by_field = latest_sensor_data([field['field_id'] for field in fields], since)
+        documents = recompute_fields(
+            fields, sensor_by_field, _worker['weather_by_cell'], catalogue, job, checkpoint['started_at']
+        )
+        persist_irrigation_logs(documents)
+
+        batch_skipped = len(fields) - len(documents)
+        checkpoints.update_one(
+            {'job': job, 'shard': shard},
+            {
+                '$set': {'last_field_id': fields[-1]['field_id'], 'updated_at': datetime.utcnow()},
+                '$inc': {'processed': len(documents), 'skipped': batch_skipped}
+            }
+        )
+        processed += len(documents)
+        skipped += batch_skipped
+
+    checkpoints.update_one({'job': job, 'shard': shard}, {'$set': {'done': True, 'updated_at': datetime.utcnow()}})
+    return processed, skipped
+
+
+class Command(BaseCommand):
+    help = "Recomputes the irrigation decision of every registered field on a pool of worker processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--job',
+            help=(
+                "Job name; rerun with the name of an interrupted job to resume it without logging "
+                "any field twice (default: a new job). Not supported with the time-series log store"
+            )
+        )
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Worker processes")
+        parser.add_argument(
+            '--shards', type=int,
+            help="Field ranges the job is split into (default: 4 per worker, for even load and fine checkpoints)"
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help="Fields read and written per batch")
+        parser.add_argument('--progress-interval', type=float, default=5.0, help="Seconds between progress reports")
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        batch_size = options['batch_size']
+        if workers <= 0 or batch_size <= 0:
+            raise CommandError("--workers and --batch-size must be positive")
+
+        started = time.perf_counter()
+        job = options['job'] or f"recompute-{datetime.utcnow():%Y%m%dT%H%M%S}"
+        checkpoints = RecomputeCheckpoint._get_collection()
+        RecomputeCheckpoint.ensure_indexes()
+
+        # One pass over the fields (in shard order) for the shard bounds and weather cells
+        field_ids = []
+        cells = {}
+        for field in Field._get_collection().find(
+            {}, {'_id': 0, 'field_id': 1, 'latitude': 1, 'longitude': 1}, sort=[('field_id', 1)], batch_size=10000
+        ):
+            field_ids.append(field['field_id'])
+            cells.setdefault(weather_cell(field['latitude'], field['longitude']), (field['latitude'], field['longitude']))
+        if not field_ids:
+            self.stdout.write("No registered fields to recompute")
+            return
+
+        resuming = bool(checkpoints.count_documents({'job': job}))
+        if not resuming:
+            self._create_shards(job, field_ids, options['shards'] or workers * 4)
+            self.stdout.write(f"Started job {job}")
+
+        pending = [checkpoint['shard'] for checkpoint in checkpoints.find({'job': job, 'done': False}, {'shard': 1})]
+        total = sum(checkpoint['fields_count'] for checkpoint in checkpoints.find({'job': job}, {'fields_count': 1}))
+        if not pending:
+            self.stdout.write(self.style.SUCCESS(f"Job {job} is already complete"))
+            return
+        if resuming:
+            # A shard may have written its last batch without advancing its checkpoint; only
+            # the unique _id of the regular collection stops that batch being logged twice
+            if get_log_store().name == TimeSeriesLogStore.name:
+                raise CommandError(
+                    f"Job {job} cannot be resumed with the time-series log store, which would log "
+                    f"its last batches twice; start a new job instead"
+                )
+            self.stdout.write(f"Resuming job {job}")
+
+        # Weather changes are what triggers a recompute: fetch it once per cell for all workers
+        weather_by_cell = dict(zip(cells, get_weather_data_many(list(cells.values()))))
+        self.stdout.write(f"Fetched weather for {len(cells)} cells in {time.perf_counter() - started:.1f}s")
+
+        # Load the catalogue before forking so every worker inherits the same snapshot; the
+        # MongoDB connection module gives each worker its own client after the fork
+        get_catalogue()
+        initial = self._progress(job)
+        executor = ProcessPoolExecutor(
+            max_workers=min(workers, len(pending)),
+            mp_context=multiprocessing.get_context('fork'),
+            initializer=_init_worker,
+            initargs=(job, weather_by_cell, batch_size)
+        )
+        with executor:
+            futures = [executor.submit(recompute_shard, shard) for shard in pending]
+            not_done = futures
+            while not_done:
+                done, not_done = wait(not_done, timeout=options['progress_interval'], return_when=FIRST_EXCEPTION)
+                failed = [future for future in done if future.exception() is not None]
+                if failed:
+                    for future in not_done:
+                        future.cancel()
+                    raise CommandError(
+                        f"Recompute failed: {str(failed[0].exception())}. "
+                        f"Rerun with --job {job} to resume from the last checkpoint"
+                    )
+                self._report(job, total, initial, started)
+
+        progress = self._progress(job)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Recomputed {progress['processed']} decisions in {elapsed:.1f}s "
+            f"({(progress['processed'] - initial['processed']) / elapsed:.0f} fields/s); "
+            f"skipped {progress['skipped']} fields with an unknown crop or soil type"
+        ))
+
+    def _create_shards(self, job, field_ids, shards):
+        """Splits the sorted field ids into contiguous ranges of equal size"""
+        size = math.ceil(len(field_ids) / max(1, min(shards, len(field_ids))))
+        started_at = datetime.utcnow()
+        RecomputeCheckpoint._get_collection().insert_many([
+            {
+                'job': job,
+                'shard': shard,
+                'lower': field_ids[offset - 1] if offset else None,
+                'upper': field_ids[min(offset + size, len(field_ids)) - 1],
+                'fields_count': len(field_ids[offset:offset + size]),
+                'last_field_id': None,
+                'processed': 0,
+                'skipped': 0,
+                'done': False,
+                'started_at': started_at,
+                'updated_at': started_at
+            }
+            for shard, offset in enumerate(range(0, len(field_ids), size))
+        ])
+
+    def _progress(self, job):
+        """Sums the processed and skipped counts of all shards of a job"""
+        progress = {'processed': 0, 'skipped': 0}
+        for checkpoint in RecomputeCheckpoint._get_collection().find({'job': job}, {'processed': 1, 'skipped': 1}):
+            progress['processed'] += checkpoint['processed']
+            progress['skipped'] += checkpoint['skipped']
+        return progress
+
+    def _report(self, job, total, initial, started):
+        progress = self._progress(job)
+        done = progress['processed'] + progress['skipped']
+        rate = (done - initial['processed'] - initial['skipped']) / (time.perf_counter() - started)
+        self.stdout.write(f"{done} of {total} fields ({100.0 * done / total:.1f}%, {rate:.0f} fields/s)")
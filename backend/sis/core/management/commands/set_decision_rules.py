@@ -0,0 +1,63 @@
+"""
+Management command to tune the decision rules of a crop without a deploy
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sis.core.models import Crop
+from sis.core.utils.catalogue import get_catalogue_service
+from sis.core.utils.decision_rules import RULE_SETS, merge_rules, validate_overrides
+
+
+class Command(BaseCommand):
+    help = (
+        "Shows or changes the decision rule overrides of a crop. Changes bump the catalogue "
+        "version, so every worker recompiles its rules within CATALOGUE_REFRESH_INTERVAL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('crop', help="Crop name")
+        parser.add_argument(
+            '--set', dest='overrides',
+            help='Overrides to merge into the crop\'s, as JSON by section, e.g. \'{"rain": {"above": 70}}\''
+        )
+        parser.add_argument('--clear', action='store_true', help="Remove all overrides of the crop first")
+
+    def handle(self, *args, **options):
+        crop = Crop.objects(name=options['crop']).first()
+        if crop is None:
+            raise CommandError(f"Crop '{options['crop']}' not found")
+
+        if options['clear'] or options['overrides']:
+            overrides = {} if options['clear'] else {
+                section: dict(values) for section, values in (crop.decision_rules or {}).items()
+            }
+            if options['overrides']:
+                try:
+                    changes = json.loads(options['overrides'])
+                except ValueError:
+                    raise CommandError("--set must be valid JSON")
+                if not isinstance(changes, dict) or not all(isinstance(values, dict) for values in changes.values()):
+                    raise CommandError("--set must be an object of rule sections")
+                for section, values in changes.items():
+                    overrides.setdefault(section, {}).update(values)
+
+            try:
+                validate_overrides(overrides)
+            except ValueError as e:
+                raise CommandError(f"Invalid decision rules: {str(e)}")
+            crop.decision_rules = overrides
+            crop.save()
+            # Reload the in-process catalogue (other processes follow the version stamp)
+            get_catalogue_service().invalidate()
+            self.stdout.write(self.style.SUCCESS(f"Updated the decision rules of {crop.name}"))
+
+        self.stdout.write(f"Overrides: {json.dumps(crop.decision_rules or {}, sort_keys=True)}")
+        for version, rules in RULE_SETS.items():
+            try:
+                effective = merge_rules(rules, crop.decision_rules)
+            except ValueError as e:
+                self.stdout.write(self.style.ERROR(f"Invalid for {version}, the crop uses the defaults: {str(e)}"))
+                continue
+            self.stdout.write(f"Effective {version} rules: {json.dumps(effective, sort_keys=True)}")
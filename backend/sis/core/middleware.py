@@ -0,0 +1,66 @@
+"""
+Middleware for Smart Irrigation System
+"""
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .utils.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS, start_metrics_snapshots
+
+# Other methods are counted together, so arbitrary methods cannot add label values
+KNOWN_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+class RequestMetricsMiddleware:
+    """
+    Records the count and latency of every request by view, method and status code,
+    and reports the total duration in a Server-Timing header
+
+    Runs natively under both WSGI and ASGI, so async views stay on the event loop.
+    With METRICS_MULTIPROCESS_DIR set, it also starts sharing the metrics of every
+    server process that handles requests.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.METRICS_ENABLED
+        self.snapshot_dir = settings.METRICS_MULTIPROCESS_DIR if self.enabled else None
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        response = self.get_response(request)
+        return self.record(request, response, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        return self.record(request, response, time.perf_counter() - start)
+
+    def record(self, request, response, duration):
+        if self.snapshot_dir:
+            # Once per process, including workers forked after the application was loaded
+            start_metrics_snapshots(self.snapshot_dir, settings.METRICS_SNAPSHOT_INTERVAL)
+
+        # Label by URL pattern name, not path, to keep the number of series bounded
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match is not None and match.url_name else 'unmatched'
+        method = request.method if request.method in KNOWN_METHODS else 'other'
+        HTTP_REQUESTS.inc(view=view, method=method, status=response.status_code)
+        HTTP_REQUEST_DURATION.observe(duration, view=view, method=method)
+
+        # Streamed responses (CSV export) are timed until their first byte only
+        response['Server-Timing'] = f'app;dur={duration * 1000:.1f}'
+        return response
@@ -1,7 +1,7 @@
 """
 MongoDB models for Smart Irrigation System
 """
-from mongoengine import Document, EmbeddedDocument, fields
+from mongoengine import Document, EmbeddedDocument, ValidationError, fields
 import datetime
 
 class SensorData(EmbeddedDocument):
@@ -21,6 +21,27 @@ class IrrigationDecision(EmbeddedDocument):
     water_amount = fields.FloatField(required=True)   # liters per hour
     duration = fields.FloatField(required=True)       # hours
     status = fields.StringField(required=True, choices=['Active', 'Pending', 'Completed', 'Cancelled'])
+    engine_version = fields.StringField()  # decision engine that produced it (None for older logs)
+
+class CatalogueVersion(Document):
+    """Document holding the version stamp of the crop and soil catalogue"""
+    id = fields.StringField(primary_key=True)
+    version = fields.IntField(default=0)
+    
+    meta = {
+        'collection': 'catalogue_meta'
+    }
+    
+    @classmethod
+    def current(cls):
+        """Returns the current catalogue version (0 if never stamped)"""
+        stamp = cls.objects(id='catalogue').first()
+        return stamp.version if stamp else 0
+    
+    @classmethod
+    def bump(cls):
+        """Increments the catalogue version so cached catalogues reload"""
+        cls.objects(id='catalogue').update_one(inc__version=1, upsert=True)
 
 class Crop(Document):
     """Document for crop data"""
@@ -28,11 +49,29 @@ class Crop(Document):
     ideal_moisture = fields.ListField(fields.FloatField(), required=True)  # [min, max] percentage
     ideal_temp = fields.ListField(fields.FloatField(), required=True)      # [min, max] celsius
     base_water_lph = fields.FloatField(required=True)  # base water need in liters per hour
+    # Overrides of the decision rule parameters for this crop (see utils/decision_rules.py)
+    decision_rules = fields.DictField()
     
     meta = {
         'collection': 'crops',
         'indexes': ['name']
     }
+    
+    def clean(self):
+        from .utils.decision_rules import validate_overrides
+        try:
+            validate_overrides(self.decision_rules)
+        except ValueError as e:
+            raise ValidationError(f"Invalid decision rules: {str(e)}")
+    
+    def save(self, *args, **kwargs):
+        result = super().save(*args, **kwargs)
+        CatalogueVersion.bump()
+        return result
+    
+    def delete(self, *args, **kwargs):
+        super().delete(*args, **kwargs)
+        CatalogueVersion.bump()
 
 class Soil(Document):
     """Document for soil data"""
@@ -43,6 +82,15 @@ class Soil(Document):
         'collection': 'soils',
         'indexes': ['name']
     }
+    
+    def save(self, *args, **kwargs):
+        result = super().save(*args, **kwargs)
+        CatalogueVersion.bump()
+        return result
+    
+    def delete(self, *args, **kwargs):
+        super().delete(*args, **kwargs)
+        CatalogueVersion.bump()
 
 class IrrigationLog(Document):
     """Document for irrigation log data"""
@@ -54,6 +102,9 @@ class IrrigationLog(Document):
     soil_type = fields.StringField(required=True)
     latitude = fields.FloatField(required=True)
     longitude = fields.FloatField(required=True)
+    field_id = fields.StringField()  # probe-equipped field the sensor data came from, if any
+    # GeoJSON copy of latitude/longitude for geospatial queries
+    location = fields.PointField(auto_index=False)
     
     # Sensor and weather data
     sensor_data = fields.EmbeddedDocumentField(SensorData, required=True)
@@ -64,11 +115,166 @@ class IrrigationLog(Document):
     
     meta = {
         'collection': 'irrigation_logs',
+        # History pages are keyset-paginated on (timestamp, _id), newest first, so every
+        # filter combination gets an index ending in that sort key. These compound
+        # indexes also serve the former single-field timestamp/crop_type/user lookups.
         'indexes': [
-            'timestamp', 
-            'crop_type',
-            'user',
-            ('latitude', 'longitude')
+            ('-timestamp', '-id'),
+            ('user', '-timestamp', '-id'),
+            ('crop_type', '-timestamp', '-id'),
+            ('soil_type', '-timestamp', '-id'),
+            ('decision.status', '-timestamp', '-id'),
+            ('user', 'crop_type', '-timestamp', '-id'),
+            ('crop_type', 'soil_type', '-timestamp', '-id'),
+            ('crop_type', 'decision.status', '-timestamp', '-id'),
+            # Radius and polygon queries for recent logs near a field
+            ('(location', '-timestamp')
         ],
         'ordering': ['-timestamp']
     }
+
+class SensorReading(Document):
+    """Document for a reading reported by a field's soil probe"""
+    field_id = fields.StringField(required=True)
+    timestamp = fields.DateTimeField(required=True)
+    soil_moisture = fields.FloatField(required=True)  # percentage
+    temperature = fields.FloatField(required=True)    # celsius
+    humidity = fields.FloatField(required=True)       # percentage
+    
+    meta = {
+        'collection': 'sensor_readings',
+        # Serves both the latest-reading lookup and per-field range scans
+        'indexes': [('field_id', '-timestamp')]
+    }
+
+class IrrigationRollup(Document):
+    """
+    Document for pre-aggregated irrigation totals per period, crop, soil and user
+    Maintained incrementally with $inc upserts whenever irrigation logs are saved
+    """
+    granularity = fields.StringField(required=True, choices=['hour', 'day'])
+    period = fields.DateTimeField(required=True)  # start of the hour or day (UTC)
+    crop_type = fields.StringField(required=True)
+    soil_type = fields.StringField(required=True)
+    user = fields.StringField(required=True)
+    
+    # Totals over all logs in the period
+    count = fields.IntField(default=0)
+    water_amount_sum = fields.FloatField(default=0.0)
+    duration_sum = fields.FloatField(default=0.0)
+    
+    # Totals per decision status: {status: {count, water_amount_sum, duration_sum}}
+    statuses = fields.DictField()
+    
+    meta = {
+        'collection': 'irrigation_rollups',
+        'indexes': [
+            {
+                'fields': ('granularity', 'period', 'crop_type', 'soil_type', 'user'),
+                'unique': True
+            },
+            ('granularity', 'crop_type', 'period'),
+            ('granularity', 'soil_type', 'period'),
+            ('granularity', 'user', 'period')
+        ]
+    }
+
+class RollupBackfill(Document):
+    """
+    Document recording that the rollups were rebuilt from every existing irrigation log
+    Written by backfill_rollups; until then rollups miss the logs saved before they existed
+    """
+    id = fields.StringField(primary_key=True)
+    completed_at = fields.DateTimeField(required=True)
+    
+    meta = {
+        'collection': 'rollup_meta'
+    }
+    
+    @classmethod
+    def completed(cls):
+        """Returns True once a full backfill has finished"""
+        return cls.objects(id='backfill').first() is not None
+    
+    @classmethod
+    def mark_completed(cls):
+        """Records that a full backfill has finished"""
+        cls.objects(id='backfill').update_one(set__completed_at=datetime.datetime.utcnow(), upsert=True)
+
+class StaleRollupDay(Document):
+    """
+    Document for a day whose rollups miss saved irrigation logs because their $inc failed
+    Rebuilt from the logs by the backfill_rollups --stale command
+    """
+    day = fields.DateTimeField(required=True, unique=True)  # midnight UTC
+    marked_at = fields.DateTimeField(default=datetime.datetime.utcnow)
+
+    meta = {
+        'collection': 'stale_rollup_days'
+    }
+
+class Field(Document):
+    """Document for a registered field, planned for by the irrigation scheduler"""
+    field_id = fields.StringField(required=True, unique=True)
+    user = fields.StringField(default='guest')
+    crop_type = fields.StringField(required=True)
+    soil_type = fields.StringField(required=True)
+    latitude = fields.FloatField(required=True)
+    longitude = fields.FloatField(required=True)
+    
+    meta = {
+        'collection': 'fields',
+        'indexes': ['field_id']
+    }
+
+class IrrigationPlan(Document):
+    """
+    Document for the latest irrigation plan of a field, replaced on every scheduler run
+    """
+    field_id = fields.StringField(required=True, unique=True)
+    planned_at = fields.DateTimeField(required=True)
+    horizon = fields.IntField(required=True)  # hours
+    status = fields.StringField(required=True, choices=['Scheduled', 'Not needed'])
+    start_time = fields.DateTimeField()  # None when no irrigation is needed
+    duration = fields.FloatField(default=0.0)      # hours
+    water_amount = fields.FloatField(default=0.0)  # liters per hour
+    volume = fields.FloatField(default=0.0)        # liters
+    
+    # Projected soil moisture without irrigation, and where it came from
+    soil_moisture = fields.FloatField(required=True)  # percentage at planned_at
+    min_soil_moisture = fields.FloatField(required=True)  # lowest over the horizon
+    sensor_source = fields.StringField(choices=['probe', 'simulated'])
+    
+    meta = {
+        'collection': 'irrigation_plans',
+        'indexes': ['field_id', ('status', 'start_time')]
+    }
+
+class RecomputeCheckpoint(Document):
+    """
+    Document for the progress of one shard of a recompute_decisions job
+
+    Shards are field_id ranges (lower exclusive, upper inclusive); last_field_id is the
+    last field whose decision has been written, so an interrupted job resumes after it.
+    """
+    job = fields.StringField(required=True)
+    shard = fields.IntField(required=True)
+    lower = fields.StringField()  # None for the first shard
+    upper = fields.StringField(required=True)
+    fields_count = fields.IntField(required=True)
+    last_field_id = fields.StringField()
+    processed = fields.IntField(default=0)
+    skipped = fields.IntField(default=0)
+    done = fields.BooleanField(default=False)
+    started_at = fields.DateTimeField(required=True)  # timestamp of the job's decision logs
+    updated_at = fields.DateTimeField(default=datetime.datetime.utcnow)
+    
+    meta = {
+        'collection': 'recompute_checkpoints',
+        'indexes': [
+            {
+                'fields': ('job', 'shard'),
+                'unique': True
+            }
+        ]
+    }
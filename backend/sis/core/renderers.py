@@ -0,0 +1,44 @@
+"""
+Renderers for Smart Irrigation System API
+"""
+from rest_framework.renderers import JSONRenderer
+
+from .utils.metrics import stage
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the standard renderer
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON renderer backed by orjson when it is installed
+
+    Produces the same compact UTF-8 output as the DRF JSONRenderer. Indented output
+    (e.g. for the browsable API) and installs without orjson use the DRF renderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with stage('serialization'):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Datetimes and other non-native types go through the DRF encoder for identical output
+        ret = orjson.dumps(
+            data,
+            default=self.encoder_class().default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME
+        )
+
+        # Keep the output a strict javascript subset, like the DRF renderer
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,122 @@
+"""
+Parity tests of the decision engine versions
+For random crops, soils, sensor readings and weather, the dict API
+(decision_engine.calculate_irrigation_decision), the compiled rules
+(decision_rules.apply_crop_rules) and the batch engine
+(batch_engine.calculate_irrigation_decisions) must return the same decision and
+engine_version for every version
+"""
+import numpy as np
+from django.test import SimpleTestCase
+
+from sis.core.utils.batch_engine import CropTable, SoilTable, calculate_irrigation_decisions, decisions_to_dicts
+from sis.core.utils.decision_engine import ENGINE_VERSIONS, calculate_irrigation_decision
+from sis.core.utils.decision_rules import RULE_SETS, STATUS_LABELS, apply_crop_rules, compile_crop_rules
+
+CASES = 5000
+
+
+def random_crops(rng, count):
+    """Crops with random ideal ranges and water needs, some with rule overrides"""
+    crops = []
+    for position in range(count):
+        moisture_min = float(rng.uniform(5.0, 60.0))
+        temp_min = float(rng.uniform(5.0, 25.0))
+        crop = {
+            'name': f'crop-{position}',
+            'ideal_moisture': [moisture_min, moisture_min + float(rng.uniform(5.0, 30.0))],
+            'ideal_temp': [temp_min, temp_min + float(rng.uniform(5.0, 15.0))],
+            'base_water_lph': float(rng.uniform(0.5, 10.0))
+        }
+        if position % 3 == 0:
+            crop['decision_rules'] = {
+                'rain': {'above': float(rng.uniform(40.0, 90.0)), 'factor': float(rng.uniform(0.1, 0.9))}
+            }
+        crops.append(crop)
+    return crops
+
+
+def random_soils(rng, count):
+    return [
+        {'name': f'soil-{position}', 'absorption_rate': float(rng.uniform(0.1, 1.0))}
+        for position in range(count)
+    ]
+
+
+def random_zones(rng, crops, size):
+    """Zones over and beyond the sensor ranges, a share of them on the crop thresholds"""
+    crop_index = rng.integers(0, len(crops), size)
+    soil_moisture = rng.uniform(0.0, 120.0, size)
+    temperature = rng.uniform(-5.0, 50.0, size)
+    rain_probability = rng.uniform(0.0, 100.0, size)
+    # Probes report one decimal
+    rounded = rng.random(size) < 0.5
+    for values in (soil_moisture, temperature, rain_probability):
+        values[rounded] = np.round(values[rounded], 1)
+
+    moisture_min = np.array([crop['ideal_moisture'][0] for crop in crops])[crop_index]
+    moisture_max = np.array([crop['ideal_moisture'][1] for crop in crops])[crop_index]
+    temp_max = np.array([crop['ideal_temp'][1] for crop in crops])[crop_index]
+    on_edge = rng.random(size) < 0.2
+    edges = rng.integers(0, 4, size)
+    soil_moisture = np.where(
+        on_edge, np.choose(edges, [moisture_min, moisture_max, moisture_max * 1.2, moisture_min * 0.5]), soil_moisture
+    )
+    temperature = np.where(on_edge & (edges == 0), temp_max, temperature)
+    rain_probability = np.where(on_edge & (edges == 1), 80.0, rain_probability)
+    return crop_index, soil_moisture, temperature, rain_probability
+
+
+class DecisionEngineParityTests(SimpleTestCase):
+
+    def check_version(self, version, seed):
+        rng = np.random.default_rng(seed)
+        crops = random_crops(rng, 12)
+        soils = random_soils(rng, 6)
+        crop_index, soil_moisture, temperature, rain_probability = random_zones(rng, crops, CASES)
+        soil_index = rng.integers(0, len(soils), CASES)
+
+        crop_table = CropTable(crops, RULE_SETS[version])
+        batch = decisions_to_dicts(calculate_irrigation_decisions(
+            crop_table=crop_table,
+            soil_table=SoilTable(soils),
+            crop_index=crop_index,
+            soil_index=soil_index,
+            soil_moisture=soil_moisture,
+            temperature=temperature,
+            rain_probability=rain_probability
+        ))
+        compiled_rules = [compile_crop_rules(RULE_SETS[version], crop) for crop in crops]
+
+        for row in range(CASES):
+            crop = crops[crop_index[row]]
+            soil = soils[soil_index[row]]
+            moisture, temp, rain = float(soil_moisture[row]), float(temperature[row]), float(rain_probability[row])
+            dict_api = calculate_irrigation_decision(
+                crop_data=crop,
+                soil_data=soil,
+                sensor_data={'soil_moisture': moisture, 'temperature': temp, 'humidity': 60.0},
+                weather_data={'temperature': temp, 'humidity': 60.0, 'rain_probability': rain},
+                engine_version=version
+            )
+            compiled = apply_crop_rules(compiled_rules[crop_index[row]], soil['absorption_rate'], moisture, temp, rain)
+            case = (version, crop, soil, moisture, temp, rain)
+
+            self.assertEqual(dict_api, compiled, case)
+            self.assertEqual(batch[row], compiled, case)
+            self.assertEqual(compiled['engine_version'], version, case)
+            self.assertIn(compiled['status'], STATUS_LABELS, case)
+            self.assertGreaterEqual(compiled['water_amount'], 0.0, case)
+
+    def test_paths_agree_for_every_version(self):
+        for seed, version in enumerate(ENGINE_VERSIONS):
+            with self.subTest(version=version):
+                self.check_version(version, seed)
+
+    def test_crop_table_uses_per_crop_rules(self):
+        rng = np.random.default_rng(3)
+        crops = random_crops(rng, 4)
+        for version in ENGINE_VERSIONS:
+            crop_table = CropTable(crops, RULE_SETS[version])
+            for crop in crops:
+                self.assertEqual(crop_table.rules_for(crop['name']), compile_crop_rules(RULE_SETS[version], crop))
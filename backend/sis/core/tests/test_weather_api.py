@@ -0,0 +1,133 @@
+"""
+Tests of the weather API client against the stub OpenWeatherMap server
+Cover the bounded retries of the pooled session, the circuit breaker opening and
+recovering, and concurrent fetches of many coordinates
+"""
+import time
+
+from django.test import SimpleTestCase, override_settings
+
+from benchmarks.stub_weather_server import start_stub_server
+from sis.core.utils import weather_api
+from sis.core.utils.weather_api import FALLBACK_WEATHER
+
+
+class StubWeatherTestCase(SimpleTestCase):
+    """Runs a stub weather server and points the client at it with fresh clients per test"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = start_stub_server()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.request_count = 0
+        self.server.failure_rate = 0.0
+        self.server.latency = 0.0
+        settings_override = override_settings(
+            OPENWEATHERMAP_API_KEY='stub',
+            OPENWEATHERMAP_BASE_URL=self.server.base_url,
+            WEATHER_CACHE_ENABLED=False,
+            WEATHER_HTTP_RETRIES=2,
+            WEATHER_HTTP_BACKOFF=0.0,
+            WEATHER_HTTP_TIMEOUT=5.0,
+            WEATHER_CIRCUIT_FAILURE_THRESHOLD=3,
+            WEATHER_CIRCUIT_RESET_TIMEOUT=60.0
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.reset_clients()
+        self.addCleanup(self.reset_clients)
+
+    def reset_clients(self):
+        # The session and breaker are built from settings on first use
+        weather_api._session = None
+        weather_api._circuit_breaker = None
+
+
+class RetryTests(StubWeatherTestCase):
+
+    def test_session_retries_5xx_a_bounded_number_of_times(self):
+        self.server.failure_rate = 1.0
+        with self.assertRaises(Exception):
+            weather_api.fetch_weather_data(10.0, 20.0)
+        # The first attempt and WEATHER_HTTP_RETRIES retries
+        self.assertEqual(self.server.request_count, 3)
+
+    def test_async_fetch_retries_5xx_a_bounded_number_of_times(self):
+        self.server.failure_rate = 1.0
+        results = weather_api.get_weather_data_many([(10.0, 20.0)])
+        self.assertEqual(results, [FALLBACK_WEATHER])
+        self.assertEqual(self.server.request_count, 3)
+
+    def test_successful_fetch_makes_one_request(self):
+        weather_data = weather_api.fetch_weather_data(10.0, 20.0)
+        self.assertEqual(set(weather_data), {'temperature', 'humidity', 'rain_probability'})
+        self.assertEqual(self.server.request_count, 1)
+
+
+class CircuitBreakerTests(StubWeatherTestCase):
+
+    def fail_until_open(self):
+        self.server.failure_rate = 1.0
+        for _ in range(3):
+            with self.assertRaises(Exception):
+                weather_api.get_weather_data(10.0, 20.0)
+        self.assertTrue(weather_api.get_circuit_breaker().is_open)
+
+    def test_breaker_opens_after_repeated_failures_and_returns_fallback(self):
+        self.fail_until_open()
+        requests_before = self.server.request_count
+
+        self.assertEqual(weather_api.get_weather_data(10.0, 20.0), FALLBACK_WEATHER)
+        self.assertEqual(weather_api.get_weather_data_many([(10.0, 20.0), (11.0, 21.0)]), [FALLBACK_WEATHER] * 2)
+        # Short-circuited requests never reach the API
+        self.assertEqual(self.server.request_count, requests_before)
+
+    @override_settings(WEATHER_CIRCUIT_RESET_TIMEOUT=0.2)
+    def test_half_open_probe_closes_the_breaker_when_the_api_recovers(self):
+        self.fail_until_open()
+        self.server.failure_rate = 0.0
+        self.assertEqual(weather_api.get_weather_data(10.0, 20.0), FALLBACK_WEATHER)
+
+        time.sleep(0.25)
+        weather_data = weather_api.get_weather_data(10.0, 20.0)
+        self.assertEqual(weather_data, weather_api.fetch_weather_data(10.0, 20.0))
+        self.assertFalse(weather_api.get_circuit_breaker().is_open)
+
+    @override_settings(WEATHER_CIRCUIT_RESET_TIMEOUT=0.2)
+    def test_failed_half_open_probe_opens_the_breaker_again(self):
+        self.fail_until_open()
+        time.sleep(0.25)
+        with self.assertRaises(Exception):
+            weather_api.get_weather_data(10.0, 20.0)
+
+        requests_before = self.server.request_count
+        self.assertEqual(weather_api.get_weather_data(10.0, 20.0), FALLBACK_WEATHER)
+        self.assertEqual(self.server.request_count, requests_before)
+
+
+class ManyCoordinatesTests(StubWeatherTestCase):
+
+    @override_settings(WEATHER_HTTP_POOL_SIZE=10)
+    def test_concurrent_fetches_return_results_in_input_order(self):
+        coordinates = [(10.0 + step, 20.0 - step) for step in range(10)][::-1]
+        coordinates.insert(3, coordinates[7])  # a repeated location shares its request
+        expected = [weather_api.fetch_weather_data(latitude, longitude) for latitude, longitude in coordinates]
+
+        self.server.request_count = 0
+        self.server.latency = 0.2
+        start = time.perf_counter()
+        results = weather_api.get_weather_data_many(coordinates)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(results, expected)
+        self.assertEqual(self.server.request_count, 10)
+        # Ten requests of 0.2s each, sent concurrently
+        self.assertLess(elapsed, 1.0)
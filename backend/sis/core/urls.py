@@ -1,17 +1,37 @@
 """
 URL patterns for Smart Irrigation System core app
 """
+from django.conf import settings
 from django.urls import path
+from django.views.decorators.csrf import csrf_exempt
 from .views import (
     IrrigationDecisionView, 
+    BatchIrrigationDecisionView,
     IrrigationHistoryView,
     ExportHistoryCSVView,
+    IrrigationStatsView,
+    NearbyIrrigationView,
+    SensorReadingsView,
     CropSoilDataView
 )
 
+if settings.ASYNC_VIEWS_ENABLED:
+    # ASGI deployment: native async views for the endpoints that wait on upstream I/O.
+    # Like the DRF views, they do not require a CSRF token.
+    from .async_views import AsyncIrrigationDecisionView, AsyncIrrigationHistoryView
+    irrigation_decision_view = csrf_exempt(AsyncIrrigationDecisionView.as_view())
+    irrigation_history_view = AsyncIrrigationHistoryView.as_view()
+else:
+    irrigation_decision_view = IrrigationDecisionView.as_view()
+    irrigation_history_view = IrrigationHistoryView.as_view()
+
 urlpatterns = [
-    path('irrigation/decision/', IrrigationDecisionView.as_view(), name='irrigation_decision'),
-    path('irrigation/history/', IrrigationHistoryView.as_view(), name='irrigation_history'),
+    path('irrigation/decision/', irrigation_decision_view, name='irrigation_decision'),
+    path('irrigation/decisions/batch/', BatchIrrigationDecisionView.as_view(), name='irrigation_decision_batch'),
+    path('irrigation/history/', irrigation_history_view, name='irrigation_history'),
     path('irrigation/export-csv/', ExportHistoryCSVView.as_view(), name='export_history_csv'),
+    path('irrigation/stats/', IrrigationStatsView.as_view(), name='irrigation_stats'),
+    path('irrigation/nearby/', NearbyIrrigationView.as_view(), name='irrigation_nearby'),
+    path('sensors/readings/', SensorReadingsView.as_view(), name='sensor_readings'),
     path('crops/', CropSoilDataView.as_view(), name='crop_soil_data'),
 ]
@@ -0,0 +1,66 @@
+"""
+Async MongoDB access for Smart Irrigation System
+Runs queries for the ASGI views on motor, so a worker keeps serving other requests
+while MongoDB answers. Without motor (or with MONGODB_ASYNC_DRIVER=thread) the same
+pymongo calls run in worker threads instead.
+"""
+import asyncio
+import weakref
+
+from django.conf import settings
+
+from .mongo_connection import client_options
+
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except ImportError:  # motor is optional, queries then run on pymongo in worker threads
+    AsyncIOMotorClient = None
+
+# Motor clients are bound to the event loop that created them
+_clients = weakref.WeakKeyDictionary()
+
+
+def use_motor():
+    """Returns True if queries run on motor rather than on pymongo in worker threads"""
+    return AsyncIOMotorClient is not None and settings.MONGODB_ASYNC_DRIVER == 'motor'
+
+
+def motor_collection(collection):
+    """
+    Returns the motor counterpart of a pymongo collection for the running event loop
+
+    Args:
+        collection (Collection): pymongo collection, e.g. from LogStore.collection()
+
+    Returns:
+        AsyncIOMotorCollection: Same database and collection on the loop's motor client
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = AsyncIOMotorClient(
+            settings.MONGODB_URI, **client_options(settings.MONGODB_URI, settings.MONGODB_CONNECTION_OPTIONS)
+        )
+    return client[collection.database.name][collection.name]
+
+
+async def find(collection, query, projection=None, sort=None, limit=0):
+    """
+    Runs a find and returns all matching documents
+
+    Args:
+        collection (Collection): pymongo collection to query
+        query (dict): Filter
+        projection (dict): Optional projection
+        sort (list): Optional (field, direction) pairs
+        limit (int): Maximum number of documents (0 for no limit)
+
+    Returns:
+        list: Raw documents
+    """
+    if use_motor():
+        cursor = motor_collection(collection).find(query, projection, sort=sort, limit=limit)
+        return await cursor.to_list(length=None)
+    return await asyncio.to_thread(
+        lambda: list(collection.find(query, projection, sort=sort, limit=limit))
+    )
@@ -0,0 +1,255 @@
+"""
+Batch Decision Engine for Smart Irrigation System
+Applies the compiled decision rules (see decision_rules.py) to columnar NumPy arrays,
+so a whole farm of field zones can be evaluated in a single vectorized pass
+"""
+import logging
+
+import numpy as np
+
+from .decision_rules import CONDITION_INPUTS, PROPORTIONAL_RULES, STATUS_LABELS, compile_crop_rules
+
+logger = logging.getLogger(__name__)
+
+# Status codes produced by the batch engine, indexes into STATUS_LABELS
+STATUS_ACTIVE = 0
+STATUS_PENDING = 1
+STATUS_CANCELLED = 2
+
+# CropRules parameters gathered per zone by the batch engine
+RULE_PARAMETERS = (
+    'dry_step', 'dry_scale', 'dry_cap', 'wet_step', 'wet_scale', 'wet_cap', 'heat_step', 'heat_scale', 'heat_cap',
+    'rain_above', 'rain_factor', 'duration_base', 'duration_step', 'duration_scale', 'duration_cap',
+    'duration_min', 'duration_max'
+)
+
+
+def _rule_column(values, dtype=np.float64):
+    """Returns a per-crop parameter column, or the value itself when all crops share it"""
+    column = np.array(values, dtype=dtype)
+    if len(column) and np.all(column == column[0]):
+        return column[0]
+    return column
+
+
+class CropTable:
+    """
+    Columnar crop data and compiled decision rules, indexed by crop position
+
+    Args:
+        crops (iterable): Crop dictionaries (name, ideal_moisture, ideal_temp, base_water_lph
+                          and optionally decision_rules overrides)
+        rules (dict): Rule set compiled for every crop (default: the proportional rules)
+    """
+
+    def __init__(self, crops, rules=None):
+        crops = list(crops)
+        rules = rules or PROPORTIONAL_RULES
+        self.names = tuple(crop['name'] for crop in crops)
+        self.positions = {name: position for position, name in enumerate(self.names)}
+        self.base_water = np.array([crop['base_water_lph'] for crop in crops], dtype=np.float64)
+        self.moisture_min = np.array([crop['ideal_moisture'][0] for crop in crops], dtype=np.float64)
+        self.moisture_max = np.array([crop['ideal_moisture'][1] for crop in crops], dtype=np.float64)
+        self.temp_max = np.array([crop['ideal_temp'][1] for crop in crops], dtype=np.float64)
+
+        # The decision rules divide by both moisture bounds
+        if np.any(self.moisture_min <= 0) or np.any(self.moisture_max <= 0):
+            raise ValueError("Crop ideal moisture bounds must be positive")
+
+        # Rules compiled once per crop: CropRules for the scalar engine and, for the batch
+        # engine, one column per parameter (a plain float when no crop overrides it)
+        self.rules_version = rules['version']
+        self.crop_rules = tuple(compile_crop_rules(rules, crop) for crop in crops)
+        self.rule_columns = {
+            parameter: _rule_column([getattr(crop_rules, parameter) for crop_rules in self.crop_rules])
+            for parameter in RULE_PARAMETERS
+        }
+        self.default_status = _rule_column(
+            [STATUS_LABELS.index(crop_rules.default_status) for crop_rules in self.crop_rules], dtype=np.int8
+        )
+
+        # Status conditions by position in each crop's list; crops with fewer conditions
+        # get conditions that never hold
+        self.status_conditions = []
+        for position in range(max((len(crop_rules.status) for crop_rules in self.crop_rules), default=0)):
+            conditions = [
+                crop_rules.status[position] if position < len(crop_rules.status) else ('Active', 0, 1.0, np.inf)
+                for crop_rules in self.crop_rules
+            ]
+            self.status_conditions.append((
+                _rule_column([STATUS_LABELS.index(label) for label, _, _, _ in conditions], dtype=np.int8),
+                _rule_column([input_position for _, input_position, _, _ in conditions], dtype=np.intp),
+                _rule_column([sign for _, _, sign, _ in conditions]),
+                _rule_column([threshold for _, _, _, threshold in conditions])
+            ))
+
+    def indices(self, names):
+        """Maps crop names to positions in this table (raises KeyError for unknown crops)"""
+        return np.array([self.positions[name] for name in names], dtype=np.intp)
+
+    def rules_for(self, name):
+        """Returns the compiled rules of a crop (raises KeyError for unknown crops)"""
+        return self.crop_rules[self.positions[name]]
+
+
+class SoilTable:
+    """
+    Columnar soil data, indexed by soil position
+
+    Args:
+        soils (iterable): Soil dictionaries (name, absorption_rate)
+    """
+
+    def __init__(self, soils):
+        soils = list(soils)
+        self.names = tuple(soil['name'] for soil in soils)
+        self.positions = {name: position for position, name in enumerate(self.names)}
+        self.absorption_rate = np.array([soil['absorption_rate'] for soil in soils], dtype=np.float64)
+
+        if np.any(self.absorption_rate <= 0):
+            raise ValueError("Soil absorption rates must be positive")
+
+    def indices(self, names):
+        """Maps soil names to positions in this table (raises KeyError for unknown soils)"""
+        return np.array([self.positions[name] for name in names], dtype=np.intp)
+
+
+def _round_half_even_like_python(values, ndigits):
+    """
+    Rounds an array exactly like the builtin round() does for each element
+
+    np.round scales by 10**ndigits before rounding, which disagrees with round() when the
+    scaled value lands on a .5 boundary that the decimal value does not actually reach
+    (e.g. round(2.675, 2) == 2.67). Only those boundary elements are re-rounded in Python.
+    """
+    scale = 10.0 ** ndigits
+    scaled = values * scale
+    rounded = np.rint(scaled) / scale
+
+    fraction = scaled - np.floor(scaled)
+    boundary = np.flatnonzero(np.abs(fraction - 0.5) < 1e-6)
+    for position in boundary:
+        rounded[position] = round(float(values[position]), ndigits)
+
+    return rounded
+
+
+def _gather(column, index):
+    """Returns a rule column's values for each zone (a shared value as is)"""
+    return column[index] if isinstance(column, np.ndarray) else column
+
+
+def calculate_irrigation_decisions(crop_table, soil_table, crop_index, soil_index,
+                                   soil_moisture, temperature, rain_probability):
+    """
+    Calculates irrigation decisions for many field zones at once
+
+    Evaluates the rules compiled into the crop table and produces exactly the same values
+    as decision_rules.apply_crop_rules applied row by row.
+
+    Args:
+        crop_table (CropTable): Crop data and rules referenced by crop_index
+        soil_table (SoilTable): Soil data referenced by soil_index
+        crop_index (array): Crop position for each zone
+        soil_index (array): Soil position for each zone
+        soil_moisture (array): Sensor soil moisture percentage for each zone
+        temperature (array): Sensor temperature in Celsius for each zone
+        rain_probability (array): Probability of rain percentage for each zone
+
+    Returns:
+        dict: Irrigation decisions as arrays
+            - water_amount: Water amount in liters per hour
+            - duration: Irrigation duration in hours
+            - status: Status codes, see STATUS_LABELS
+            - engine_version: Version of the rule set that produced them
+    """
+    crop_index = np.asarray(crop_index, dtype=np.intp)
+    soil_index = np.asarray(soil_index, dtype=np.intp)
+    current_moisture = np.asarray(soil_moisture, dtype=np.float64)
+    current_temp = np.asarray(temperature, dtype=np.float64)
+    rain_probability = np.asarray(rain_probability, dtype=np.float64)
+
+    # Gather per-zone crop and soil parameters
+    water_amount = crop_table.base_water[crop_index]
+    ideal_moisture_min = crop_table.moisture_min[crop_index]
+    ideal_moisture_max = crop_table.moisture_max[crop_index]
+    ideal_temp_max = crop_table.temp_max[crop_index]
+    soil_absorption = soil_table.absorption_rate[soil_index]
+    rule = {
+        parameter: _gather(column, crop_index) for parameter, column in crop_table.rule_columns.items()
+    }
+
+    # Dry soil increases water and duration with the deficit
+    moisture_low = current_moisture < ideal_moisture_min
+    moisture_deficit = (ideal_moisture_min - current_moisture) / ideal_moisture_min
+    increase_factor = 1.0 + np.minimum(rule['dry_step'] + moisture_deficit / rule['dry_scale'], rule['dry_cap'])
+    water_amount = np.where(moisture_low, water_amount * increase_factor, water_amount)
+
+    # Wet soil decreases water with the excess
+    moisture_high = ~moisture_low & (current_moisture > ideal_moisture_max)
+    moisture_excess = (current_moisture - ideal_moisture_max) / ideal_moisture_max
+    decrease_factor = 1.0 - np.minimum(rule['wet_step'] + moisture_excess / rule['wet_scale'], rule['wet_cap'])
+    water_amount = np.where(moisture_high, water_amount * decrease_factor, water_amount)
+
+    # High temperature increases water
+    temp_high = current_temp > ideal_temp_max
+    temp_excess = np.minimum(rule['heat_step'] + (current_temp - ideal_temp_max) / rule['heat_scale'], rule['heat_cap'])
+    water_amount = np.where(temp_high, water_amount * (1.0 + temp_excess), water_amount)
+
+    # High rain probability reduces water
+    water_amount = np.where(
+        rain_probability > rule['rain_above'], water_amount * rule['rain_factor'], water_amount
+    )
+
+    # Lower absorption rate means more water needed
+    water_amount = water_amount / soil_absorption
+
+    duration_factor = 1.0 + np.minimum(
+        rule['duration_step'] + moisture_deficit / rule['duration_scale'], rule['duration_cap']
+    )
+    duration = np.where(moisture_low, rule['duration_base'] * duration_factor, rule['duration_base'])
+    duration = np.maximum(rule['duration_min'], np.minimum(duration, rule['duration_max']))
+
+    # Status conditions are applied last to first, so the first that holds wins
+    status = np.broadcast_to(_gather(crop_table.default_status, crop_index), current_moisture.shape)
+    inputs = dict(zip(CONDITION_INPUTS, (current_moisture, current_temp, rain_probability)))
+    for status_code, input_position, sign, threshold in reversed(crop_table.status_conditions):
+        if isinstance(input_position, np.ndarray):
+            values = np.choose(input_position[crop_index], list(inputs.values()))
+        else:
+            values = inputs[CONDITION_INPUTS[input_position]]
+        holds = _gather(sign, crop_index) * values > _gather(threshold, crop_index)
+        status = np.where(holds, _gather(status_code, crop_index), status)
+
+    return {
+        'water_amount': _round_half_even_like_python(water_amount, 2),
+        'duration': _round_half_even_like_python(duration, 1),
+        'status': np.asarray(status, dtype=np.int8),
+        'engine_version': crop_table.rules_version
+    }
+
+
+def decisions_to_dicts(decisions):
+    """
+    Converts batch decision arrays into the per-zone dictionaries of the scalar engine
+
+    Args:
+        decisions (dict): Output of calculate_irrigation_decisions
+
+    Returns:
+        list: Decision dictionaries (water_amount, duration, status, engine_version)
+    """
+    engine_version = decisions['engine_version']
+    return [
+        {
+            'water_amount': water_amount,
+            'duration': duration,
+            'status': STATUS_LABELS[status_code],
+            'engine_version': engine_version
+        }
+        for water_amount, duration, status_code in zip(
+            decisions['water_amount'].tolist(),
+            decisions['duration'].tolist(),
+            decisions['status'].tolist()
+        )
+    ]
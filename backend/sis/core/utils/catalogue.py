@@ -0,0 +1,235 @@
+"""
+Crop and soil catalogue for Smart Irrigation System
+Keeps an immutable, indexed in-memory snapshot of the crop and soil reference data,
+so the decision path never reads reference data from MongoDB
+"""
+import logging
+import threading
+import time
+from types import MappingProxyType
+
+from django.conf import settings
+
+from ..models import CatalogueVersion, Crop, Soil
+from .batch_engine import CropTable, SoilTable
+from .decision_rules import PROPORTIONAL_RULES, RULE_SETS, validate_overrides
+
+logger = logging.getLogger(__name__)
+
+
+def _freeze(record):
+    """Returns a read-only copy of a crop or soil record with tuple ranges"""
+    return MappingProxyType({
+        key: tuple(value) if isinstance(value, list) else value
+        for key, value in record.items()
+    })
+
+
+class Catalogue:
+    """
+    Immutable snapshot of the crop and soil catalogue
+
+    Attributes:
+        crops (Mapping): Crop records by name
+        soils (Mapping): Soil records by name
+        version (int): Catalogue version stamp the snapshot was loaded at (None for defaults)
+        crop_table (CropTable): Columnar crop data and proportional rules for the batch
+                                decision engine
+        soil_table (SoilTable): Columnar soil data for the batch decision engine
+    """
+
+    def __init__(self, crops, soils, version):
+        self.crops = MappingProxyType({crop['name']: _freeze(crop) for crop in crops})
+        self.soils = MappingProxyType({soil['name']: _freeze(soil) for soil in soils})
+        self.version = version
+        self.crop_table = CropTable(self.crops.values(), PROPORTIONAL_RULES)
+        self.soil_table = SoilTable(self.soils.values())
+        self._crop_tables = {PROPORTIONAL_RULES['version']: self.crop_table}
+        self._lock = threading.Lock()
+
+    def crop_table_for(self, rules_version):
+        """
+        Returns the crop table with the rules of a rule set compiled for every crop
+
+        Tables are compiled on first use and kept for the lifetime of the snapshot, so a
+        catalogue reload (e.g. after a crop's decision_rules changed) recompiles them.
+
+        Args:
+            rules_version (str): Version of a rule set in decision_rules.RULE_SETS
+
+        Returns:
+            CropTable: Compiled crop table
+        """
+        crop_table = self._crop_tables.get(rules_version)
+        if crop_table is None:
+            with self._lock:
+                crop_table = self._crop_tables.get(rules_version)
+                if crop_table is None:
+                    crop_table = CropTable(self.crops.values(), RULE_SETS[rules_version])
+                    self._crop_tables[rules_version] = crop_table
+        return crop_table
+
+
+def _crop_rule_overrides(crop):
+    """Returns a crop's decision rule overrides, or None if it has none or they are invalid"""
+    if not crop.decision_rules:
+        return None
+    try:
+        validate_overrides(crop.decision_rules)
+        return crop.decision_rules
+    except ValueError as e:
+        logger.error(f"Ignoring invalid decision rules of crop {crop.name}: {str(e)}")
+        return None
+
+
+def load_catalogue():
+    """
+    Loads all crops and soils from MongoDB into a new snapshot
+
+    Returns:
+        Catalogue: Loaded snapshot, or None when MongoDB is unavailable or has not
+                   been populated yet
+    """
+    try:
+        # Read the version first so a concurrent change triggers another reload
+        version = CatalogueVersion.current()
+        crops = [
+            {
+                'name': crop.name,
+                'ideal_moisture': crop.ideal_moisture,
+                'ideal_temp': crop.ideal_temp,
+                'base_water_lph': crop.base_water_lph,
+                'decision_rules': _crop_rule_overrides(crop)
+            }
+            for crop in Crop.objects
+        ]
+        soils = [
+            {
+                'name': soil.name,
+                'absorption_rate': soil.absorption_rate
+            }
+            for soil in Soil.objects
+        ]
+    except Exception as e:
+        logger.error(f"Error loading catalogue from MongoDB: {str(e)}")
+        return None
+
+    if not crops or not soils:
+        logger.warning("Catalogue collections are empty")
+        return None
+    logger.info(f"Loaded catalogue version {version}: {len(crops)} crops, {len(soils)} soils")
+    return Catalogue(crops, soils, version)
+
+
+def default_catalogue():
+    """
+    Builds a snapshot of the default crop and soil data
+
+    Returns:
+        Catalogue: Snapshot without a version
+    """
+    from .crop_database import DEFAULT_CROPS, DEFAULT_SOILS
+
+    return Catalogue(
+        [dict(data, name=name) for name, data in DEFAULT_CROPS.items()],
+        [dict(data, name=name) for name, data in DEFAULT_SOILS.items()],
+        version=None
+    )
+
+
+class CatalogueService:
+    """
+    Serves the current catalogue snapshot and refreshes it in the background
+
+    The snapshot is loaded on first use. Afterwards the version stamp is checked at
+    most once per refresh interval, in a background thread, and the snapshot is only
+    reloaded when the stamp has changed. Callers always get a snapshot immediately.
+    A reload that fails keeps the current snapshot; the default crop and soil data
+    are only used when no catalogue could be loaded yet.
+
+    Args:
+        refresh_interval (float): Seconds between version stamp checks
+    """
+
+    def __init__(self, refresh_interval=60.0):
+        self.refresh_interval = refresh_interval
+        self._snapshot = None
+        self._fallback = None  # snapshot served again if a reload after invalidate() fails
+        self._checked_at = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        Returns the current catalogue snapshot
+
+        Returns:
+            Catalogue: Current snapshot
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    catalogue = load_catalogue()
+                    if catalogue is None:
+                        catalogue = self._fallback
+                    if catalogue is None:
+                        logger.warning("Using default crop and soil data until the catalogue loads")
+                        catalogue = default_catalogue()
+                    self._snapshot = catalogue
+                    self._fallback = None
+                    self._checked_at = time.monotonic()
+                return self._snapshot
+
+        if time.monotonic() - self._checked_at >= self.refresh_interval:
+            self._schedule_refresh()
+        return snapshot
+
+    def _schedule_refresh(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+            self._checked_at = time.monotonic()
+        threading.Thread(target=self._refresh, name='catalogue-refresh', daemon=True).start()
+
+    def _refresh(self):
+        try:
+            if CatalogueVersion.current() != self._snapshot.version:
+                catalogue = load_catalogue()
+                if catalogue is not None:
+                    self._snapshot = catalogue
+        except Exception as e:
+            logger.warning(f"Error checking catalogue version: {str(e)}")
+        finally:
+            self._refreshing = False
+
+    def invalidate(self):
+        """Drops the snapshot so the next call reloads it (or keeps it if the reload fails)"""
+        with self._lock:
+            self._fallback = self._snapshot or self._fallback
+            self._snapshot = None
+
+
+_catalogue_service = None
+_catalogue_service_lock = threading.Lock()
+
+
+def get_catalogue_service():
+    """Returns the process-wide catalogue service"""
+    global _catalogue_service
+    if _catalogue_service is None:
+        with _catalogue_service_lock:
+            if _catalogue_service is None:
+                _catalogue_service = CatalogueService(settings.CATALOGUE_REFRESH_INTERVAL)
+    return _catalogue_service
+
+
+def get_catalogue():
+    """
+    Returns the current crop and soil catalogue snapshot
+
+    Returns:
+        Catalogue: Current snapshot
+    """
+    return get_catalogue_service().get()
@@ -1,6 +1,7 @@
 """
 Crop and Soil Database for Smart Irrigation System
 Provides initial data and functions to populate the database with crop and soil information
+Lookups are served from the in-memory catalogue (see catalogue.py)
 """
 import logging
 from ..models import Crop, Soil
@@ -115,6 +116,12 @@ def populate_default_data():
                 logger.info(f"Added soil: {soil_name}")
         
         logger.info(f"Database populated with {crops_added} crops and {soils_added} soils")
+        
+        # Reload the in-process catalogue (other processes follow the version stamp)
+        if crops_added or soils_added:
+            from .catalogue import get_catalogue_service
+            get_catalogue_service().invalidate()
+        
         return crops_added, soils_added
         
     except Exception as e:
@@ -123,7 +130,7 @@ def populate_default_data():
 
 def get_crop_data(crop_name):
     """
-    Gets crop data from the database
+    Gets crop data from the in-memory catalogue
     
     Args:
         crop_name (str): Name of the crop
@@ -131,23 +138,21 @@ def get_crop_data(crop_name):
     Returns:
         dict: Crop data or None if not found
     """
-    try:
-        crop = Crop.objects(name=crop_name).first()
-        if crop:
-            return {
-                "name": crop.name,
-                "ideal_moisture": crop.ideal_moisture,
-                "ideal_temp": crop.ideal_temp,
-                "base_water_lph": crop.base_water_lph
-            }
-        return None
-    except Exception as e:
-        logger.error(f"Error getting crop data: {str(e)}")
-        return None
+    from .catalogue import get_catalogue
+    
+    crop = get_catalogue().crops.get(crop_name)
+    if crop:
+        return {
+            "name": crop["name"],
+            "ideal_moisture": list(crop["ideal_moisture"]),
+            "ideal_temp": list(crop["ideal_temp"]),
+            "base_water_lph": crop["base_water_lph"]
+        }
+    return None
 
 def get_soil_data(soil_name):
     """
-    Gets soil data from the database
+    Gets soil data from the in-memory catalogue
     
     Args:
         soil_name (str): Name of the soil
@@ -155,14 +160,12 @@ def get_soil_data(soil_name):
     Returns:
         dict: Soil data or None if not found
     """
-    try:
-        soil = Soil.objects(name=soil_name).first()
-        if soil:
-            return {
-                "name": soil.name,
-                "absorption_rate": soil.absorption_rate
-            }
-        return None
-    except Exception as e:
-        logger.error(f"Error getting soil data: {str(e)}")
-        return None
+    from .catalogue import get_catalogue
+    
+    soil = get_catalogue().soils.get(soil_name)
+    if soil:
+        return {
+            "name": soil["name"],
+            "absorption_rate": soil["absorption_rate"]
+        }
+    return None
@@ -0,0 +1,113 @@
+"""
+CSV export helpers for Smart Irrigation System
+Streams irrigation logs as CSV chunks in constant memory, optionally gzip-compressed
+"""
+import csv
+import io
+import logging
+import zlib
+
+logger = logging.getLogger(__name__)
+
+CSV_HEADER = [
+    'Timestamp', 'Crop Type', 'Soil Type', 'Latitude', 'Longitude',
+    'Soil Moisture (%)', 'Sensor Temp (°C)', 'Sensor Humidity (%)',
+    'Weather Temp (°C)', 'Weather Humidity (%)', 'Rain Probability (%)',
+    'Water Amount (L/h)', 'Duration (h)', 'Status', 'Engine Version'
+]
+
+# Only the fields written to the CSV are read from MongoDB
+CSV_PROJECTION = {
+    '_id': 0,
+    'timestamp': 1,
+    'crop_type': 1,
+    'soil_type': 1,
+    'latitude': 1,
+    'longitude': 1,
+    'sensor_data': 1,
+    'weather_data': 1,
+    'decision': 1
+}
+
+
+def csv_row(log):
+    """
+    Converts a raw irrigation log document (or in-memory log entry) into a CSV row
+
+    Args:
+        log (dict): Irrigation log with nested sensor_data, weather_data and decision
+
+    Returns:
+        list: CSV row in CSV_HEADER order
+    """
+    timestamp = log['timestamp']
+    sensor_data = log['sensor_data']
+    weather_data = log['weather_data']
+    decision = log['decision']
+    return [
+        timestamp if isinstance(timestamp, str) else timestamp.isoformat(),
+        log['crop_type'],
+        log['soil_type'],
+        log['latitude'],
+        log['longitude'],
+        sensor_data['soil_moisture'],
+        sensor_data['temperature'],
+        sensor_data['humidity'],
+        weather_data['temperature'],
+        weather_data['humidity'],
+        weather_data['rain_probability'],
+        decision['water_amount'],
+        decision['duration'],
+        decision['status'],
+        decision.get('engine_version', '')
+    ]
+
+
+def iter_csv_chunks(logs, chunk_rows=1000):
+    """
+    Yields the CSV export as text chunks of up to chunk_rows rows
+
+    Args:
+        logs (iterable): Irrigation logs, consumed lazily
+        chunk_rows (int): Number of rows per yielded chunk
+
+    Yields:
+        str: CSV text, starting with the header row
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    rows = 0
+
+    try:
+        for log in logs:
+            writer.writerow(csv_row(log))
+            rows += 1
+            if rows % chunk_rows == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+    except Exception as e:
+        # Headers are already sent, so the export can only be cut short
+        logger.error(f"Error streaming CSV export after {rows} rows: {str(e)}")
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks, encoding='utf-8'):
+    """
+    Compresses text chunks into a gzip stream without buffering the whole output
+
+    Args:
+        chunks (iterable): Text chunks
+
+    Yields:
+        bytes: Gzip-compressed data
+    """
+    compressor = zlib.compressobj(wbits=31)  # 31 selects the gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk.encode(encoding))
+        if compressed:
+            yield compressed
+    yield compressor.flush()
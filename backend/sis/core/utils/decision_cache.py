@@ -0,0 +1,161 @@
+"""
+Decision cache for Smart Irrigation System
+Memoizes single irrigation decisions on their quantized inputs: many fields share a crop
+and soil and report readings rounded to 0.1, so many decisions repeat one computed earlier.
+Batches do not go through the cache: the vectorized batch engine evaluates a row faster
+than a cache lookup (or even a deduplication pass) takes.
+"""
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .decision_rules import apply_crop_rules
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Inputs are rounded to 1 / STEPS_PER_UNIT (0.1) before the lookup and the evaluation;
+# quantized values are kept as integer step counts and divided back, which gives the
+# exact float of the rounded value (45.3, not 453 * 0.1 = 45.300000000000004)
+STEPS_PER_UNIT = 10
+
+
+def quantize(value):
+    """Returns the number of 0.1 steps closest to value"""
+    return int(round(value * STEPS_PER_UNIT))
+
+
+class DecisionCache:
+    """
+    LRU cache of irrigation decisions, keyed on the rule version and quantized inputs
+
+    Decisions are computed from the quantized inputs, so a cached decision is exactly
+    what the rules return for its key. The rule version identifies everything else a
+    decision depends on (rule set and crop/soil catalogue version, which also covers
+    per-crop rule overrides): entries of a superseded version are never hit again and
+    age out, or are dropped at once with invalidate(version).
+
+    Args:
+        max_entries (int): Maximum number of decisions kept
+    """
+
+    def __init__(self, max_entries=65536):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def decide(self, rule_version, crop_rules, soil_data, sensor_data, weather_data):
+        """
+        Returns the decision of the crop's compiled rules for quantized inputs
+
+        Args:
+            rule_version (str): Version of the rules and catalogue crop_rules were compiled from
+            crop_rules (CropRules): Compiled rules of the crop
+            soil_data (dict): Soil record (with name)
+            sensor_data (dict): soil_moisture and temperature are part of the key
+            weather_data (dict): rain_probability is part of the key
+
+        Returns:
+            dict: Irrigation decision (water_amount, duration, status, engine_version)
+        """
+        moisture = quantize(sensor_data['soil_moisture'])
+        temperature = quantize(sensor_data['temperature'])
+        rain = quantize(weather_data['rain_probability'])
+        key = (rule_version, crop_rules.name, soil_data['name'], moisture, temperature, rain)
+
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if value is None:
+            decision = apply_crop_rules(
+                crop_rules,
+                soil_data['absorption_rate'],
+                moisture / STEPS_PER_UNIT,
+                temperature / STEPS_PER_UNIT,
+                rain / STEPS_PER_UNIT
+            )
+            value = (decision['water_amount'], decision['duration'], decision['status'], decision['engine_version'])
+            self._store(key, value)
+        return {'water_amount': value[0], 'duration': value[1], 'status': value[2], 'engine_version': value[3]}
+
+    def invalidate(self, rule_version=None):
+        """
+        Drops cached decisions
+
+        Args:
+            rule_version (str): Only drop decisions of this rule version (default: all)
+        """
+        with self._lock:
+            if rule_version is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == rule_version]:
+                    del self._entries[key]
+
+    def stats(self):
+        """
+        Returns cache counters
+
+        Returns:
+            dict: hits, misses, hit_rate, evictions and current size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'size': len(self._entries)
+            }
+
+
+_decision_cache = None
+_decision_cache_lock = threading.Lock()
+
+
+def get_decision_cache():
+    """
+    Returns the process-wide decision cache configured from settings
+
+    Returns:
+        DecisionCache: Shared cache instance or None if memoization is disabled
+    """
+    global _decision_cache
+    if not settings.DECISION_CACHE_ENABLED:
+        return None
+    if _decision_cache is None:
+        with _decision_cache_lock:
+            if _decision_cache is None:
+                _decision_cache = DecisionCache(max_entries=settings.DECISION_CACHE_MAX_ENTRIES)
+    return _decision_cache
+
+
+def _decision_cache_stat(name):
+    return lambda: _decision_cache.stats()[name] if _decision_cache is not None else None
+
+
+REGISTRY.gauge('sis_decision_cache_hits', "Decisions served from the decision cache", _decision_cache_stat('hits'))
+REGISTRY.gauge('sis_decision_cache_misses', "Decisions the engine had to compute", _decision_cache_stat('misses'))
+REGISTRY.gauge('sis_decision_cache_size', "Decisions held in the decision cache", _decision_cache_stat('size'))
+REGISTRY.gauge('sis_decision_cache_hit_rate', "Share of decision lookups served from the cache",
+               _decision_cache_stat('hit_rate'), aggregate='mean')
+REGISTRY.gauge('sis_decision_cache_evictions', "Decisions evicted from the decision cache",
+               _decision_cache_stat('evictions'))
@@ -0,0 +1,367 @@
+"""
+Decision Rules for Smart Irrigation System
+Expresses the irrigation rules as declarative data (thresholds, factors, caps and status
+conditions) and compiles them, once per crop, into the parameters evaluated by the scalar
+decision engine and the vectorized batch engine
+
+A rule set is a dict:
+    - dry_soil: Applies when soil moisture is below the crop's ideal minimum; the water is
+                multiplied by 1 + min(step + deficit / scale, cap), where deficit is relative
+                to the ideal minimum
+    - wet_soil: Applies when soil moisture is above the crop's ideal maximum; the water is
+                multiplied by 1 - min(step + excess / scale, cap), excess relative to the maximum
+    - heat: Applies when the temperature is above the crop's ideal maximum; the water is
+            multiplied by 1 + min(step + excess / scale, cap), excess in degrees Celsius
+    - rain: The water is multiplied by factor when the rain probability is above a percentage
+    - duration: base hours, multiplied by 1 + min(step + deficit / scale, cap) on dry soil and
+                clamped between min and max
+    - status: default status and ordered conditions, the first that holds sets the status;
+              a condition compares an input with a threshold, either absolute or a multiple
+              of the crop's ideal minimum or maximum for that input (relative_to)
+
+A scale or cap of None leaves that part out (a flat step, an uncapped adjustment). Crops can
+override any parameter with their decision_rules; status conditions are replaced as a whole.
+"""
+import copy
+import logging
+import math
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+# Decision statuses, in the order of the batch engine's status codes
+STATUS_LABELS = ('Active', 'Pending', 'Cancelled')
+
+# Inputs that status conditions can compare, in the order of CropRules.status input positions
+CONDITION_INPUTS = ('soil_moisture', 'temperature', 'rain_probability')
+
+# Crop ideal range used by conditions relative to an input's ideal minimum or maximum
+IDEAL_RANGES = {'soil_moisture': 'ideal_moisture', 'temperature': 'ideal_temp'}
+
+# Rules of the proportional decision engine (decision_engine / batch_engine)
+PROPORTIONAL_RULES = {
+    'version': 'proportional-1',
+    'dry_soil': {'step': 0.0, 'scale': 1.0, 'cap': 0.5},
+    'wet_soil': {'step': 0.0, 'scale': 1.0, 'cap': 0.5},
+    'heat': {'step': 0.0, 'scale': 10.0, 'cap': 0.3},
+    'rain': {'above': 60.0, 'factor': 0.5},
+    'duration': {'base': 2.0, 'step': 0.0, 'scale': 1.0, 'cap': None, 'min': 0.5, 'max': 4.0},
+    'status': {
+        'default': 'Active',
+        'conditions': [
+            {'status': 'Pending', 'input': 'rain_probability', 'above': 80.0},
+            {'status': 'Cancelled', 'input': 'soil_moisture', 'above': 1.2, 'relative_to': 'ideal_max'}
+        ]
+    }
+}
+
+# Rules of the simplified demo engine: flat adjustments and a fixed 2 or 3 hour duration
+SIMPLIFIED_RULES = {
+    'version': 'simplified-1',
+    'dry_soil': {'step': 0.2, 'scale': None, 'cap': None},
+    'wet_soil': {'step': 0.2, 'scale': None, 'cap': None},
+    'heat': {'step': 0.1, 'scale': None, 'cap': None},
+    'rain': {'above': 60.0, 'factor': 0.5},
+    'duration': {'base': 2.0, 'step': 0.5, 'scale': None, 'cap': None, 'min': None, 'max': None},
+    'status': {
+        'default': 'Active',
+        'conditions': [
+            {'status': 'Pending', 'input': 'rain_probability', 'above': 80.0},
+            {'status': 'Cancelled', 'input': 'soil_moisture', 'above': 1.2, 'relative_to': 'ideal_max'}
+        ]
+    }
+}
+
+RULE_SETS = {rules['version']: rules for rules in (PROPORTIONAL_RULES, SIMPLIFIED_RULES)}
+
+# Decision returned when the inputs cannot be evaluated
+FALLBACK_DECISION = {'water_amount': 1.0, 'duration': 2.0, 'status': 'Pending', 'engine_version': 'fallback'}
+
+_ADJUSTMENTS = ('dry_soil', 'wet_soil', 'heat')
+_SECTION_KEYS = {
+    'dry_soil': ('step', 'scale', 'cap'),
+    'wet_soil': ('step', 'scale', 'cap'),
+    'heat': ('step', 'scale', 'cap'),
+    'rain': ('above', 'factor'),
+    'duration': ('base', 'step', 'scale', 'cap', 'min', 'max'),
+    'status': ('default', 'conditions')
+}
+_OPTIONAL_KEYS = {'scale', 'cap', 'min', 'max'}
+
+
+class CropRules(NamedTuple):
+    """Rule set compiled for one crop: every threshold, factor and cap as a float"""
+    name: str
+    version: str  # rule set version, recorded with every decision as its engine_version
+    base_water: float
+    moisture_min: float
+    moisture_max: float
+    temp_max: float
+    dry_step: float
+    dry_scale: float
+    dry_cap: float
+    wet_step: float
+    wet_scale: float
+    wet_cap: float
+    heat_step: float
+    heat_scale: float
+    heat_cap: float
+    rain_above: float
+    rain_factor: float
+    duration_base: float
+    duration_step: float
+    duration_scale: float
+    duration_cap: float
+    duration_min: float
+    duration_max: float
+    default_status: str
+    status: tuple  # (status, input position, sign, threshold): sign * input > threshold
+
+
+def _number(value, name, optional=False):
+    if value is None and optional:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError(f"{name} must be a finite number{' or null' if optional else ''}")
+    return float(value)
+
+
+def _validate_condition(condition, name):
+    if not isinstance(condition, dict):
+        raise ValueError(f"{name} must be an object")
+    unknown = set(condition) - {'status', 'input', 'above', 'below', 'relative_to'}
+    if unknown:
+        raise ValueError(f"{name} has unknown keys: {', '.join(sorted(unknown))}")
+    if condition.get('status') not in STATUS_LABELS:
+        raise ValueError(f"{name}.status must be one of {', '.join(STATUS_LABELS)}")
+    if condition.get('input') not in CONDITION_INPUTS:
+        raise ValueError(f"{name}.input must be one of {', '.join(CONDITION_INPUTS)}")
+    if ('above' in condition) == ('below' in condition):
+        raise ValueError(f"{name} needs exactly one of above and below")
+    _number(condition.get('above', condition.get('below')), f"{name}.{'above' if 'above' in condition else 'below'}")
+    relative_to = condition.get('relative_to')
+    if relative_to is not None:
+        if relative_to not in ('ideal_min', 'ideal_max'):
+            raise ValueError(f"{name}.relative_to must be ideal_min or ideal_max")
+        if condition['input'] not in IDEAL_RANGES:
+            raise ValueError(f"{name}: {condition['input']} has no ideal range")
+
+
+def validate_rules(rules):
+    """
+    Checks that a rule set is complete and consistent
+
+    Args:
+        rules (dict): Rule set
+
+    Raises:
+        ValueError: Describing the first problem found
+    """
+    if not isinstance(rules, dict):
+        raise ValueError("Rules must be an object")
+    if not isinstance(rules.get('version'), str) or not rules['version']:
+        raise ValueError("Rules need a version")
+    for section, keys in _SECTION_KEYS.items():
+        values = rules.get(section)
+        if not isinstance(values, dict):
+            raise ValueError(f"Rules need a {section} section")
+        missing = [key for key in keys if key not in values]
+        unknown = set(values) - set(keys)
+        if missing or unknown:
+            raise ValueError(f"Rules section {section} must have exactly: {', '.join(keys)}")
+        if section == 'status':
+            continue
+        for key in keys:
+            value = _number(values[key], f"{section}.{key}", optional=key in _OPTIONAL_KEYS)
+            if value is not None and value < 0 and key != 'above':
+                raise ValueError(f"{section}.{key} must not be negative")
+            if key == 'scale' and value == 0:
+                raise ValueError(f"{section}.scale must be positive")
+
+    # A wet soil reduction of more than 100 % would make the water amount negative
+    wet_soil = rules['wet_soil']
+    if wet_soil['cap'] is not None:
+        largest_reduction = wet_soil['cap']
+    elif wet_soil['scale'] is None:
+        largest_reduction = wet_soil['step']
+    else:
+        largest_reduction = math.inf
+    if largest_reduction > 1.0:
+        raise ValueError("wet_soil must reduce water by at most 100% (cap of at most 1)")
+    duration = rules['duration']
+    if duration['base'] == 0:
+        raise ValueError("duration.base must be positive")
+    if duration['min'] is not None and duration['max'] is not None and duration['min'] > duration['max']:
+        raise ValueError("duration.min must not exceed duration.max")
+
+    status = rules['status']
+    if status['default'] not in STATUS_LABELS:
+        raise ValueError(f"status.default must be one of {', '.join(STATUS_LABELS)}")
+    if not isinstance(status['conditions'], list):
+        raise ValueError("status.conditions must be a list")
+    for position, condition in enumerate(status['conditions']):
+        _validate_condition(condition, f"status.conditions[{position}]")
+
+
+def merge_rules(rules, overrides):
+    """
+    Applies a crop's overrides to a rule set
+
+    Args:
+        rules (dict): Base rule set
+        overrides (dict): Parameters to replace, by section (status conditions as a whole)
+
+    Returns:
+        dict: New, validated rule set with the base version
+
+    Raises:
+        ValueError: If the overrides are malformed or make the rule set invalid
+    """
+    merged = copy.deepcopy(rules)
+    if not overrides:
+        return merged
+    if not isinstance(overrides, dict):
+        raise ValueError("Rule overrides must be an object")
+    for section, values in overrides.items():
+        if section not in _SECTION_KEYS:
+            raise ValueError(f"Unknown rules section: {section}")
+        if not isinstance(values, dict):
+            raise ValueError(f"Rule overrides of {section} must be an object")
+        for key, value in values.items():
+            if key not in _SECTION_KEYS[section]:
+                raise ValueError(f"Unknown rule {section}.{key}")
+            merged[section][key] = copy.deepcopy(value)
+    validate_rules(merged)
+    return merged
+
+
+def validate_overrides(overrides):
+    """
+    Checks crop overrides against every known rule set
+
+    Raises:
+        ValueError: If the overrides are invalid for any rule set
+    """
+    for version, rules in RULE_SETS.items():
+        try:
+            merge_rules(rules, overrides)
+        except ValueError as e:
+            raise ValueError(f"{str(e)} (rule set {version})")
+
+
+def _or_infinity(value, sign=1.0):
+    return sign * math.inf if value is None else float(value)
+
+
+def compile_crop_rules(rules, crop_data):
+    """
+    Compiles a rule set, with the crop's overrides applied, for one crop
+
+    Args:
+        rules (dict): Validated rule set
+        crop_data (dict): Crop record (name, ideal_moisture, ideal_temp, base_water_lph and
+                          optionally decision_rules overrides)
+
+    Returns:
+        CropRules: Compiled rules
+
+    Raises:
+        ValueError: If the crop's overrides are invalid
+    """
+    overrides = crop_data.get('decision_rules')
+    if overrides:
+        rules = merge_rules(rules, overrides)
+    bounds = {'ideal_moisture': crop_data['ideal_moisture'], 'ideal_temp': crop_data['ideal_temp']}
+
+    status = []
+    for condition in rules['status']['conditions']:
+        above = 'above' in condition
+        threshold = condition['above'] if above else condition['below']
+        if condition.get('relative_to'):
+            bound = bounds[IDEAL_RANGES[condition['input']]][1 if condition['relative_to'] == 'ideal_max' else 0]
+            threshold = bound * threshold
+        # input < threshold is evaluated as -input > -threshold
+        status.append((
+            condition['status'],
+            CONDITION_INPUTS.index(condition['input']),
+            1.0 if above else -1.0,
+            float(threshold) if above else -float(threshold)
+        ))
+
+    adjustments = []
+    for section in _ADJUSTMENTS:
+        values = rules[section]
+        adjustments += [float(values['step']), _or_infinity(values['scale']), _or_infinity(values['cap'])]
+    duration = rules['duration']
+
+    return CropRules(
+        crop_data['name'],
+        rules['version'],
+        crop_data['base_water_lph'],
+        crop_data['ideal_moisture'][0],
+        crop_data['ideal_moisture'][1],
+        crop_data['ideal_temp'][1],
+        *adjustments,
+        float(rules['rain']['above']),
+        float(rules['rain']['factor']),
+        float(duration['base']),
+        float(duration['step']),
+        _or_infinity(duration['scale']),
+        _or_infinity(duration['cap']),
+        _or_infinity(duration['min'], -1.0),
+        _or_infinity(duration['max']),
+        rules['status']['default'],
+        tuple(status)
+    )
+
+
+def apply_crop_rules(crop_rules, absorption_rate, soil_moisture, temperature, rain_probability):
+    """
+    Evaluates compiled crop rules for one field zone
+
+    Args:
+        crop_rules (CropRules): Compiled rules of the zone's crop
+        absorption_rate (float): Soil absorption coefficient (0-1)
+        soil_moisture (float): Soil moisture percentage
+        temperature (float): Temperature in Celsius
+        rain_probability (float): Probability of rain percentage
+
+    Returns:
+        dict: Irrigation decision (water_amount, duration, status, engine_version)
+    """
+    (_, version, water_amount, moisture_min, moisture_max, temp_max, dry_step, dry_scale, dry_cap, wet_step, wet_scale,
+     wet_cap, heat_step, heat_scale, heat_cap, rain_above, rain_factor, duration, duration_step, duration_scale,
+     duration_cap, duration_min, duration_max, decision_status, conditions) = crop_rules
+
+    if soil_moisture < moisture_min:
+        moisture_deficit = (moisture_min - soil_moisture) / moisture_min
+        water_amount *= 1.0 + min(dry_step + moisture_deficit / dry_scale, dry_cap)
+        duration *= 1.0 + min(duration_step + moisture_deficit / duration_scale, duration_cap)
+    elif soil_moisture > moisture_max:
+        moisture_excess = (soil_moisture - moisture_max) / moisture_max
+        water_amount *= 1.0 - min(wet_step + moisture_excess / wet_scale, wet_cap)
+
+    if temperature > temp_max:
+        water_amount *= 1.0 + min(heat_step + (temperature - temp_max) / heat_scale, heat_cap)
+
+    if rain_probability > rain_above:
+        water_amount *= rain_factor
+
+    # Lower absorption rate means more water needed
+    water_amount /= absorption_rate
+    duration = max(duration_min, min(duration, duration_max))
+
+    # The first status condition that holds sets the status
+    if conditions:
+        inputs = (soil_moisture, temperature, rain_probability)
+        for label, position, sign, threshold in conditions:
+            if sign * inputs[position] > threshold:
+                decision_status = label
+                break
+
+    return {
+        'water_amount': round(water_amount, 2),
+        'duration': round(duration, 1),
+        'status': decision_status,
+        'engine_version': version
+    }
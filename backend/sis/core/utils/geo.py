@@ -0,0 +1,101 @@
+"""
+Geospatial helpers for Smart Irrigation System
+Builds GeoJSON points and the $geoWithin filters behind the nearby-fields endpoint,
+with matching in-process tests for the in-memory history fallback
+"""
+import math
+
+# Mean Earth radius (IUGG) in meters, converting radii to $centerSphere radians the same
+# way haversine_distance measures the in-memory fallback
+EARTH_RADIUS_M = 6371008.8
+
+
+def geo_point(latitude, longitude):
+    """
+    Builds a GeoJSON point (coordinates are longitude first)
+
+    Returns:
+        dict: GeoJSON Point
+    """
+    return {'type': 'Point', 'coordinates': [longitude, latitude]}
+
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in meters"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def _point_in_polygon(latitude, longitude, ring):
+    """Ray casting test on a ring of (longitude, latitude) pairs"""
+    inside = False
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:]):
+        if (y1 > latitude) != (y2 > latitude):
+            crossing = x1 + (latitude - y1) * (x2 - x1) / (y2 - y1)
+            if longitude < crossing:
+                inside = not inside
+    return inside
+
+
+def _parse_coordinate(value, name, limit):
+    try:
+        coordinate = float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+    if not -limit <= coordinate <= limit:
+        raise ValueError(f"{name} must be between -{limit} and {limit}")
+    return coordinate
+
+
+def parse_area(query_params, max_radius):
+    """
+    Builds a geospatial filter from request query parameters
+
+    Either a circle (lat, lon and radius in meters) or a polygon given as
+    'lat,lon;lat,lon;...' with at least three corners (the ring is closed automatically).
+
+    Args:
+        query_params (QueryDict): lat, lon, radius or polygon
+        max_radius (float): Largest accepted radius in meters
+
+    Returns:
+        tuple: (filter, contains) - a MongoDB filter on 'location' and a
+               contains(latitude, longitude) predicate for in-memory logs
+
+    Raises:
+        ValueError: If the area is missing or malformed
+    """
+    polygon = query_params.get('polygon')
+    if polygon:
+        ring = []
+        for corner in polygon.split(';'):
+            parts = corner.split(',')
+            if len(parts) != 2:
+                raise ValueError("polygon must be 'lat,lon;lat,lon;...'")
+            ring.append([
+                _parse_coordinate(parts[1], 'Longitude', 180),
+                _parse_coordinate(parts[0], 'Latitude', 90)
+            ])
+        if ring[0] != ring[-1]:
+            ring.append(ring[0])
+        if len(ring) < 4:
+            raise ValueError("polygon needs at least three corners")
+
+        area = {'$geoWithin': {'$geometry': {'type': 'Polygon', 'coordinates': [ring]}}}
+        return {'location': area}, lambda lat, lon: _point_in_polygon(lat, lon, ring)
+
+    if not all(query_params.get(name) for name in ('lat', 'lon', 'radius')):
+        raise ValueError("Provide lat, lon and radius (meters), or polygon")
+    latitude = _parse_coordinate(query_params['lat'], 'Latitude', 90)
+    longitude = _parse_coordinate(query_params['lon'], 'Longitude', 180)
+    try:
+        radius = float(query_params['radius'])
+    except ValueError:
+        radius = None
+    if radius is None or not 0 < radius <= max_radius:
+        raise ValueError(f"radius must be between 0 and {max_radius} meters")
+
+    area = {'$geoWithin': {'$centerSphere': [[longitude, latitude], radius / EARTH_RADIUS_M]}}
+    return {'location': area}, lambda lat, lon: haversine_distance(latitude, longitude, lat, lon) <= radius
@@ -0,0 +1,220 @@
+"""
+In-memory irrigation history for Smart Irrigation System
+Fixed-capacity ring buffer of recent irrigation logs, used when MongoDB is unavailable.
+Memory per worker is bounded by the capacity and reads of the newest k logs are O(k).
+"""
+import threading
+from datetime import datetime
+
+# Filter fields (as produced by views.parse_log_filters) to record attributes
+FILTER_ATTRIBUTES = {
+    'user': 'user',
+    'crop_type': 'crop_type',
+    'soil_type': 'soil_type',
+    'decision.status': 'status',
+}
+
+
+class HistoryRecord:
+    """
+    Compact, flat copy of an irrigation log entry
+
+    Only the fields of the history response are kept, so a record costs the same
+    whatever extra keys the weather or sensor dictionaries carried.
+    """
+    __slots__ = (
+        'seq', 'previous_in_crop', 'id', 'timestamp',
+        'user', 'crop_type', 'soil_type', 'latitude', 'longitude', 'field_id',
+        'soil_moisture', 'sensor_temperature', 'sensor_humidity',
+        'weather_temperature', 'weather_humidity', 'rain_probability',
+        'water_amount', 'duration', 'status', 'engine_version'
+    )
+
+    def __init__(self, seq, entry, previous_in_crop=0):
+        sensor_data = entry['sensor_data']
+        weather_data = entry['weather_data']
+        decision = entry['decision']
+        timestamp = entry['timestamp']
+
+        self.seq = seq
+        self.previous_in_crop = previous_in_crop
+        self.id = entry.get('id') or str(seq)
+        self.timestamp = datetime.fromisoformat(timestamp) if isinstance(timestamp, str) else timestamp
+        self.user = entry['user']
+        self.crop_type = entry['crop_type']
+        self.soil_type = entry['soil_type']
+        self.latitude = entry['latitude']
+        self.longitude = entry['longitude']
+        self.field_id = entry.get('field_id')
+        self.soil_moisture = sensor_data['soil_moisture']
+        self.sensor_temperature = sensor_data['temperature']
+        self.sensor_humidity = sensor_data['humidity']
+        self.weather_temperature = weather_data['temperature']
+        self.weather_humidity = weather_data['humidity']
+        self.rain_probability = weather_data['rain_probability']
+        self.water_amount = decision['water_amount']
+        self.duration = decision['duration']
+        self.status = decision['status']
+        self.engine_version = decision.get('engine_version')
+
+    def to_dict(self):
+        """Rebuilds the history entry in the API response shape"""
+        entry = {
+            'id': self.id,
+            'timestamp': self.timestamp.isoformat(),
+            'user': self.user,
+            'crop_type': self.crop_type,
+            'soil_type': self.soil_type,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'sensor_data': {
+                'soil_moisture': self.soil_moisture,
+                'temperature': self.sensor_temperature,
+                'humidity': self.sensor_humidity
+            },
+            'weather_data': {
+                'temperature': self.weather_temperature,
+                'humidity': self.weather_humidity,
+                'rain_probability': self.rain_probability
+            },
+            'decision': {
+                'water_amount': self.water_amount,
+                'duration': self.duration,
+                'status': self.status,
+                'engine_version': self.engine_version
+            }
+        }
+        # Like stored logs, entries without a field carry no field_id
+        if self.field_id is not None:
+            entry['field_id'] = self.field_id
+        return entry
+
+
+class HistoryBuffer:
+    """
+    Ring buffer of HistoryRecords with a per-crop index
+
+    Records are stored in arrival order, which is timestamp order since every entry is
+    stamped when it is created. When the buffer is full the oldest record is overwritten.
+    Each record links to the previous record of the same crop, and the index maps each
+    crop to its newest record, so crop-filtered reads skip other crops entirely.
+
+    Writers are serialized by a lock. Readers take no lock: a slot is identified by its
+    sequence number, and a reader that finds a slot already overwritten stops there,
+    since everything older has been overwritten too.
+
+    Args:
+        capacity (int): Maximum number of records kept
+    """
+
+    def __init__(self, capacity=10000):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        self._newest_seq = 0
+        self._newest_by_crop = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._newest_seq, self.capacity)
+
+    def append(self, entry):
+        """
+        Stores a log entry, overwriting the oldest one when full
+
+        Args:
+            entry (dict): Log entry with nested sensor_data, weather_data and decision
+
+        Returns:
+            str: Id of the stored record, the entry's own id or its sequence number
+        """
+        with self._lock:
+            seq = self._newest_seq + 1
+            record = HistoryRecord(seq, entry, self._newest_by_crop.get(entry['crop_type'], 0))
+
+            position = seq % self.capacity
+            evicted = self._slots[position]
+            if evicted is not None and self._newest_by_crop.get(evicted.crop_type) == evicted.seq:
+                del self._newest_by_crop[evicted.crop_type]
+            # Publish the slot before the sequence number so readers never see a gap
+            self._slots[position] = record
+            self._newest_by_crop[record.crop_type] = seq
+            self._newest_seq = seq
+            return record.id
+
+    def clear(self):
+        """Drops all records"""
+        with self._lock:
+            self._slots = [None] * self.capacity
+            self._newest_seq = 0
+            self._newest_by_crop = {}
+
+    def _record(self, seq):
+        """Returns the record with this sequence number, or None once it is overwritten"""
+        record = self._slots[seq % self.capacity]
+        return record if record is not None and record.seq == seq else None
+
+    def _newest_records(self, crop_type=None):
+        """Yields records newest first, following the crop index when a crop is given"""
+        if crop_type:
+            seq = self._newest_by_crop.get(crop_type, 0)
+            while seq:
+                record = self._record(seq)
+                if record is None:
+                    return
+                yield record
+                seq = record.previous_in_crop
+        else:
+            seq = self._newest_seq
+            while seq > 0:
+                record = self._record(seq)
+                if record is None:
+                    return
+                yield record
+                seq -= 1
+
+    def newest(self, filters=None, start=None, end=None):
+        """
+        Yields matching records as history entries, newest first
+
+        Args:
+            filters (dict): Log fields (see FILTER_ATTRIBUTES) to requested values;
+                            empty values are ignored
+            start (datetime): Inclusive lower timestamp bound or None
+            end (datetime): Exclusive upper timestamp bound or None
+
+        Yields:
+            dict: History entries in the API response shape
+        """
+        filters = {
+            FILTER_ATTRIBUTES[field]: value
+            for field, value in (filters or {}).items() if value
+        }
+        for record in self._newest_records(filters.get('crop_type')):
+            if start and record.timestamp < start:
+                break  # everything after this is older still
+            if end and record.timestamp >= end:
+                continue
+            if all(getattr(record, attribute) == value for attribute, value in filters.items()):
+                yield record.to_dict()
+
+    def latest(self, limit, filters=None, start=None, end=None):
+        """
+        Returns up to limit matching history entries, newest first
+
+        Args:
+            limit (int): Maximum number of entries
+            filters (dict): See newest()
+            start (datetime): Inclusive lower timestamp bound or None
+            end (datetime): Exclusive upper timestamp bound or None
+
+        Returns:
+            list: History entries in the API response shape
+        """
+        entries = []
+        for entry in self.newest(filters, start, end):
+            entries.append(entry)
+            if len(entries) >= limit:
+                break
+        return entries
@@ -0,0 +1,249 @@
+"""
+Irrigation log persistence for Smart Irrigation System
+Writes batches of irrigation log documents to MongoDB and keeps the rollups in step.
+
+Logs live either in the regular irrigation_logs collection (the IrrigationLog document)
+or, with IRRIGATION_LOG_STORAGE = 'timeseries', in a MongoDB time-series collection whose
+metaField groups the readings of one field, crop and soil into compressed buckets.
+Application code always reads and writes the flat IrrigationLog shape; the store
+translates filters, projections and pipelines to the storage layout.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from pymongo.errors import BulkWriteError
+
+from ..models import IrrigationLog
+from .rollups import apply_rollups, mark_rollups_stale
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+# Log fields stored under the metaField of the time-series collection: they identify the
+# field (location), crop, soil and owner a series of readings belongs to
+LOG_META_FIELDS = ('user', 'crop_type', 'soil_type', 'latitude', 'longitude')
+
+
+class PartialWriteError(Exception):
+    """
+    Raised when MongoDB saved only part of a batch of irrigation logs
+
+    Args:
+        documents (list): Documents that were not saved and can be retried
+        inserted_ids (list): Ids of the documents that were saved
+    """
+
+    def __init__(self, documents, inserted_ids):
+        super().__init__(f"{len(documents)} irrigation logs were not saved")
+        self.documents = documents
+        self.inserted_ids = inserted_ids
+
+
+class LogStore:
+    """
+    Regular collection storage, the IrrigationLog document as is
+    """
+    name = 'standard'
+
+    def collection(self):
+        """Returns the pymongo collection holding the logs"""
+        return IrrigationLog._get_collection()
+
+    def ensure_collection(self):
+        """Creates the collection and its indexes if needed"""
+        IrrigationLog.ensure_indexes()
+
+    def to_storage(self, document):
+        """Converts a flat log document into the stored layout"""
+        return document
+
+    def query(self, query):
+        """Converts a filter on flat log fields into a filter on stored documents"""
+        return query
+
+    def projection(self, projection):
+        """Converts a projection of flat log fields into one returning the flat shape"""
+        return projection
+
+    def pipeline(self, pipeline):
+        """
+        Adapts an aggregation pipeline written against flat log documents
+
+        Args:
+            pipeline (list): Pipeline whose first stage may be a $match on log fields
+
+        Returns:
+            list: Pipeline for the stored documents
+        """
+        return pipeline
+
+    def insert(self, documents):
+        """
+        Inserts flat log documents with a single unordered insert_many
+
+        Returns:
+            InsertManyResult: pymongo result
+        """
+        return self.collection().insert_many([self.to_storage(document) for document in documents], ordered=False)
+
+
+class TimeSeriesLogStore(LogStore):
+    """
+    Time-series collection storage
+
+    Documents keep timestamp as the timeField and move LOG_META_FIELDS under 'meta'.
+    Time-series collections have no unique _id index, so unlike the regular collection a
+    replayed batch is not deduplicated on insert.
+
+    Args:
+        collection_name (str): Name of the time-series collection
+        granularity (str): Bucket granularity ('seconds', 'minutes' or 'hours'),
+                           matched to how often a field reports
+    """
+    name = 'timeseries'
+
+    def __init__(self, collection_name, granularity='minutes'):
+        self.collection_name = collection_name
+        self.granularity = granularity
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def collection(self):
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    self.ensure_collection()
+                    self._ready = True
+        return IrrigationLog._get_db()[self.collection_name]
+
+    def ensure_collection(self):
+        db = IrrigationLog._get_db()
+        if not db.list_collection_names(filter={'name': self.collection_name}):
+            db.create_collection(self.collection_name, timeseries={
+                'timeField': 'timestamp',
+                'metaField': 'meta',
+                'granularity': self.granularity
+            })
+        collection = db[self.collection_name]
+        # Secondary indexes on meta fields and time back the history and stats filters
+        for field in ('user', 'crop_type', 'soil_type'):
+            collection.create_index([(f'meta.{field}', 1), ('timestamp', -1)])
+        collection.create_index([('meta.latitude', 1), ('meta.longitude', 1), ('timestamp', -1)])
+        # Geospatial indexes on measurements need MongoDB 6.0+
+        collection.create_index([('location', '2dsphere'), ('timestamp', -1)])
+
+    def to_storage(self, document):
+        stored = {key: value for key, value in document.items() if key not in LOG_META_FIELDS}
+        stored['meta'] = {field: document[field] for field in LOG_META_FIELDS if field in document}
+        return stored
+
+    def query(self, query):
+        if isinstance(query, list):
+            return [self.query(clause) for clause in query]
+        if not isinstance(query, dict):
+            return query
+        return {
+            f'meta.{key}' if key in LOG_META_FIELDS else key: self.query(value) if key.startswith('$') else value
+            for key, value in query.items()
+        }
+
+    def projection(self, projection):
+        return {
+            key: f'$meta.{key}' if key in LOG_META_FIELDS else value
+            for key, value in projection.items()
+        }
+
+    def pipeline(self, pipeline):
+        if not pipeline or '$match' not in pipeline[0]:
+            return pipeline
+        flatten = [
+            {'$set': {field: f'$meta.{field}' for field in LOG_META_FIELDS}},
+            {'$unset': 'meta'}
+        ]
+        return [{'$match': self.query(pipeline[0]['$match'])}] + flatten + pipeline[1:]
+
+
+_log_store = None
+
+
+def get_log_store():
+    """
+    Returns the log store selected by settings.IRRIGATION_LOG_STORAGE
+
+    Returns:
+        LogStore: Regular or time-series store
+
+    Raises:
+        ImproperlyConfigured: If the storage mode is unknown
+    """
+    global _log_store
+    if _log_store is None:
+        storage = settings.IRRIGATION_LOG_STORAGE
+        if storage == LogStore.name:
+            _log_store = LogStore()
+        elif storage == TimeSeriesLogStore.name:
+            _log_store = TimeSeriesLogStore(
+                collection_name=settings.IRRIGATION_TIMESERIES_COLLECTION,
+                granularity=settings.IRRIGATION_TIMESERIES_GRANULARITY
+            )
+        else:
+            raise ImproperlyConfigured(f"Unknown IRRIGATION_LOG_STORAGE: {storage}")
+    return _log_store
+
+
+def persist_irrigation_logs(documents):
+    """
+    Inserts irrigation log documents with a single insert_many and updates the rollups
+
+    Documents that already exist (same _id, e.g. when a spilled batch is replayed after
+    a partially successful flush) are skipped and not counted in the rollups twice.
+    The insert is unordered, so when MongoDB rejects some documents the others are
+    still saved and rolled up. Days whose rollup update fails are marked stale for
+    backfill_rollups --stale rather than failing the write.
+
+    Args:
+        documents (list): Raw irrigation log documents, usually with pre-assigned _id
+
+    Returns:
+        list: Ids of the inserted documents
+
+    Raises:
+        PartialWriteError: If MongoDB rejected some documents for reasons other than duplicates
+        Exception: If the insert failed as a whole
+    """
+    if not documents:
+        return []
+
+    failed = []
+    try:
+        result = get_log_store().insert(documents)
+        inserted = documents
+        inserted_ids = result.inserted_ids
+    except BulkWriteError as e:
+        write_errors = e.details.get('writeErrors', [])
+        duplicates = {error['index'] for error in write_errors if error['code'] == DUPLICATE_KEY_ERROR}
+        rejected = {error['index'] for error in write_errors} - duplicates
+        if duplicates:
+            logger.info(f"Skipped {len(duplicates)} irrigation logs that were already saved")
+        if rejected:
+            first_error = next(error for error in write_errors if error['index'] in rejected)
+            logger.error(f"MongoDB rejected {len(rejected)} irrigation logs: {first_error.get('errmsg')}")
+        inserted = [
+            document for index, document in enumerate(documents)
+            if index not in duplicates and index not in rejected
+        ]
+        failed = [document for index, document in enumerate(documents) if index in rejected]
+        inserted_ids = [document['_id'] for document in inserted]
+
+    try:
+        apply_rollups(inserted)
+    except Exception as e:
+        logger.error(f"Error updating irrigation rollups: {str(e)}")
+        mark_rollups_stale(inserted)
+
+    if failed:
+        raise PartialWriteError(failed, inserted_ids)
+    return inserted_ids
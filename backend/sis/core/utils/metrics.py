@@ -0,0 +1,536 @@
+"""
+Metrics for Smart Irrigation System
+In-process counters, gauges and histograms exported in the Prometheus text format on
+/metrics, plus span-style timers for the stages of a request.
+
+Metrics are kept in memory per process. With several server processes, set
+METRICS_MULTIPROCESS_DIR: every process then writes a snapshot of its metrics to that
+directory each METRICS_SNAPSHOT_INTERVAL seconds, and /metrics sums the snapshots of all
+processes, so any worker answers a scrape with the totals of the whole server.
+"""
+import atexit
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # not on Windows, where snapshots of exited processes are kept as they are
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from sub-millisecond stages to slow external calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _sample_key(suffix, values, extra):
+    return (suffix, tuple(values), tuple(tuple(pair) for pair in extra))
+
+
+# Order of the samples of one series: histogram buckets by bound, then sum and count
+_SUFFIX_ORDER = {'_sum': 1, '_count': 2}
+
+
+def _sample_order(key):
+    suffix, values, extra = key
+    bound = dict(extra).get('le')
+    return (values, _SUFFIX_ORDER.get(suffix, 0), float(bound) if bound is not None else 0.0)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    Base class of labelled metrics
+
+    Args:
+        name (str): Metric name
+        documentation (str): HELP text
+        labels (tuple): Label names, values are passed as keyword arguments
+    """
+    kind = 'untyped'
+    # How the values of several processes are combined: 'sum', 'max' or 'mean'
+    aggregate = 'sum'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Drops all recorded values"""
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def samples(self):
+        """Returns (suffix, label values, extra labels, value) tuples for exposition"""
+        raise NotImplementedError
+
+    def combine(self, samples_by_process):
+        """
+        Combines the samples of several processes into one sample per series
+
+        Args:
+            samples_by_process (list): samples() of every process
+
+        Returns:
+            list: Combined samples, in exposition order
+        """
+        combined = {}
+        counts = {}
+        for samples in samples_by_process:
+            for suffix, values, extra, value in samples:
+                key = _sample_key(suffix, values, extra)
+                if key not in combined:
+                    combined[key] = value
+                    counts[key] = 1
+                    continue
+                counts[key] += 1
+                combined[key] = max(combined[key], value) if self.aggregate == 'max' else combined[key] + value
+        if self.aggregate == 'mean':
+            combined = {key: value / counts[key] for key, value in combined.items()}
+        return [(suffix, values, extra, combined[suffix, values, extra])
+                for suffix, values, extra in sorted(combined, key=_sample_order)]
+
+    def render(self, samples=None):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for suffix, values, extra, value in self.samples() if samples is None else samples:
+            labels = _format_labels(self.label_names, values, tuple(extra))
+            lines.append(f'{self.name}{suffix}{labels} {_format_value(value)}')
+        return lines
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [('_total', key, (), value) for key, value in items]
+
+
+class Gauge(Metric):
+    """
+    Value read when metrics are exported
+
+    Args:
+        function (callable): Returns the current value, or a dict of label tuples to values
+        aggregate (str): How the values of several processes are combined ('sum', 'max' or 'mean')
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, function, labels=(), aggregate='sum'):
+        super().__init__(name, documentation, labels)
+        self.function = function
+        self.aggregate = aggregate
+
+    def samples(self):
+        try:
+            value = self.function()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        if isinstance(value, dict):
+            return [('', key, (), item) for key, item in sorted(value.items())]
+        return [('', (), (), value)]
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values in cumulative buckets
+
+    Args:
+        buckets (tuple): Sorted upper bounds of the buckets
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, an overflow bucket, sum and count
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the duration of the with block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(series[0]), series[1], series[2])) for key, series in self._values.items())
+        samples = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                samples.append(('_bucket', key, (('le', _format_value(float(bound))),), cumulative))
+            samples.append(('_sum', key, (), total))
+            samples.append(('_count', key, (), count))
+        return samples
+
+
+class Registry:
+    """Collection of metrics exported together"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def gauge(self, name, documentation, function, labels=(), aggregate='sum'):
+        return self.register(Gauge(name, documentation, function, labels, aggregate))
+
+    def _metrics_list(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    def reset(self):
+        """Drops the values of every metric (e.g. those a forked process inherited)"""
+        for metric in self._metrics_list():
+            metric.reset()
+
+    def snapshot(self):
+        """
+        Returns the samples of every metric in a JSON-serializable form
+
+        Returns:
+            dict: Metric name to a list of [suffix, label values, extra labels, value]
+        """
+        return {
+            metric.name: [[suffix, list(values), [list(pair) for pair in extra], value]
+                          for suffix, values, extra, value in metric.samples()]
+            for metric in self._metrics_list()
+        }
+
+    def render(self, snapshots=()):
+        """
+        Exports every metric in the Prometheus text format (version 0.0.4)
+
+        Args:
+            snapshots (list): Snapshots of other processes ({'live', 'metrics'}) to add to
+                this process's values; gauges only count processes that are still live
+
+        Returns:
+            str: Exposition text
+        """
+        lines = []
+        for metric in self._metrics_list():
+            if snapshots:
+                samples = metric.combine([metric.samples()] + [
+                    snapshot['metrics'].get(metric.name, []) for snapshot in snapshots
+                    if snapshot['live'] or metric.kind != 'gauge'
+                ])
+                lines.extend(metric.render(samples))
+            else:
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class SnapshotWriter:
+    """
+    Writes the metrics of this process to a directory shared by all server processes
+
+    Snapshots are written every interval seconds from a background thread, and at exit.
+    Each process has its own file. When a scrape finds files of processes that exited,
+    their counters and histograms are folded into a single exited-processes file and the
+    files are deleted, so totals never go backwards while the directory stays small.
+    Empty the directory when the server is restarted.
+
+    Args:
+        registry (Registry): Metrics to write
+        directory (str): Directory shared by the server processes
+        interval (float): Seconds between snapshots
+    """
+
+    def __init__(self, registry, directory, interval=1.0):
+        self.registry = registry
+        self.directory = str(directory)
+        self.interval = interval
+        self.path = None
+        self._pid = None
+        self._lock = threading.Lock()
+        atexit.register(self._write_at_exit)
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def ensure_started(self):
+        """Starts writing snapshots of this process, once per process"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self._pid = os.getpid()
+            # Unique per process, so a reused pid never overwrites an exited process's counters
+            self.path = os.path.join(self.directory, f"{self._pid}-{uuid.uuid4().hex[:8]}.json")
+            threading.Thread(target=self._run, args=(self._pid,), name='metrics-snapshots', daemon=True).start()
+
+    def _after_fork(self):
+        # The parent's values are still counted from its own snapshots
+        self._pid = None
+        self.path = None
+        self._lock = threading.Lock()
+        self.registry.reset()
+
+    def _run(self, pid):
+        while self._pid == pid:
+            time.sleep(self.interval)
+            self.write()
+
+    def _write_at_exit(self):
+        if self._pid == os.getpid():
+            self.write()
+
+    def write(self):
+        """Replaces this process's snapshot file with its current metrics"""
+        path = self.path
+        if path is None:
+            return
+        snapshot = {'pid': os.getpid(), 'written_at': time.time(), 'metrics': self.registry.snapshot()}
+        try:
+            _write_json(path, snapshot)
+        except OSError as e:
+            logger.error(f"Error writing metrics snapshot {path}: {str(e)}")
+
+    def read_others(self):
+        """
+        Reads the snapshots of the other processes, folding those of exited processes
+        into the exited-processes snapshot
+
+        Returns:
+            list: Snapshots, with 'live' False for processes that stopped writing
+        """
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        stale_before = time.time() - 3 * self.interval
+        snapshots = {}
+        exited = {}
+        for name in names:
+            path = os.path.join(self.directory, name)
+            if not name.endswith('.json') or name == EXITED_SNAPSHOT or path == self.path:
+                continue
+            snapshot = _read_json(path)
+            if snapshot is None:
+                continue
+            snapshot['live'] = snapshot.get('written_at', 0) >= stale_before
+            if not snapshot['live'] and _process_exited(snapshot.get('pid')):
+                exited[name] = snapshot
+            else:
+                snapshots[name] = snapshot
+
+        if exited and fcntl is not None:
+            self._merge_exited(exited)
+        else:
+            snapshots.update(exited)
+
+        # Read last: files merged since they were listed are counted by it instead
+        aggregate = _read_json(os.path.join(self.directory, EXITED_SNAPSHOT))
+        if aggregate is None:
+            return list(snapshots.values())
+        merged = set(aggregate.get('merged', ()))
+        aggregate['live'] = False
+        return [snapshot for name, snapshot in snapshots.items() if name not in merged] + [aggregate]
+
+    def _merge_exited(self, exited):
+        """Adds the counters and histograms of exited processes to the exited-processes file"""
+        path = os.path.join(self.directory, EXITED_SNAPSHOT)
+        try:
+            with open(os.path.join(self.directory, MERGE_LOCK), 'w') as lock_file:
+                # One merge at a time across processes
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                aggregate = _read_json(path) or {'merged': [], 'metrics': {}}
+                merged = set(aggregate.get('merged', ()))
+                new = {name: snapshot for name, snapshot in exited.items() if name not in merged}
+                if new:
+                    metrics = {}
+                    for metric in self.registry._metrics_list():
+                        if metric.kind == 'gauge':
+                            continue  # gauges of exited processes no longer apply
+                        metrics[metric.name] = metric.combine(
+                            [aggregate['metrics'].get(metric.name, [])]
+                            + [snapshot['metrics'].get(metric.name, []) for snapshot in new.values()]
+                        )
+                    # Names stay listed until their files are gone, so a merge interrupted
+                    # before the deletes below never counts a process twice
+                    names = sorted(name for name in merged if os.path.exists(os.path.join(self.directory, name)))
+                    _write_json(path, {'written_at': time.time(), 'merged': names + sorted(new), 'metrics': metrics})
+                for name in exited:
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except FileNotFoundError:
+                        pass
+        except OSError as e:
+            logger.error(f"Error merging metrics snapshots of exited processes: {str(e)}")
+
+
+# Snapshot of the counters and histograms of every process that exited, and its lock
+EXITED_SNAPSHOT = 'exited-processes.json'
+MERGE_LOCK = '.exited-processes.lock'
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as json_file:
+            return json.load(json_file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    """Replaces a file atomically, so readers never see it half written"""
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as json_file:
+        json.dump(data, json_file)
+    os.replace(f"{path}.tmp", path)
+
+
+def _process_exited(pid):
+    """Returns True if no process has this pid (a reused pid keeps its snapshot unmerged)"""
+    if not isinstance(pid, int) or os.name != 'posix':
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        return False  # exists, owned by another user
+    return False
+
+
+REGISTRY = Registry()
+
+_snapshot_writer = None
+_snapshot_writer_lock = threading.Lock()
+
+
+def start_metrics_snapshots(directory, interval=1.0):
+    """
+    Starts sharing this process's metrics through a directory (see SnapshotWriter)
+
+    Args:
+        directory (str): Directory shared by the server processes
+        interval (float): Seconds between snapshots
+    """
+    global _snapshot_writer
+    if _snapshot_writer is None:
+        with _snapshot_writer_lock:
+            if _snapshot_writer is None:
+                _snapshot_writer = SnapshotWriter(REGISTRY, directory, interval)
+    _snapshot_writer.ensure_started()
+
+
+def render_metrics():
+    """
+    Exports the metrics of this process, summed with those of the other server processes
+    when snapshots are shared
+
+    Returns:
+        str: Exposition text
+    """
+    if _snapshot_writer is None:
+        return REGISTRY.render()
+    return REGISTRY.render(_snapshot_writer.read_others())
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'sis_http_requests', "HTTP requests by view, method and status code", ('view', 'method', 'status')
+)
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    'sis_http_request_duration_seconds', "HTTP request latency by view and method", ('view', 'method')
+)
+STAGE_DURATION = REGISTRY.histogram(
+    'sis_stage_duration_seconds', "Time spent in each stage of a request", ('stage',)
+)
+WEATHER_CACHE_LOOKUPS = REGISTRY.counter(
+    'sis_weather_cache_lookups', "Weather cache lookups by result (hit, shared_hit, miss)", ('result',)
+)
+WEATHER_REQUESTS = REGISTRY.counter(
+    'sis_weather_requests', "Weather API calls by outcome (success, error, circuit_open)", ('outcome',)
+)
+MONGO_FALLBACKS = REGISTRY.counter(
+    'sis_mongo_fallbacks', "Operations served from in-memory data because MongoDB failed", ('operation',)
+)
+DECISIONS = REGISTRY.counter(
+    'sis_decisions', "Irrigation decisions by status, endpoint and engine version", ('status', 'endpoint', 'engine')
+)
+
+
+def stage(name):
+    """
+    Times a stage of request processing
+
+    Usage:
+        with stage('weather'):
+            weather_data = get_weather_data(latitude, longitude)
+
+    Args:
+        name (str): Stage name (validation, sensor, weather, decision, persist, serialization, ...)
+
+    Returns:
+        contextmanager: Records the duration in sis_stage_duration_seconds
+    """
+    return STAGE_DURATION.time(stage=name)
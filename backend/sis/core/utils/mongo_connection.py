@@ -0,0 +1,71 @@
+"""
+MongoDB connection management for Smart Irrigation System
+Registers the mongoengine connection without opening it: each process creates its client
+(and the client's monitor threads and pool) on its first query. A client inherited
+through fork is dropped in the child, so gunicorn --preload workers and forked job
+processes never share the parent's sockets.
+
+Settings imports this module, so it must not depend on Django settings.
+"""
+import os
+from urllib.parse import parse_qsl, urlsplit
+
+import mongoengine
+from mongoengine import connection
+from mongoengine.base.common import _get_documents_by_db
+
+# Connections registered through register_mongodb: alias -> register_connection kwargs
+_registered = {}
+
+
+def client_options(uri, options):
+    """
+    Returns the client options not already set in the connection string
+
+    Options in MONGODB_URI take precedence over the defaults from settings, so a
+    deployment can tune a single option in the URI.
+
+    Args:
+        uri (str): MongoDB connection string
+        options (dict): MongoClient keyword options, None values are left out
+
+    Returns:
+        dict: Options to pass to MongoClient (or motor)
+    """
+    in_uri = {name.lower() for name, _ in parse_qsl(urlsplit(uri).query)}
+    return {
+        name: value for name, value in options.items()
+        if value is not None and name.lower() not in in_uri
+    }
+
+
+def register_mongodb(uri, options, alias=connection.DEFAULT_CONNECTION_NAME):
+    """
+    Registers a lazily opened mongoengine connection
+
+    Args:
+        uri (str): MongoDB connection string, including the database name
+        options (dict): MongoClient keyword options (pool size, timeouts)
+        alias (str): mongoengine connection alias
+    """
+    kwargs = dict(client_options(uri, options), host=uri, connect=False)
+    _registered[alias] = kwargs
+    mongoengine.register_connection(alias, **kwargs)
+
+
+def _forget_inherited_clients():
+    """
+    Drops clients created before a fork without closing them
+
+    Closing would end server sessions the parent still uses, so the references are
+    discarded and the next query in the child creates a fresh client.
+    """
+    for alias in _registered:
+        connection._connections.pop(alias, None)
+        if connection._dbs.pop(alias, None) is not None:
+            for document_class in _get_documents_by_db(alias, connection.DEFAULT_CONNECTION_NAME):
+                if issubclass(document_class, mongoengine.Document):
+                    document_class._disconnect()
+
+
+os.register_at_fork(after_in_child=_forget_inherited_clients)
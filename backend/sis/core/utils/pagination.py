@@ -0,0 +1,112 @@
+"""
+Keyset pagination for Smart Irrigation System
+Pages through irrigation logs on (timestamp, _id) with opaque cursors, so every page
+costs the same index range scan no matter how deep it is
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+NEXT = 'next'  # towards older logs
+PREV = 'prev'  # towards newer logs
+
+
+def encode_cursor(timestamp, log_id, direction):
+    """
+    Encodes a page boundary into an opaque cursor
+
+    Args:
+        timestamp (datetime): Timestamp of the boundary log
+        log_id (ObjectId): Id of the boundary log
+        direction (str): NEXT or PREV
+
+    Returns:
+        str: URL-safe cursor
+    """
+    payload = json.dumps({'t': timestamp.isoformat(), 'i': str(log_id), 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decodes an opaque cursor
+
+    Args:
+        cursor (str): Cursor from encode_cursor
+
+    Returns:
+        tuple: (timestamp, log_id, direction)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction = payload['d']
+        if direction not in (NEXT, PREV):
+            raise ValueError("Invalid cursor")
+        return datetime.fromisoformat(payload['t']), ObjectId(payload['i']), direction
+    except (KeyError, TypeError, InvalidId, UnicodeDecodeError, json.JSONDecodeError, binascii.Error):
+        raise ValueError("Invalid cursor")
+
+
+def keyset_query(query, cursor):
+    """
+    Restricts a MongoDB filter to the logs after a cursor
+
+    Args:
+        query (dict): Base MongoDB filter
+        cursor (tuple): Decoded cursor (timestamp, log_id, direction) or None
+
+    Returns:
+        tuple: (filter, sort) - sort is newest first for NEXT pages and oldest first
+               for PREV pages, so the page can be read with a single index scan
+    """
+    if cursor is None:
+        return query, [('timestamp', -1), ('_id', -1)]
+
+    timestamp, log_id, direction = cursor
+    operator = '$lt' if direction == NEXT else '$gt'
+    boundary = {'$or': [
+        {'timestamp': {operator: timestamp}},
+        {'timestamp': timestamp, '_id': {operator: log_id}}
+    ]}
+    order = -1 if direction == NEXT else 1
+    return {'$and': [query, boundary]} if query else boundary, [('timestamp', order), ('_id', order)]
+
+
+def page_cursors(logs, limit, cursor):
+    """
+    Trims a fetched page and builds its next/prev cursors
+
+    Args:
+        logs (list): Up to limit + 1 raw logs (with _id and timestamp) in query order
+        limit (int): Page size
+        cursor (tuple): Decoded cursor the page was fetched with, or None
+
+    Returns:
+        tuple: (page, next_cursor, prev_cursor) - page is newest first
+    """
+    direction = cursor[2] if cursor else NEXT
+    has_more = len(logs) > limit
+    page = logs[:limit]
+    if direction == PREV:
+        page.reverse()
+
+    if not page:
+        return page, None, None
+
+    newest, oldest = page[0], page[-1]
+    if direction == NEXT:
+        has_next, has_prev = has_more, cursor is not None
+    else:
+        has_next, has_prev = True, has_more
+
+    next_cursor = encode_cursor(oldest['timestamp'], oldest['_id'], NEXT) if has_next else None
+    prev_cursor = encode_cursor(newest['timestamp'], newest['_id'], PREV) if has_prev else None
+    return page, next_cursor, prev_cursor
@@ -0,0 +1,255 @@
+"""
+Irrigation rollups for Smart Irrigation System
+Keeps hourly and daily totals per crop, soil and user up to date with atomic $inc upserts,
+so dashboards read a few hundred rollup documents instead of scanning raw logs
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+
+from ..models import IrrigationRollup, RollupBackfill, StaleRollupDay
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_GRANULARITIES = ('hour', 'day')
+
+# Set once a full backfill is seen; it is never undone, so it is not checked again
+_backfilled = False
+
+
+def truncate_timestamp(timestamp, granularity):
+    """Returns the start of the hour or day containing the timestamp"""
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def rollup_updates(logs):
+    """
+    Builds the $inc upserts that add irrigation logs to their rollups
+
+    Logs sharing a rollup document are combined into a single update.
+
+    Args:
+        logs (iterable): Raw irrigation logs (timestamp, crop_type, soil_type, user, decision)
+
+    Returns:
+        list: pymongo UpdateOne operations for the rollups collection
+    """
+    increments = defaultdict(lambda: defaultdict(float))
+    for log in logs:
+        decision = log['decision']
+        status_prefix = f"statuses.{decision['status']}"
+        for granularity in ROLLUP_GRANULARITIES:
+            key = (
+                granularity,
+                truncate_timestamp(log['timestamp'], granularity),
+                log['crop_type'],
+                log['soil_type'],
+                log['user']
+            )
+            increment = increments[key]
+            increment['count'] += 1
+            increment['water_amount_sum'] += decision['water_amount']
+            increment['duration_sum'] += decision['duration']
+            increment[f'{status_prefix}.count'] += 1
+            increment[f'{status_prefix}.water_amount_sum'] += decision['water_amount']
+            increment[f'{status_prefix}.duration_sum'] += decision['duration']
+
+    operations = []
+    for (granularity, period, crop_type, soil_type, user), increment in increments.items():
+        # Counts stay integers in MongoDB
+        inc = {
+            field: int(value) if field.endswith('count') else value
+            for field, value in increment.items()
+        }
+        operations.append(UpdateOne(
+            {
+                'granularity': granularity,
+                'period': period,
+                'crop_type': crop_type,
+                'soil_type': soil_type,
+                'user': user
+            },
+            {'$inc': inc},
+            upsert=True
+        ))
+    return operations
+
+
+def apply_rollups(logs):
+    """
+    Adds irrigation logs to the hourly and daily rollups
+
+    Args:
+        logs (iterable): Raw irrigation logs that were just persisted
+
+    Returns:
+        int: Number of rollup documents updated or created
+
+    Raises:
+        Exception: If MongoDB rejects any of the updates; some may have been applied,
+                   so the logs must not be rolled up again (see mark_rollups_stale)
+    """
+    operations = rollup_updates(logs)
+    if not operations:
+        return 0
+    result = IrrigationRollup._get_collection().bulk_write(operations, ordered=False)
+    return result.modified_count + result.upserted_count
+
+
+def mark_rollups_stale(logs):
+    """
+    Records the days of irrigation logs whose rollup updates failed
+
+    Retrying the $inc could count part of the logs twice, so the days are rebuilt
+    from the logs instead (rebuild_stale_rollups).
+
+    Args:
+        logs (iterable): Raw irrigation logs that were persisted without their rollups
+
+    Returns:
+        list: Days (midnight UTC) marked stale
+    """
+    days = sorted({truncate_timestamp(log['timestamp'], 'day') for log in logs})
+    if not days:
+        return []
+    try:
+        StaleRollupDay._get_collection().bulk_write([
+            UpdateOne({'day': day}, {'$setOnInsert': {'marked_at': datetime.utcnow()}}, upsert=True)
+            for day in days
+        ], ordered=False)
+    except Exception as e:
+        logger.error(
+            f"Error marking rollups stale, rebuild them with backfill_rollups for "
+            f"{', '.join(day.date().isoformat() for day in days)}: {str(e)}"
+        )
+    return days
+
+
+def rebuild_stale_rollups():
+    """
+    Rebuilds the rollups of every day marked by mark_rollups_stale
+
+    Returns:
+        list: Days (midnight UTC) rebuilt
+
+    Raises:
+        Exception: If a rebuild fails (its day stays marked)
+    """
+    collection = StaleRollupDay._get_collection()
+    days = [document['day'] for document in collection.find({}, {'day': 1}).sort('day', 1)]
+    for day in days:
+        # Unmark first, so failures recorded while the day is rebuilt are kept
+        collection.delete_one({'day': day})
+        try:
+            rebuild_rollups({'timestamp': {'$gte': day, '$lt': day + timedelta(days=1)}})
+        except Exception:
+            collection.update_one({'day': day}, {'$setOnInsert': {'marked_at': datetime.utcnow()}}, upsert=True)
+            raise
+    return days
+
+
+def rollups_backfilled():
+    """
+    Returns True once backfill_rollups has rolled up every existing irrigation log
+
+    Until then rollups only cover logs saved since they were introduced and cannot
+    stand in for the logs.
+    """
+    global _backfilled
+    if not _backfilled:
+        _backfilled = RollupBackfill.completed()
+    return _backfilled
+
+
+def rebuild_rollups_pipeline(granularity, query=None):
+    """
+    Builds the aggregation that recomputes rollups from irrigation logs and merges them
+    into the rollups collection, replacing existing rollup documents
+
+    Args:
+        granularity (str): 'hour' or 'day'
+        query (dict): Optional filter restricting the logs rolled up
+
+    Returns:
+        list: Aggregation pipeline over flat irrigation logs (see LogStore.pipeline)
+    """
+    key = {
+        'period': {'$dateTrunc': {'date': '$timestamp', 'unit': granularity}},
+        'crop_type': '$crop_type',
+        'soil_type': '$soil_type',
+        'user': '$user'
+    }
+    return [
+        {'$match': query or {}},
+        # Totals per rollup key and status
+        {'$group': {
+            '_id': dict(key, status='$decision.status'),
+            'count': {'$sum': 1},
+            'water_amount_sum': {'$sum': '$decision.water_amount'},
+            'duration_sum': {'$sum': '$decision.duration'}
+        }},
+        # Fold the statuses into one document per rollup key
+        {'$group': {
+            '_id': {field: f'$_id.{field}' for field in key},
+            'count': {'$sum': '$count'},
+            'water_amount_sum': {'$sum': '$water_amount_sum'},
+            'duration_sum': {'$sum': '$duration_sum'},
+            'statuses': {'$push': {
+                'k': '$_id.status',
+                'v': {
+                    'count': '$count',
+                    'water_amount_sum': '$water_amount_sum',
+                    'duration_sum': '$duration_sum'
+                }
+            }}
+        }},
+        {'$project': {
+            '_id': 0,
+            'granularity': {'$literal': granularity},
+            'period': '$_id.period',
+            'crop_type': '$_id.crop_type',
+            'soil_type': '$_id.soil_type',
+            'user': '$_id.user',
+            'count': 1,
+            'water_amount_sum': 1,
+            'duration_sum': 1,
+            'statuses': {'$arrayToObject': '$statuses'}
+        }},
+        {'$merge': {
+            'into': IrrigationRollup._get_collection_name(),
+            'on': ['granularity', 'period', 'crop_type', 'soil_type', 'user'],
+            'whenMatched': 'replace',
+            'whenNotMatched': 'insert'
+        }}
+    ]
+
+
+def rebuild_rollups(query=None):
+    """
+    Recomputes the hourly and daily rollups from irrigation logs
+
+    Args:
+        query (dict): Optional filter restricting the logs rolled up
+
+    Returns:
+        dict: Number of rollup documents per granularity after the rebuild
+    """
+    # Imported here: the log store itself updates rollups whenever logs are saved
+    from .log_store import get_log_store
+
+    # Make sure the unique index $merge relies on exists
+    IrrigationRollup.ensure_indexes()
+    store = get_log_store()
+    log_collection = store.collection()
+    rollup_collection = IrrigationRollup._get_collection()
+
+    counts = {}
+    for granularity in ROLLUP_GRANULARITIES:
+        pipeline = store.pipeline(rebuild_rollups_pipeline(granularity, query))
+        log_collection.aggregate(pipeline, allowDiskUse=True)
+        counts[granularity] = rollup_collection.count_documents({'granularity': granularity})
+    return counts
@@ -0,0 +1,220 @@
+"""
+Irrigation Scheduler for Smart Irrigation System
+Plans irrigation over a forecast horizon: projects the soil moisture of every field hour by
+hour from the forecast of its grid cell, then schedules the start time and volume that
+keep it inside the crop's ideal range. All fields of a batch are planned in one vectorized
+pass, as columnar NumPy arrays like the batch decision engine.
+"""
+import logging
+from datetime import datetime, timedelta
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Soil moisture model, in percentage points per hour
+DRYING_RATE = 0.3                  # lost at 20 °C and 50 % humidity in reference soil
+DRYING_TEMP_COEFFICIENT = 0.04     # relative drying increase per °C above 20 °C
+DRYING_HUMIDITY_COEFFICIENT = 0.5  # relative drying decrease at 100 % humidity (increase at 0 %)
+REFERENCE_ABSORPTION = 0.8         # soils absorbing less than this hold less water and dry faster
+RAIN_GAIN_PER_MM = 1.5             # gained per mm of expected rain, scaled by absorption rate
+IRRIGATION_GAIN_PER_LITER = 2.0    # gained per liter of the crop's base water need absorbed
+
+# Irrigation may start up to this many hours before moisture is projected to fall below
+# the crop's ideal minimum; within that window the hour with the least drying is chosen
+MAX_ADVANCE_HOURS = 12
+
+# Duration bounds, as in the decision engine
+MIN_DURATION = 0.5
+MAX_DURATION = 4.0
+
+PLAN_SCHEDULED = 'Scheduled'
+PLAN_NOT_NEEDED = 'Not needed'
+
+# Forecast step length assumed when a forecast has a single step (OpenWeatherMap: 3 hours)
+DEFAULT_STEP_SECONDS = 3 * 3600.0
+
+
+class ForecastGrid:
+    """
+    Hourly weather of many grid cells on a common time axis
+
+    Args:
+        forecasts (list): Forecasts from weather_api.parse_forecast_response, or None for
+                          cells without a forecast (they get the fallback weather, no rain)
+        start (datetime): Naive UTC start of the first hour
+        hours (int): Planning horizon in hours
+        fallback (dict): temperature and humidity used for cells without a forecast
+    """
+
+    def __init__(self, forecasts, start, hours, fallback):
+        self.start = start
+        self.hours = hours
+        start_seconds = (start - datetime(1970, 1, 1)).total_seconds()
+        self.times = start_seconds + 3600.0 * np.arange(hours)
+
+        cells = len(forecasts)
+        self.temperature = np.full((cells, hours), float(fallback['temperature']))
+        self.humidity = np.full((cells, hours), float(fallback['humidity']))
+        self.rain = np.zeros((cells, hours))  # expected mm per hour
+
+        for cell, forecast in enumerate(forecasts):
+            if not forecast or not forecast['time']:
+                continue
+            times = np.asarray(forecast['time'], dtype=np.float64)
+            self.temperature[cell] = np.interp(self.times, times, forecast['temperature'])
+            self.humidity[cell] = np.interp(self.times, times, forecast['humidity'])
+
+            # Rain volumes cover a whole step: spread them over its hours, weighted by probability
+            step_seconds = float(np.median(np.diff(times))) if len(times) > 1 else DEFAULT_STEP_SECONDS
+            expected = (
+                np.asarray(forecast['rain'], dtype=np.float64)
+                * np.asarray(forecast['rain_probability'], dtype=np.float64) / 100.0
+            )
+            step = np.searchsorted(times, self.times, side='right') - 1
+            covered = (step >= 0) & (self.times < times[-1] + step_seconds)
+            self.rain[cell] = np.where(covered, expected[np.clip(step, 0, None)] * 3600.0 / step_seconds, 0.0)
+
+
+def project_soil_moisture(grid, cell_index, soil_moisture, absorption_rate):
+    """
+    Projects soil moisture without irrigation over the horizon
+
+    Args:
+        grid (ForecastGrid): Hourly weather per grid cell
+        cell_index (array): Grid cell of each field
+        soil_moisture (array): Current soil moisture percentage of each field
+        absorption_rate (array): Soil absorption rate of each field
+
+    Returns:
+        tuple: (projected, drying) - (fields, hours) arrays of the moisture at the start
+               of each hour and the moisture lost during it
+    """
+    temperature = grid.temperature[cell_index]
+    humidity = grid.humidity[cell_index]
+    soil_factor = (REFERENCE_ABSORPTION / absorption_rate)[:, None]
+    drying = np.maximum(
+        DRYING_RATE
+        * (1.0 + DRYING_TEMP_COEFFICIENT * (temperature - 20.0))
+        * (1.0 + DRYING_HUMIDITY_COEFFICIENT * (50.0 - humidity) / 50.0)
+        * soil_factor,
+        0.0
+    )
+    gain = grid.rain[cell_index] * RAIN_GAIN_PER_MM * absorption_rate[:, None]
+
+    projected = np.empty_like(drying)
+    moisture = np.asarray(soil_moisture, dtype=np.float64)
+    for hour in range(grid.hours):
+        projected[:, hour] = moisture
+        moisture = np.clip(moisture - drying[:, hour] + gain[:, hour], 0.0, 100.0)
+    return projected, drying
+
+
+def plan_irrigation(crop_table, soil_table, crop_index, soil_index, cell_index, soil_moisture, grid):
+    """
+    Plans irrigation for many fields over the forecast horizon
+
+    A field needs irrigation when its projected moisture falls below the crop's ideal
+    minimum within the horizon (forecast rain included). It is then scheduled in the
+    least drying hour of the MAX_ADVANCE_HOURS before that happens, for as long as it
+    takes to bring the moisture back to the middle of the ideal range.
+
+    Args:
+        crop_table (CropTable): Crop data referenced by crop_index
+        soil_table (SoilTable): Soil data referenced by soil_index
+        crop_index (array): Crop position for each field
+        soil_index (array): Soil position for each field
+        cell_index (array): ForecastGrid cell for each field
+        soil_moisture (array): Current soil moisture percentage for each field
+        grid (ForecastGrid): Hourly weather per grid cell
+
+    Returns:
+        dict: Plans as arrays
+            - needed: True where irrigation is scheduled
+            - start_hour: Hour offset of the start (-1 where not needed)
+            - duration: Irrigation duration in hours
+            - water_amount: Water amount in liters per hour
+            - volume: Total water in liters
+            - min_soil_moisture: Lowest projected moisture without irrigation
+    """
+    crop_index = np.asarray(crop_index, dtype=np.intp)
+    soil_index = np.asarray(soil_index, dtype=np.intp)
+    cell_index = np.asarray(cell_index, dtype=np.intp)
+    count = len(crop_index)
+
+    moisture_min = crop_table.moisture_min[crop_index]
+    moisture_max = crop_table.moisture_max[crop_index]
+    base_water = crop_table.base_water[crop_index]
+    absorption_rate = soil_table.absorption_rate[soil_index]
+
+    projected, drying = project_soil_moisture(grid, cell_index, soil_moisture, absorption_rate)
+
+    # First hour below the ideal minimum (the horizon where it never happens)
+    below = projected < moisture_min[:, None]
+    needed = below.any(axis=1)
+    first_below = np.where(needed, below.argmax(axis=1), grid.hours)
+
+    # Candidate start hours: the advance window before crossing, or now if already below
+    hours = np.arange(grid.hours)[None, :]
+    window = (hours < np.maximum(first_below, 1)[:, None]) & (hours >= (first_below - MAX_ADVANCE_HOURS)[:, None])
+    start_hour = np.argmin(np.where(window, drying, np.inf), axis=1)
+
+    # Duration to reach the middle of the ideal range from the moisture at the start
+    target = (moisture_min + moisture_max) / 2.0
+    deficit = np.maximum(target - projected[np.arange(count), start_hour], 0.0)
+    duration = np.clip(deficit / (IRRIGATION_GAIN_PER_LITER * base_water), MIN_DURATION, MAX_DURATION)
+    water_amount = base_water / absorption_rate  # less absorbent soils need more water
+
+    duration = np.where(needed, np.round(duration, 1), 0.0)
+    water_amount = np.where(needed, np.round(water_amount, 2), 0.0)
+    return {
+        'needed': needed,
+        'start_hour': np.where(needed, start_hour, -1),
+        'duration': duration,
+        'water_amount': water_amount,
+        'volume': np.round(water_amount * duration, 2),
+        'min_soil_moisture': np.round(projected.min(axis=1), 1)
+    }
+
+
+def plans_to_documents(plans, field_ids, soil_moisture, sensor_sources, grid, planned_at):
+    """
+    Converts plan arrays into irrigation_plans documents
+
+    Args:
+        plans (dict): Output of plan_irrigation
+        field_ids (list): Field identifiers in plan order
+        soil_moisture (array): Current soil moisture in plan order
+        sensor_sources (list): 'probe' or 'simulated' in plan order
+        grid (ForecastGrid): Grid the plans were made on
+        planned_at (datetime): Naive UTC time of the run
+
+    Returns:
+        list: Raw IrrigationPlan documents
+    """
+    documents = []
+    for field_id, needed, start_hour, duration, water_amount, volume, moisture, min_moisture, source in zip(
+        field_ids,
+        plans['needed'].tolist(),
+        plans['start_hour'].tolist(),
+        plans['duration'].tolist(),
+        plans['water_amount'].tolist(),
+        plans['volume'].tolist(),
+        np.asarray(soil_moisture, dtype=np.float64).tolist(),
+        plans['min_soil_moisture'].tolist(),
+        sensor_sources
+    ):
+        documents.append({
+            'field_id': field_id,
+            'planned_at': planned_at,
+            'horizon': grid.hours,
+            'status': PLAN_SCHEDULED if needed else PLAN_NOT_NEEDED,
+            'start_time': grid.start + timedelta(hours=start_hour) if needed else None,
+            'duration': duration,
+            'water_amount': water_amount,
+            'volume': volume,
+            'soil_moisture': moisture,
+            'min_soil_moisture': min_moisture,
+            'sensor_source': source
+        })
+    return documents
@@ -0,0 +1,387 @@
+"""
+Sensor reading ingestion for Smart Irrigation System
+Parses batches of probe readings (JSON lines, JSON or msgpack), validates them column-wise
+with NumPy and keeps the latest reading of every field in memory, so irrigation decisions
+use current soil moisture instead of simulated values
+"""
+import json
+import logging
+import math
+import threading
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from dateutil.parser import isoparse
+from django.conf import settings
+from django.core.cache import caches
+
+from ..models import SensorReading
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the standard json module
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional, binary bodies are rejected without it
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# Column order of readings sent as arrays instead of objects (the compact form)
+READING_COLUMNS = ('field_id', 'timestamp', 'soil_moisture', 'temperature', 'humidity')
+
+# Accepted range of every measurement, inclusive
+READING_RANGES = {
+    'soil_moisture': (0.0, 100.0),  # percentage
+    'temperature': (-50.0, 70.0),   # celsius
+    'humidity': (0.0, 100.0),       # percentage
+}
+
+MAX_FIELD_ID_LENGTH = 64
+
+# Readings stamped further ahead than this are rejected (probe clock skew)
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+JSON_LINES_CONTENT_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/json-lines')
+JSON_CONTENT_TYPES = ('application/json',)
+MSGPACK_CONTENT_TYPES = ('application/msgpack', 'application/x-msgpack')
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def supported_content_types():
+    """Returns the request content types the ingestion endpoint can parse"""
+    content_types = JSON_LINES_CONTENT_TYPES + JSON_CONTENT_TYPES
+    if msgpack is not None:
+        content_types += MSGPACK_CONTENT_TYPES
+    return content_types
+
+
+def _loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def parse_readings(body, content_type):
+    """
+    Parses a request body into a list of readings
+
+    Readings are objects with READING_COLUMNS keys or, in the compact form, arrays in
+    READING_COLUMNS order. JSON bodies may be an array or {"readings": [...]}.
+
+    Args:
+        body (bytes): Raw request body
+        content_type (str): Media type, one of supported_content_types()
+
+    Returns:
+        list: Readings as sent (dicts or lists)
+
+    Raises:
+        ValueError: If the body cannot be decoded
+    """
+    try:
+        if content_type in JSON_LINES_CONTENT_TYPES:
+            readings = [_loads(line) for line in body.splitlines() if line.strip()]
+        elif content_type in MSGPACK_CONTENT_TYPES:
+            readings = msgpack.unpackb(body, raw=False)
+        else:
+            readings = _loads(body)
+    except Exception:
+        raise ValueError("Request body is not valid for its content type")
+
+    if isinstance(readings, dict):
+        readings = readings.get('readings')
+    if not isinstance(readings, list):
+        raise ValueError("Expected a list of readings")
+    return readings
+
+
+def _float_column(values):
+    """Converts values to a float array, with NaN for anything that is not a number"""
+    return np.array(
+        [value if type(value) in (int, float) else math.nan for value in values],
+        dtype=np.float64
+    )
+
+
+def _epoch_seconds(value, now):
+    """Converts a reading timestamp (ISO 8601 or epoch seconds, default now) to epoch seconds"""
+    if value is None:
+        return now
+    if type(value) in (int, float):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            timestamp = isoparse(value)
+            if timestamp.tzinfo is None:
+                timestamp = timestamp.replace(tzinfo=timezone.utc)
+            return timestamp.timestamp()
+        except (ValueError, OverflowError, OSError):
+            # Unparseable, or out of the datetime range once converted to UTC
+            return math.nan
+    return math.nan
+
+
+def validate_readings(readings, now=None):
+    """
+    Validates a batch of readings column by column
+
+    Args:
+        readings (list): Readings from parse_readings
+        now (datetime): Naive UTC reference time (defaults to utcnow)
+
+    Returns:
+        tuple: (documents, errors) - documents are raw sensor_readings documents with
+               naive UTC timestamps; errors lists {'index', 'error'} per rejected reading
+    """
+    now = now or datetime.utcnow()
+    now_seconds = (now - EPOCH).total_seconds()
+    rows = [
+        reading if isinstance(reading, dict)
+        else dict(zip(READING_COLUMNS, reading)) if isinstance(reading, (list, tuple))
+        else {}
+        for reading in readings
+    ]
+    count = len(rows)
+    valid = np.ones(count, dtype=bool)
+    errors = {}
+
+    def reject(mask, message):
+        for index in np.flatnonzero(mask & valid):
+            errors[int(index)] = message
+        valid[mask] = False
+
+    field_ids = [row.get('field_id') for row in rows]
+    reject(
+        np.fromiter(
+            (not isinstance(field_id, str) or not 0 < len(field_id) <= MAX_FIELD_ID_LENGTH for field_id in field_ids),
+            dtype=bool, count=count
+        ),
+        f"field_id must be a string of 1 to {MAX_FIELD_ID_LENGTH} characters"
+    )
+
+    columns = {}
+    for name, (low, high) in READING_RANGES.items():
+        values = _float_column([row.get(name) for row in rows])
+        reject(~np.isfinite(values), f"{name} must be a number")
+        reject((values < low) | (values > high), f"{name} must be between {low} and {high}")
+        columns[name] = values
+
+    timestamps = np.array([_epoch_seconds(row.get('timestamp'), now_seconds) for row in rows], dtype=np.float64)
+    reject(~np.isfinite(timestamps), "timestamp must be ISO 8601 or epoch seconds")
+    reject(timestamps < 0, "timestamp is before 1970")
+    reject(timestamps > now_seconds + MAX_CLOCK_SKEW.total_seconds(), "timestamp is in the future")
+
+    indices = np.flatnonzero(valid)
+    values = {name: column[indices].tolist() for name, column in columns.items()}
+    seconds = timestamps[indices].tolist()
+    documents = [
+        {
+            'field_id': field_ids[index],
+            'timestamp': EPOCH + timedelta(seconds=seconds[position]),
+            'soil_moisture': values['soil_moisture'][position],
+            'temperature': values['temperature'][position],
+            'humidity': values['humidity'][position]
+        }
+        for position, index in enumerate(indices.tolist())
+    ]
+    return documents, [{'index': index, 'error': error} for index, error in sorted(errors.items())]
+
+
+def store_readings(documents):
+    """
+    Bulk-writes validated readings with a single unordered insert_many
+
+    Args:
+        documents (list): Documents from validate_readings
+
+    Returns:
+        int: Number of readings written
+    """
+    if not documents:
+        return 0
+    return len(SensorReading._get_collection().insert_many(documents, ordered=False).inserted_ids)
+
+
+def sensor_data_from_reading(reading):
+    """Converts a stored reading into the sensor_data shape used by decisions"""
+    return {
+        'soil_moisture': reading['soil_moisture'],
+        'temperature': reading['temperature'],
+        'humidity': reading['humidity']
+    }
+
+
+class LatestReadings:
+    """
+    Latest reading of every field, for decisions that need current sensor data
+
+    The index is per process. When a shared Django cache alias is configured, updates are
+    written through to it so readings ingested by one worker are visible to all. Lookups
+    that miss both fall back to the (field_id, -timestamp) index of sensor_readings.
+
+    Args:
+        max_age (float): Seconds after which a reading is too old to base a decision on
+        shared_alias (str): Optional Django cache alias shared between workers
+    """
+
+    def __init__(self, max_age=300, shared_alias=''):
+        self.max_age = max_age
+        self.shared_alias = shared_alias
+        self._readings = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._readings)
+
+    def _shared_key(self, field_id):
+        return f"sensor:latest:{field_id}"
+
+    def _shared_cache(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def _store_local(self, reading):
+        with self._lock:
+            current = self._readings.get(reading['field_id'])
+            if current is None or current['timestamp'] < reading['timestamp']:
+                self._readings[reading['field_id']] = reading
+                return True
+        return False
+
+    def update(self, documents):
+        """
+        Records the newest reading of every field in a batch
+
+        Args:
+            documents (list): Validated reading documents
+        """
+        newest = {}
+        for document in documents:
+            current = newest.get(document['field_id'])
+            if current is None or current['timestamp'] < document['timestamp']:
+                newest[document['field_id']] = document
+
+        changed = {field_id: reading for field_id, reading in newest.items() if self._store_local(reading)}
+
+        shared_cache = self._shared_cache()
+        if shared_cache is not None and changed:
+            try:
+                shared_cache.set_many(
+                    {self._shared_key(field_id): reading for field_id, reading in changed.items()},
+                    timeout=self.max_age
+                )
+            except Exception as e:
+                logger.warning(f"Shared sensor cache unavailable: {str(e)}")
+
+    def _is_fresh(self, reading, now):
+        return reading is not None and (now - reading['timestamp']).total_seconds() <= self.max_age
+
+    def get(self, field_id, now=None):
+        """
+        Returns the current sensor data of a field
+
+        Args:
+            field_id (str): Field identifier
+            now (datetime): Naive UTC reference time (defaults to utcnow)
+
+        Returns:
+            dict: soil_moisture, temperature and humidity, or None if the field has
+                  no reading newer than max_age
+        """
+        now = now or datetime.utcnow()
+        with self._lock:
+            reading = self._readings.get(field_id)
+        if self._is_fresh(reading, now):
+            return sensor_data_from_reading(reading)
+
+        # Another worker may have ingested a newer reading
+        reading = None
+        shared_cache = self._shared_cache()
+        if shared_cache is not None:
+            try:
+                reading = shared_cache.get(self._shared_key(field_id))
+            except Exception as e:
+                logger.warning(f"Shared sensor cache unavailable: {str(e)}")
+        if reading is None:
+            try:
+                reading = SensorReading._get_collection().find_one(
+                    {'field_id': field_id}, {'_id': 0}, sort=[('timestamp', -1)]
+                )
+            except Exception as e:
+                logger.error(f"Error reading latest sensor data from MongoDB: {str(e)}")
+        if reading is None:
+            return None
+
+        self._store_local(reading)
+        return sensor_data_from_reading(reading) if self._is_fresh(reading, now) else None
+
+
+_latest_readings = None
+_latest_readings_lock = threading.Lock()
+
+
+def get_latest_readings():
+    """
+    Returns the process-wide latest-reading index configured from settings
+
+    Returns:
+        LatestReadings: Shared index instance
+    """
+    global _latest_readings
+    if _latest_readings is None:
+        with _latest_readings_lock:
+            if _latest_readings is None:
+                _latest_readings = LatestReadings(
+                    max_age=settings.SENSOR_READING_MAX_AGE,
+                    shared_alias=settings.SENSOR_READINGS_SHARED_ALIAS
+                )
+    return _latest_readings
+
+
+def current_sensor_data(field_id):
+    """
+    Returns the latest probe data of a field
+
+    Args:
+        field_id (str): Field identifier or None
+
+    Returns:
+        dict: Sensor data, or None if there is no field or no recent reading
+    """
+    if not field_id:
+        return None
+    return get_latest_readings().get(field_id)
+
+
+def latest_sensor_data(field_ids, since):
+    """
+    Returns the latest sensor data of many fields with a single aggregation
+
+    Uses the (field_id, -timestamp) index: readings are sorted per field and only the
+    first of each group is kept.
+
+    Args:
+        field_ids (list): Field identifiers
+        since (datetime): Naive UTC time before which readings are ignored
+
+    Returns:
+        dict: Sensor data (see sensor_data_from_reading) by field_id, for fields with a
+              recent reading
+    """
+    if not field_ids:
+        return {}
+    pipeline = [
+        {'$match': {'field_id': {'$in': list(field_ids)}, 'timestamp': {'$gte': since}}},
+        {'$sort': {'field_id': 1, 'timestamp': -1}},
+        {'$group': {
+            '_id': '$field_id',
+            'soil_moisture': {'$first': '$soil_moisture'},
+            'temperature': {'$first': '$temperature'},
+            'humidity': {'$first': '$humidity'}
+        }}
+    ]
+    return {
+        document['_id']: sensor_data_from_reading(document)
+        for document in SensorReading._get_collection().aggregate(pipeline, allowDiskUse=True)
+    }
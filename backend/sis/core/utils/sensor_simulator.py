@@ -1,9 +1,15 @@
 """
 Sensor simulator for Smart Irrigation System
-Simulates realistic sensor data for soil moisture, temperature, and humidity
+Simulates realistic sensor data for soil moisture, temperature, and humidity, either one
+independent reading per call or correlated time series for many fields at once
 """
+import gzip
+import json
 import random
 import logging
+from datetime import datetime, timedelta
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
@@ -41,3 +47,188 @@ def simulate_sensor_data():
             'temperature': 25.0,
             'humidity': 65.0
         }
+
+class FieldSimulator:
+    """
+    Simulates correlated sensor time series for many fields at once with NumPy
+    
+    Fields sit on a grid around a center point. Each step produces one reading per field:
+    - temperature follows a diurnal cycle (coolest around 03:00, warmest around 15:00),
+      plus a smooth regional offset and slowly varying (AR(1)) noise
+    - humidity moves against temperature and rises during rain
+    - soil moisture dries down with evapotranspiration (faster when hot and in sandy
+      soils), jumps when a field is irrigated below its threshold, and rises during
+      rain events that cover whole regions of neighbouring fields for hours
+    
+    Args:
+        num_fields (int): Number of fields simulated
+        seed (int): Seed of the random generator, for reproducible series
+        interval (float): Seconds between readings of a field
+        start (datetime): Naive UTC timestamp of the first reading (defaults to now)
+        center (tuple): (latitude, longitude) of the middle of the field grid
+        spacing (float): Degrees between neighbouring fields
+        field_prefix (str): Prefix of generated field ids
+    """
+    # Mean and diurnal amplitude of air temperature in celsius
+    TEMPERATURE_MEAN = 27.0
+    TEMPERATURE_AMPLITUDE = 6.0
+    # Soil moisture (%) lost per hour at the mean temperature, scaled per field by soil type
+    DRYDOWN_PER_HOUR = 0.6
+    # Soil moisture (%) gained per hour of rain and per irrigation
+    RAIN_PER_HOUR = 4.0
+    IRRIGATION_PULSE = 18.0
+    # Chance per hour that a rain event starts, and its mean duration in hours
+    RAIN_EVENTS_PER_HOUR = 0.04
+    RAIN_MEAN_HOURS = 3.0
+    
+    def __init__(self, num_fields, seed=None, interval=30.0, start=None, center=(11.0, 78.0),
+                 spacing=0.01, field_prefix='field-'):
+        self.num_fields = num_fields
+        self.interval = interval
+        self.rng = np.random.default_rng(seed)
+        self.timestamp = start or datetime.utcnow()
+        self.field_ids = np.array([f"{field_prefix}{index}" for index in range(num_fields)])
+        
+        # Fields on a square grid around the center
+        side = int(np.ceil(np.sqrt(num_fields)))
+        rows, columns = np.divmod(np.arange(num_fields), side)
+        self.latitude = np.round(center[0] + (rows - side / 2) * spacing, 6)
+        self.longitude = np.round(center[1] + (columns - side / 2) * spacing, 6)
+        
+        # Smooth regional temperature offset, so neighbouring fields are correlated
+        phase_lat, phase_lon = self.rng.uniform(0, 2 * np.pi, 2)
+        self.temperature_offset = 1.5 * (
+            np.sin(rows / max(side, 1) * np.pi + phase_lat) + np.cos(columns / max(side, 1) * np.pi + phase_lon)
+        )
+        
+        # Per-field soil behaviour
+        self.drydown_factor = self.rng.uniform(0.6, 1.6, num_fields)
+        self.irrigation_threshold = self.rng.uniform(35.0, 55.0, num_fields)
+        self.soil_moisture = self.rng.uniform(45.0, 80.0, num_fields)
+        self.noise = np.zeros(num_fields)
+        
+        # Active rain events: arrays of center row, center column, radius and hours left
+        self.rain_events = np.empty((0, 4))
+        self._rows, self._columns = rows, columns
+        self._side = side
+    
+    def _diurnal_temperature(self):
+        hour = self.timestamp.hour + self.timestamp.minute / 60 + self.timestamp.second / 3600
+        # Peak at 15:00, minimum at 03:00
+        return self.TEMPERATURE_MEAN + self.TEMPERATURE_AMPLITUDE * np.sin((hour - 9.0) / 24.0 * 2 * np.pi)
+    
+    def _update_rain(self, hours):
+        # Start new events as a Poisson process
+        starts = self.rng.poisson(self.RAIN_EVENTS_PER_HOUR * hours)
+        if starts:
+            new_events = np.column_stack([
+                self.rng.uniform(0, self._side, starts),
+                self.rng.uniform(0, self._side, starts),
+                self.rng.uniform(0.1, 0.5, starts) * self._side,
+                self.rng.exponential(self.RAIN_MEAN_HOURS, starts)
+            ])
+            self.rain_events = np.vstack([self.rain_events, new_events])
+        
+        raining = np.zeros(self.num_fields, dtype=bool)
+        for center_row, center_column, radius, _ in self.rain_events:
+            raining |= np.hypot(self._rows - center_row, self._columns - center_column) <= radius
+        
+        self.rain_events[:, 3] -= hours
+        self.rain_events = self.rain_events[self.rain_events[:, 3] > 0]
+        return raining
+    
+    def step(self):
+        """
+        Advances every field by one interval
+        
+        Returns:
+            dict: timestamp (datetime) and field_id, latitude, longitude, soil_moisture,
+                  temperature, humidity and raining arrays with one entry per field
+        """
+        hours = self.interval / 3600.0
+        self.timestamp += timedelta(seconds=self.interval)
+        raining = self._update_rain(hours)
+        
+        # Slowly varying weather noise, correlated in time
+        self.noise = 0.98 * self.noise + self.rng.normal(0.0, 0.3, self.num_fields)
+        temperature = self._diurnal_temperature() + self.temperature_offset + self.noise - 3.0 * raining
+        
+        # Hotter means faster drydown; rain and irrigation add water
+        heat = np.clip(temperature / self.TEMPERATURE_MEAN, 0.2, None)
+        self.soil_moisture -= self.DRYDOWN_PER_HOUR * self.drydown_factor * heat * hours * (~raining)
+        self.soil_moisture += self.RAIN_PER_HOUR * hours * raining
+        irrigated = self.soil_moisture < self.irrigation_threshold
+        self.soil_moisture += self.IRRIGATION_PULSE * irrigated
+        np.clip(self.soil_moisture, 0.0, 100.0, out=self.soil_moisture)
+        
+        humidity = np.clip(
+            65.0 - 2.0 * (temperature - self.TEMPERATURE_MEAN) + 25.0 * raining
+            + self.rng.normal(0.0, 2.0, self.num_fields),
+            5.0, 100.0
+        )
+        
+        return {
+            'timestamp': self.timestamp,
+            'field_id': self.field_ids,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'soil_moisture': np.round(self.soil_moisture, 1),
+            'temperature': np.round(temperature, 1),
+            'humidity': np.round(humidity, 1),
+            'raining': raining
+        }
+    
+    def batches(self, steps):
+        """
+        Yields one step of readings for all fields at a time
+        
+        Args:
+            steps (int): Number of intervals simulated (None to run forever)
+        
+        Yields:
+            dict: Arrays from step()
+        """
+        count = 0
+        while steps is None or count < steps:
+            yield self.step()
+            count += 1
+    
+    def readings(self, steps):
+        """
+        Yields readings in the compact ingestion form
+        
+        Args:
+            steps (int): Number of intervals simulated (None to run forever)
+        
+        Yields:
+            list: [field_id, timestamp (epoch seconds), soil_moisture, temperature, humidity]
+        """
+        for batch in self.batches(steps):
+            epoch_seconds = (batch['timestamp'] - datetime(1970, 1, 1)).total_seconds()
+            for row in zip(
+                batch['field_id'].tolist(),
+                batch['soil_moisture'].tolist(),
+                batch['temperature'].tolist(),
+                batch['humidity'].tolist()
+            ):
+                yield [row[0], epoch_seconds, row[1], row[2], row[3]]
+    
+    def write_ndjson(self, path, steps):
+        """
+        Writes readings as JSON lines in the compact ingestion form
+        
+        Args:
+            path (str): Output file, gzip-compressed when it ends in .gz
+            steps (int): Number of intervals simulated
+        
+        Returns:
+            int: Number of readings written
+        """
+        opener = gzip.open if str(path).endswith('.gz') else open
+        written = 0
+        with opener(path, 'wt', encoding='utf-8') as output:
+            for reading in self.readings(steps):
+                output.write(json.dumps(reading, separators=(',', ':')))
+                output.write('\n')
+                written += 1
+        return written
@@ -0,0 +1,46 @@
+"""
+Serialization helpers for Smart Irrigation System
+Reads irrigation logs as raw documents that already have the API response shape
+"""
+
+# Fields returned by the history API; embedded documents are projected to the
+# exact subfields of the response so raw documents need no reshaping
+HISTORY_PROJECTION = {
+    '_id': 1,
+    'timestamp': 1,
+    'user': 1,
+    'crop_type': 1,
+    'soil_type': 1,
+    'latitude': 1,
+    'longitude': 1,
+    'field_id': 1,
+    'sensor_data.soil_moisture': 1,
+    'sensor_data.temperature': 1,
+    'sensor_data.humidity': 1,
+    'weather_data.temperature': 1,
+    'weather_data.humidity': 1,
+    'weather_data.rain_probability': 1,
+    'decision.water_amount': 1,
+    'decision.duration': 1,
+    'decision.status': 1,
+    'decision.engine_version': 1
+}
+
+
+def history_entries(logs):
+    """
+    Converts projected raw irrigation logs into history entries in place
+
+    Only the id and timestamp need converting; everything else already has the
+    response shape thanks to HISTORY_PROJECTION.
+
+    Args:
+        logs (list): Raw logs read with HISTORY_PROJECTION
+
+    Returns:
+        list: The same dictionaries, with 'id' replacing '_id' and ISO timestamps
+    """
+    for log in logs:
+        log['id'] = str(log.pop('_id'))
+        log['timestamp'] = log['timestamp'].isoformat()
+    return logs
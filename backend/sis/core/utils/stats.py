@@ -0,0 +1,195 @@
+"""
+Water-usage statistics for Smart Irrigation System
+Builds the MongoDB aggregation pipelines behind the stats endpoint, so totals and
+averages are computed by the database in a single query, either over raw irrigation
+logs or over the pre-aggregated hourly/daily rollups
+"""
+from .rollups import truncate_timestamp
+
+# Supported time buckets for the per-period breakdown
+TIME_BUCKETS = ('hour', 'day', 'week')
+
+# Group keys of the per-dimension breakdowns
+GROUP_KEYS = {
+    'by_crop': ('crop_type', '$crop_type'),
+    'by_soil': ('soil_type', '$soil_type'),
+    'by_status': ('status', '$decision.status'),
+}
+
+# Log filters that rollup documents can answer
+ROLLUP_FILTER_FIELDS = ('user', 'crop_type', 'soil_type')
+
+
+def _log_metrics():
+    """Accumulators computed for every group of raw logs"""
+    return {
+        'count': {'$sum': 1},
+        'total_water_amount': {'$sum': '$decision.water_amount'},
+        'avg_water_amount': {'$avg': '$decision.water_amount'},
+        'total_duration': {'$sum': '$decision.duration'},
+        'avg_duration': {'$avg': '$decision.duration'},
+    }
+
+
+def _rollup_metrics(prefix='$'):
+    """Accumulators computed for every group of rollup documents"""
+    return {
+        'count': {'$sum': f'{prefix}count'},
+        'total_water_amount': {'$sum': f'{prefix}water_amount_sum'},
+        'total_duration': {'$sum': f'{prefix}duration_sum'},
+    }
+
+
+# Averages of rollup groups are derived from their totals
+ROLLUP_AVERAGES = {'$addFields': {
+    'avg_water_amount': {'$divide': ['$total_water_amount', '$count']},
+    'avg_duration': {'$divide': ['$total_duration', '$count']},
+}}
+
+
+def _time_bucket(date_field, bucket):
+    time_bucket = {'date': date_field, 'unit': bucket}
+    if bucket == 'week':
+        time_bucket['startOfWeek'] = 'monday'
+    return {'$dateTrunc': time_bucket}
+
+
+def build_stats_pipeline(query, bucket):
+    """
+    Builds the aggregation pipeline for water-usage statistics over raw logs
+
+    The leading $match is served by the (field, -timestamp) indexes on irrigation_logs.
+
+    Args:
+        query (dict): MongoDB filter on irrigation logs
+        bucket (str): Time bucket of the per-period breakdown (see TIME_BUCKETS)
+
+    Returns:
+        list: Aggregation pipeline producing a single document of breakdowns
+    """
+    facets = {
+        name: [
+            {'$group': dict(_id=group_by, **_log_metrics())},
+            {'$sort': {'_id': 1}},
+        ]
+        for name, (_, group_by) in GROUP_KEYS.items()
+    }
+    facets['by_time'] = [
+        {'$group': dict(_id=_time_bucket('$timestamp', bucket), **_log_metrics())},
+        {'$sort': {'_id': 1}},
+    ]
+    facets['totals'] = [{'$group': dict(_id=None, **_log_metrics())}]
+
+    return [{'$match': query}, {'$facet': facets}]
+
+
+def rollup_query(query, bucket):
+    """
+    Translates a filter on irrigation logs into a filter on rollup documents
+
+    Rollups can answer filters on user, crop and soil, and time ranges aligned to
+    the rollup granularity (hours for the hour bucket, days otherwise).
+
+    Args:
+        query (dict): MongoDB filter on irrigation logs (see views.parse_log_filters)
+        bucket (str): Time bucket of the per-period breakdown
+
+    Returns:
+        dict: Filter on the rollups collection, or None if rollups cannot answer the query
+    """
+    granularity = 'hour' if bucket == 'hour' else 'day'
+    translated = {'granularity': granularity}
+    for field, value in query.items():
+        if field in ROLLUP_FILTER_FIELDS:
+            translated[field] = value
+        elif field == 'timestamp':
+            for bound in value.values():
+                if truncate_timestamp(bound, granularity) != bound:
+                    return None
+            translated['period'] = dict(value)
+        else:
+            return None
+    return translated
+
+
+def build_rollup_stats_pipeline(query, bucket):
+    """
+    Builds the aggregation pipeline for water-usage statistics over rollups
+
+    Produces the same document shape as build_stats_pipeline.
+
+    Args:
+        query (dict): MongoDB filter on rollup documents (see rollup_query)
+        bucket (str): Time bucket of the per-period breakdown
+
+    Returns:
+        list: Aggregation pipeline producing a single document of breakdowns
+    """
+    period = '$period' if bucket != 'week' else _time_bucket('$period', bucket)
+    facets = {
+        'by_crop': [
+            {'$group': dict(_id='$crop_type', **_rollup_metrics())},
+            ROLLUP_AVERAGES,
+            {'$sort': {'_id': 1}},
+        ],
+        'by_soil': [
+            {'$group': dict(_id='$soil_type', **_rollup_metrics())},
+            ROLLUP_AVERAGES,
+            {'$sort': {'_id': 1}},
+        ],
+        'by_status': [
+            {'$project': {'status': {'$objectToArray': '$statuses'}}},
+            {'$unwind': '$status'},
+            {'$group': dict(_id='$status.k', **_rollup_metrics('$status.v.'))},
+            ROLLUP_AVERAGES,
+            {'$sort': {'_id': 1}},
+        ],
+        'by_time': [
+            {'$group': dict(_id=period, **_rollup_metrics())},
+            ROLLUP_AVERAGES,
+            {'$sort': {'_id': 1}},
+        ],
+        'totals': [
+            {'$group': dict(_id=None, **_rollup_metrics())},
+            ROLLUP_AVERAGES,
+        ],
+    }
+
+    return [{'$match': query}, {'$facet': facets}]
+
+
+def _format_metrics(group, **keys):
+    return {
+        **keys,
+        'count': group['count'],
+        'total_water_amount': round(group['total_water_amount'], 2),
+        'avg_water_amount': round(group['avg_water_amount'], 2),
+        'total_duration': round(group['total_duration'], 1),
+        'avg_duration': round(group['avg_duration'], 2),
+    }
+
+
+def format_stats(result, bucket):
+    """
+    Converts the aggregation result into the stats API response
+
+    Args:
+        result (dict): Single document produced by either stats pipeline (or None)
+        bucket (str): Time bucket used for by_time
+
+    Returns:
+        dict: Totals and per-crop, per-soil, per-status and per-period breakdowns
+    """
+    result = result or {}
+    totals = result.get('totals') or []
+    stats = {
+        'bucket': bucket,
+        'totals': _format_metrics(totals[0]) if totals else None,
+    }
+    for name, (key, _) in GROUP_KEYS.items():
+        stats[name] = [_format_metrics(group, **{key: group['_id']}) for group in result.get(name, [])]
+    stats['by_time'] = [
+        _format_metrics(group, period=group['_id'].isoformat())
+        for group in result.get('by_time', [])
+    ]
+    return stats
@@ -2,86 +2,531 @@
 Weather API integration for Smart Irrigation System
 Fetches real-time weather data from OpenWeatherMap API
 """
-import requests
+import asyncio
 import logging
+import threading
+import time
+import weakref
+
+import requests
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .metrics import WEATHER_REQUESTS
+from .weather_cache import get_weather_cache
 
 logger = logging.getLogger(__name__)
 
+# Fallback weather data used when the weather API is unavailable
+FALLBACK_WEATHER = {
+    'temperature': 25.0,
+    'humidity': 60.0,
+    'rain_probability': 10.0
+}
+
+# HTTP status codes worth retrying
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+class CircuitBreaker:
+    """
+    Stops calling the weather API after repeated failures
+
+    After failure_threshold consecutive failures the circuit opens and requests are
+    short-circuited for reset_timeout seconds. The first request after that is let
+    through as a probe: success closes the circuit, failure opens it again.
+
+    Args:
+        failure_threshold (int): Consecutive failures that open the circuit
+        reset_timeout (float): Seconds to wait before probing the API again
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow_request(self):
+        """Returns True if a request may be sent to the API"""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if not self._probing and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Weather API circuit opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+_circuit_breaker = None
+_session = None
+_client_lock = threading.Lock()
+
+def get_circuit_breaker():
+    """Returns the process-wide weather API circuit breaker"""
+    global _circuit_breaker
+    if _circuit_breaker is None:
+        with _client_lock:
+            if _circuit_breaker is None:
+                _circuit_breaker = CircuitBreaker(
+                    failure_threshold=settings.WEATHER_CIRCUIT_FAILURE_THRESHOLD,
+                    reset_timeout=settings.WEATHER_CIRCUIT_RESET_TIMEOUT
+                )
+    return _circuit_breaker
+
+def get_session():
+    """
+    Returns the process-wide HTTP session for the weather API
+
+    The session keeps connections alive in a pool and retries failed requests
+    with exponential backoff.
+    """
+    global _session
+    if _session is None:
+        with _client_lock:
+            if _session is None:
+                retry = Retry(
+                    total=settings.WEATHER_HTTP_RETRIES,
+                    backoff_factor=settings.WEATHER_HTTP_BACKOFF,
+                    status_forcelist=RETRY_STATUS_CODES,
+                    allowed_methods=['GET'],
+                    raise_on_status=False
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=settings.WEATHER_HTTP_POOL_SIZE,
+                    max_retries=retry
+                )
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+def _weather_request_params(latitude, longitude, endpoint='weather'):
+    """Builds the API URL and query parameters for a current weather (or forecast) request"""
+    api_key = settings.OPENWEATHERMAP_API_KEY
+    if not api_key:
+        logger.error("OpenWeatherMap API key not configured")
+        raise ValueError("OpenWeatherMap API key not configured")
+
+    url = f"{settings.OPENWEATHERMAP_BASE_URL}/{endpoint}"
+    params = {'lat': latitude, 'lon': longitude, 'appid': api_key, 'units': 'metric'}
+    return url, params
+
+def parse_weather_response(data):
+    """
+    Extracts the weather data used by the decision engine from an API response
+
+    Args:
+        data (dict): OpenWeatherMap current weather response
+
+    Returns:
+        dict: Dictionary containing weather data (see fetch_weather_data)
+    """
+    # Extract relevant weather information
+    temperature = data['main']['temp']
+    humidity = data['main']['humidity']
+
+    # Calculate rain probability based on weather conditions
+    # OpenWeatherMap doesn't directly provide rain probability, so we estimate it
+    weather_id = data['weather'][0]['id']
+    if weather_id < 300:  # Thunderstorm
+        rain_probability = 90.0
+    elif weather_id < 400:  # Drizzle
+        rain_probability = 70.0
+    elif weather_id < 600:  # Rain
+        rain_probability = 80.0
+    elif weather_id < 700:  # Snow
+        rain_probability = 50.0
+    elif weather_id < 800:  # Atmosphere (fog, haze, etc.)
+        rain_probability = 30.0
+    elif weather_id == 800:  # Clear
+        rain_probability = 0.0
+    elif weather_id < 900:  # Clouds
+        cloud_percent = data['clouds']['all']
+        rain_probability = min(cloud_percent, 40.0)  # Max 40% for just clouds
+    else:
+        rain_probability = 20.0  # Default
+
+    # Create weather data dictionary
+    return {
+        'temperature': round(temperature, 1),
+        'humidity': round(humidity, 1),
+        'rain_probability': round(rain_probability, 1)
+    }
+
 def get_weather_data(latitude, longitude):
+    """
+    Gets weather data for the coordinates, served from the weather cache when
+    a nearby location was fetched recently
+
+    While the circuit breaker is open the fallback weather data is returned
+    instead of calling the API.
+
+    Args:
+        latitude (float): Latitude coordinate
+        longitude (float): Longitude coordinate
+
+    Returns:
+        dict: Dictionary containing weather data (see fetch_weather_data)
+
+    Raises:
+        Exception: If the cache misses and the API request fails
+    """
+    weather_cache = get_weather_cache()
+    if weather_cache is not None:
+        weather_data = weather_cache.get(latitude, longitude)
+        if weather_data is not None:
+            return weather_data
+
+    circuit_breaker = get_circuit_breaker()
+    if not circuit_breaker.allow_request():
+        logger.debug("Weather API circuit open, using fallback weather data")
+        WEATHER_REQUESTS.inc(outcome='circuit_open')
+        return dict(FALLBACK_WEATHER)
+
+    try:
+        weather_data = fetch_weather_data(latitude, longitude)
+    except Exception:
+        circuit_breaker.record_failure()
+        WEATHER_REQUESTS.inc(outcome='error')
+        raise
+    circuit_breaker.record_success()
+    WEATHER_REQUESTS.inc(outcome='success')
+
+    if weather_cache is not None:
+        weather_cache.set(latitude, longitude, weather_data)
+    return weather_data
+
+def fetch_weather_data(latitude, longitude):
     """
     Fetches real-time weather data from OpenWeatherMap API
-    
+
     Args:
         latitude (float): Latitude coordinate
         longitude (float): Longitude coordinate
-        
+
     Returns:
         dict: Dictionary containing weather data
             - temperature: Temperature in Celsius
             - humidity: Humidity percentage
             - rain_probability: Probability of rain (percentage)
-            
+
     Raises:
         Exception: If API request fails
     """
     try:
-        # Get API key from settings
-        api_key = settings.OPENWEATHERMAP_API_KEY
-        if not api_key:
-            logger.error("OpenWeatherMap API key not configured")
-            raise ValueError("OpenWeatherMap API key not configured")
-        
-        # Build API URL
-        url = f"https://api.openweathermap.org/data/2.5/weather?lat={latitude}&lon={longitude}&appid={api_key}&units=metric"
-        
-        # Make API request
+        url, params = _weather_request_params(latitude, longitude)
+
+        # Make API request over the pooled, retrying session
         logger.debug(f"Fetching weather data for coordinates: {latitude}, {longitude}")
-        response = requests.get(url, timeout=10)
-        
+        response = get_session().get(url, params=params, timeout=settings.WEATHER_HTTP_TIMEOUT)
+
         # Check if request was successful
         if response.status_code != 200:
             logger.error(f"OpenWeatherMap API error: {response.status_code} - {response.text}")
             raise Exception(f"OpenWeatherMap API error: {response.status_code}")
-        
-        # Parse response data
-        data = response.json()
-        
-        # Extract relevant weather information
-        temperature = data['main']['temp']
-        humidity = data['main']['humidity']
-        
-        # Calculate rain probability based on weather conditions
-        # OpenWeatherMap doesn't directly provide rain probability, so we estimate it
-        weather_id = data['weather'][0]['id']
-        if weather_id < 300:  # Thunderstorm
-            rain_probability = 90.0
-        elif weather_id < 400:  # Drizzle
-            rain_probability = 70.0
-        elif weather_id < 600:  # Rain
-            rain_probability = 80.0
-        elif weather_id < 700:  # Snow
-            rain_probability = 50.0
-        elif weather_id < 800:  # Atmosphere (fog, haze, etc.)
-            rain_probability = 30.0
-        elif weather_id == 800:  # Clear
-            rain_probability = 0.0
-        elif weather_id < 900:  # Clouds
-            cloud_percent = data['clouds']['all']
-            rain_probability = min(cloud_percent, 40.0)  # Max 40% for just clouds
-        else:
-            rain_probability = 20.0  # Default
-        
-        # Create weather data dictionary
-        weather_data = {
-            'temperature': round(temperature, 1),
-            'humidity': round(humidity, 1),
-            'rain_probability': round(rain_probability, 1)
-        }
-        
+
+        weather_data = parse_weather_response(response.json())
+
         logger.debug(f"Weather data: {weather_data}")
         return weather_data
-        
+
     except Exception as e:
         logger.error(f"Error fetching weather data: {str(e)}")
         raise
+
+async def fetch_weather_data_async(client, latitude, longitude):
+    """
+    Fetches real-time weather data from OpenWeatherMap API with an async HTTP client
+
+    Retries connection errors and retryable status codes with exponential backoff,
+    like the pooled synchronous session.
+
+    Args:
+        client (httpx.AsyncClient): Async HTTP client
+        latitude (float): Latitude coordinate
+        longitude (float): Longitude coordinate
+
+    Returns:
+        dict: Dictionary containing weather data (see fetch_weather_data)
+
+    Raises:
+        Exception: If API request fails after all retries
+    """
+    return parse_weather_response(await _get_json_async(client, latitude, longitude, 'weather'))
+
+async def _get_json_async(client, latitude, longitude, endpoint):
+    """Requests an API endpoint with retries and returns the decoded response"""
+    import httpx
+
+    url, params = _weather_request_params(latitude, longitude, endpoint)
+
+    for attempt in range(settings.WEATHER_HTTP_RETRIES + 1):
+        if attempt:
+            await asyncio.sleep(settings.WEATHER_HTTP_BACKOFF * (2 ** (attempt - 1)))
+        try:
+            response = await client.get(url, params=params)
+        except httpx.TransportError as e:
+            if attempt == settings.WEATHER_HTTP_RETRIES:
+                raise
+            logger.debug(f"Retrying weather request after error: {str(e)}")
+            continue
+        if response.status_code in RETRY_STATUS_CODES and attempt < settings.WEATHER_HTTP_RETRIES:
+            continue
+        break
+
+    if response.status_code != 200:
+        logger.error(f"OpenWeatherMap API error: {response.status_code} - {response.text}")
+        raise Exception(f"OpenWeatherMap API error: {response.status_code}")
+
+    return response.json()
+
+def create_async_client():
+    """Creates an async HTTP client sized like the synchronous connection pool"""
+    # Imported on first use: httpx takes a few hundred milliseconds to import, which
+    # WSGI workers that never make async requests should not pay at boot
+    import httpx
+
+    return httpx.AsyncClient(
+        timeout=settings.WEATHER_HTTP_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=settings.WEATHER_HTTP_POOL_SIZE,
+            max_keepalive_connections=settings.WEATHER_HTTP_POOL_SIZE
+        )
+    )
+
+async def get_weather_data_many_async(coordinates, client=None):
+    """
+    Gets weather data for many coordinates concurrently
+
+    Coordinates in the same weather cache cell share a single request. Locations
+    whose request fails, or that are skipped while the circuit breaker is open,
+    get the fallback weather data.
+
+    Args:
+        coordinates (list): (latitude, longitude) tuples
+        client (httpx.AsyncClient): Optional async HTTP client to reuse
+
+    Returns:
+        list: Weather data dictionaries in the same order as coordinates
+    """
+    weather_cache = get_weather_cache()
+    circuit_breaker = get_circuit_breaker()
+
+    # One request per cache cell (or per distinct location without a cache)
+    pending = {}
+    results = [None] * len(coordinates)
+    for index, (latitude, longitude) in enumerate(coordinates):
+        if weather_cache is not None:
+            weather_data = weather_cache.get(latitude, longitude)
+            if weather_data is not None:
+                results[index] = weather_data
+                continue
+            key = weather_cache.cell(latitude, longitude)
+        else:
+            key = (latitude, longitude)
+        pending.setdefault(key, []).append(index)
+
+    # Keep at most one in-flight request per pooled connection
+    semaphore = asyncio.Semaphore(settings.WEATHER_HTTP_POOL_SIZE)
+
+    async def fetch(indices, owned_client):
+        latitude, longitude = coordinates[indices[0]]
+        async with semaphore:
+            weather_data = await fetch_or_fallback(latitude, longitude, owned_client)
+        for index in indices:
+            results[index] = dict(weather_data)
+
+    async def fetch_or_fallback(latitude, longitude, owned_client):
+        if not circuit_breaker.allow_request():
+            WEATHER_REQUESTS.inc(outcome='circuit_open')
+            weather_data = dict(FALLBACK_WEATHER)
+        else:
+            try:
+                weather_data = await fetch_weather_data_async(owned_client, latitude, longitude)
+                circuit_breaker.record_success()
+                WEATHER_REQUESTS.inc(outcome='success')
+                if weather_cache is not None:
+                    weather_cache.set(latitude, longitude, weather_data)
+            except Exception as e:
+                logger.error(f"Error fetching weather data for {latitude}, {longitude}: {str(e)}")
+                circuit_breaker.record_failure()
+                WEATHER_REQUESTS.inc(outcome='error')
+                weather_data = dict(FALLBACK_WEATHER)
+        return weather_data
+
+    if pending:
+        if client is None:
+            async with create_async_client() as owned_client:
+                await asyncio.gather(*(fetch(indices, owned_client) for indices in pending.values()))
+        else:
+            await asyncio.gather(*(fetch(indices, client) for indices in pending.values()))
+
+    return results
+
+_async_clients = weakref.WeakKeyDictionary()
+
+def get_async_client():
+    """
+    Returns the pooled async HTTP client of the running event loop
+
+    The client is created on first use and kept for the lifetime of the loop, so an
+    ASGI worker reuses keep-alive connections across requests.
+
+    Returns:
+        httpx.AsyncClient: Client bound to the running loop
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = create_async_client()
+    return client
+
+async def get_weather_data_async(latitude, longitude):
+    """
+    Async counterpart of get_weather_data for ASGI views
+
+    Args:
+        latitude (float): Latitude coordinate
+        longitude (float): Longitude coordinate
+
+    Returns:
+        dict: Dictionary containing weather data (see fetch_weather_data)
+
+    Raises:
+        Exception: If the cache misses and the API request fails
+    """
+    weather_cache = get_weather_cache()
+    if weather_cache is not None:
+        weather_data = weather_cache.get(latitude, longitude)
+        if weather_data is not None:
+            return weather_data
+
+    circuit_breaker = get_circuit_breaker()
+    if not circuit_breaker.allow_request():
+        logger.debug("Weather API circuit open, using fallback weather data")
+        WEATHER_REQUESTS.inc(outcome='circuit_open')
+        return dict(FALLBACK_WEATHER)
+
+    try:
+        weather_data = await fetch_weather_data_async(get_async_client(), latitude, longitude)
+    except Exception as e:
+        logger.error(f"Error fetching weather data: {str(e)}")
+        circuit_breaker.record_failure()
+        WEATHER_REQUESTS.inc(outcome='error')
+        raise
+    circuit_breaker.record_success()
+    WEATHER_REQUESTS.inc(outcome='success')
+
+    if weather_cache is not None:
+        weather_cache.set(latitude, longitude, weather_data)
+    return weather_data
+
+def get_weather_data_many(coordinates):
+    """
+    Synchronous wrapper around get_weather_data_many_async for WSGI views and commands
+
+    Args:
+        coordinates (list): (latitude, longitude) tuples
+
+    Returns:
+        list: Weather data dictionaries in the same order as coordinates
+    """
+    return asyncio.run(get_weather_data_many_async(coordinates))
+
+def parse_forecast_response(data):
+    """
+    Extracts the forecast series used by the irrigation scheduler from an API response
+
+    Args:
+        data (dict): OpenWeatherMap 5 day / 3 hour forecast response
+
+    Returns:
+        dict: Lists with one value per 3-hour forecast step
+            - time: Start of the step in epoch seconds (UTC)
+            - temperature: Temperature in Celsius
+            - humidity: Humidity percentage
+            - rain_probability: Probability of precipitation (percentage)
+            - rain: Forecast rain volume over the step in mm
+    """
+    steps = data['list']
+    return {
+        'time': [float(step['dt']) for step in steps],
+        'temperature': [float(step['main']['temp']) for step in steps],
+        'humidity': [float(step['main']['humidity']) for step in steps],
+        'rain_probability': [float(step.get('pop', 0.0)) * 100.0 for step in steps],
+        'rain': [float(step.get('rain', {}).get('3h', 0.0)) for step in steps]
+    }
+
+async def get_forecasts_many_async(coordinates, client=None):
+    """
+    Gets the multi-hour forecast for many coordinates concurrently
+
+    Forecasts are not cached; callers fetch once per grid cell. Locations whose request
+    fails, or that are skipped while the circuit breaker is open, get None.
+
+    Args:
+        coordinates (list): (latitude, longitude) tuples, usually one per grid cell
+        client (httpx.AsyncClient): Optional async HTTP client to reuse
+
+    Returns:
+        list: Forecasts (see parse_forecast_response) or None, in coordinate order
+    """
+    circuit_breaker = get_circuit_breaker()
+    semaphore = asyncio.Semaphore(settings.WEATHER_HTTP_POOL_SIZE)
+
+    async def fetch(latitude, longitude, owned_client):
+        if not circuit_breaker.allow_request():
+            WEATHER_REQUESTS.inc(outcome='circuit_open')
+            return None
+        try:
+            async with semaphore:
+                data = await _get_json_async(owned_client, latitude, longitude, 'forecast')
+            forecast = parse_forecast_response(data)
+        except Exception as e:
+            logger.error(f"Error fetching forecast for {latitude}, {longitude}: {str(e)}")
+            circuit_breaker.record_failure()
+            WEATHER_REQUESTS.inc(outcome='error')
+            return None
+        circuit_breaker.record_success()
+        WEATHER_REQUESTS.inc(outcome='success')
+        return forecast
+
+    if client is None:
+        async with create_async_client() as owned_client:
+            return await asyncio.gather(*(fetch(*location, owned_client) for location in coordinates))
+    return await asyncio.gather(*(fetch(*location, client) for location in coordinates))
+
+def get_forecasts_many(coordinates):
+    """
+    Synchronous wrapper around get_forecasts_many_async for commands
+
+    Args:
+        coordinates (list): (latitude, longitude) tuples
+
+    Returns:
+        list: Forecasts or None, in coordinate order
+    """
+    return asyncio.run(get_forecasts_many_async(coordinates))
@@ -0,0 +1,182 @@
+"""
+Weather cache for Smart Irrigation System
+Caches weather data per geographic grid cell so neighbouring fields share one upstream API call
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .metrics import WEATHER_CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+
+class WeatherCache:
+    """
+    TTL cache with LRU eviction, keyed by latitude/longitude rounded to a grid cell
+
+    Entries live in a per-process LRU. When a shared Django cache alias is configured
+    (e.g. Redis), entries are also written there so every worker process can reuse them.
+
+    Args:
+        grid_size (float): Grid cell size in degrees (0.01 is roughly 1.1 km)
+        ttl (float): Time to live of an entry in seconds
+        max_entries (int): Maximum number of cells kept in the local LRU
+        shared_alias (str): Optional Django cache alias shared between workers
+    """
+
+    def __init__(self, grid_size=0.01, ttl=600, max_entries=4096, shared_alias=''):
+        if grid_size <= 0:
+            raise ValueError("Weather cache grid size must be positive")
+        self.grid_size = grid_size
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared_alias = shared_alias
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def cell(self, latitude, longitude):
+        """Returns the grid cell (row, column) containing the coordinates"""
+        return (round(latitude / self.grid_size), round(longitude / self.grid_size))
+
+    def _shared_key(self, cell):
+        return f"weather:{self.grid_size}:{cell[0]}:{cell[1]}"
+
+    def _shared_cache(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def get(self, latitude, longitude):
+        """
+        Gets cached weather data for the grid cell containing the coordinates
+
+        Returns:
+            dict: Weather data or None if the cell is not cached or expired
+        """
+        cell = self.cell(latitude, longitude)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(cell)
+            if entry is not None:
+                expires_at, weather_data = entry
+                if expires_at > now:
+                    self._entries.move_to_end(cell)
+                    self.hits += 1
+                    WEATHER_CACHE_LOOKUPS.inc(result='hit')
+                    return dict(weather_data)
+                del self._entries[cell]
+
+        # Fall back to the shared cache before counting a miss
+        shared_cache = self._shared_cache()
+        if shared_cache is not None:
+            try:
+                weather_data = shared_cache.get(self._shared_key(cell))
+            except Exception as e:
+                logger.warning(f"Shared weather cache unavailable: {str(e)}")
+                weather_data = None
+            if weather_data is not None:
+                self._store_local(cell, weather_data, now)
+                with self._lock:
+                    self.shared_hits += 1
+                WEATHER_CACHE_LOOKUPS.inc(result='shared_hit')
+                return dict(weather_data)
+
+        with self._lock:
+            self.misses += 1
+        WEATHER_CACHE_LOOKUPS.inc(result='miss')
+        return None
+
+    def set(self, latitude, longitude, weather_data):
+        """Caches weather data for the grid cell containing the coordinates"""
+        cell = self.cell(latitude, longitude)
+        weather_data = dict(weather_data)
+        self._store_local(cell, weather_data, time.monotonic())
+
+        shared_cache = self._shared_cache()
+        if shared_cache is not None:
+            try:
+                shared_cache.set(self._shared_key(cell), weather_data, timeout=self.ttl)
+            except Exception as e:
+                logger.warning(f"Shared weather cache unavailable: {str(e)}")
+
+    def _store_local(self, cell, weather_data, now):
+        with self._lock:
+            self._entries[cell] = (now + self.ttl, weather_data)
+            self._entries.move_to_end(cell)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_fetch(self, latitude, longitude, fetch):
+        """
+        Gets cached weather data or fetches and caches it on a miss
+
+        Args:
+            latitude (float): Latitude coordinate
+            longitude (float): Longitude coordinate
+            fetch (callable): Called with (latitude, longitude) on a cache miss
+
+        Returns:
+            dict: Weather data
+        """
+        weather_data = self.get(latitude, longitude)
+        if weather_data is None:
+            weather_data = fetch(latitude, longitude)
+            self.set(latitude, longitude, weather_data)
+        return weather_data
+
+    def clear(self):
+        """Removes all locally cached entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns cache counters
+
+        Returns:
+            dict: hits, shared_hits, misses, evictions and current size
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries)
+            }
+
+
+_weather_cache = None
+_weather_cache_lock = threading.Lock()
+
+
+def get_weather_cache():
+    """
+    Returns the process-wide weather cache configured from settings
+
+    Returns:
+        WeatherCache: Shared cache instance or None if caching is disabled
+    """
+    global _weather_cache
+    if not settings.WEATHER_CACHE_ENABLED:
+        return None
+    if _weather_cache is None:
+        with _weather_cache_lock:
+            if _weather_cache is None:
+                _weather_cache = WeatherCache(
+                    grid_size=settings.WEATHER_CACHE_GRID_DEGREES,
+                    ttl=settings.WEATHER_CACHE_TTL,
+                    max_entries=settings.WEATHER_CACHE_MAX_ENTRIES,
+                    shared_alias=settings.WEATHER_CACHE_SHARED_ALIAS
+                )
+    return _weather_cache
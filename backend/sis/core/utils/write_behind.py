@@ -0,0 +1,314 @@
+"""
+Write-behind buffer for Smart Irrigation System
+Queues irrigation logs in memory and flushes them to MongoDB in batches from a background
+thread, so decision requests never wait for the database. Batches that cannot be written
+are appended to a local spill file and replayed when the writer starts.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from bson import json_util
+from django.conf import settings
+
+from .log_store import PartialWriteError, persist_irrigation_logs
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    Bounded queue of documents flushed in batches by a background thread
+
+    A batch is flushed when batch_size documents are waiting or flush_interval seconds
+    have passed since the first one arrived. When the queue is full, submit() blocks
+    for up to enqueue_timeout seconds (back-pressure) and then spills the document to
+    disk rather than dropping it.
+
+    Args:
+        flush (callable): Persists a list of documents, raises on failure (PartialWriteError
+            when only some of them were not saved)
+        spill_path (str): Append-only JSON lines file for documents that could not be flushed
+        batch_size (int): Maximum documents per flush
+        flush_interval (float): Maximum seconds a document waits before being flushed
+        max_queue (int): Maximum documents waiting in memory
+        enqueue_timeout (float): Seconds submit() blocks on a full queue before spilling
+    """
+
+    def __init__(self, flush, spill_path, batch_size=500, flush_interval=1.0,
+                 max_queue=10000, enqueue_timeout=0.5):
+        self.flush = flush
+        self.spill_path = str(spill_path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+
+        self.flushed = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.last_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+
+    def start(self):
+        """Starts the flush thread, which first replays any spilled documents"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='log-write-behind', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """Stops the flush thread after writing out everything still queued"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, document):
+        """
+        Queues a document for writing
+
+        Args:
+            document (dict): Raw document to persist
+
+        Returns:
+            bool: True if queued, False if the queue stayed full and it was spilled to disk
+        """
+        try:
+            self._queue.put(document, timeout=self.enqueue_timeout)
+            return True
+        except queue.Full:
+            logger.warning("Write-behind queue full, spilling irrigation log to disk")
+            self._spill([document])
+            return False
+
+    def _run(self):
+        try:
+            self.replay_spill()
+        except Exception as e:
+            logger.error(f"Error replaying spill file {self.spill_path}: {str(e)}")
+
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._flush(batch)
+
+        # Drain whatever is left on shutdown
+        batch = self._drain()
+        while batch:
+            self._flush(batch)
+            batch = self._drain()
+
+    def _next_batch(self):
+        """Waits for the first document, then collects until the batch is full or due"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self):
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch):
+        start = time.perf_counter()
+        unsaved = self._try_flush(batch, "flushing")
+        elapsed = time.perf_counter() - start
+
+        with self._stats_lock:
+            self.flushes += 1
+            self.last_flush_seconds = elapsed
+            self.total_flush_seconds += elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            self.flushed += len(batch) - len(unsaved)
+            if unsaved:
+                self.failed_flushes += 1
+
+        if unsaved:
+            self._spill(unsaved)
+
+    def _try_flush(self, batch, action):
+        """Flushes a batch and returns the documents that were not saved"""
+        try:
+            self.flush(batch)
+            return []
+        except PartialWriteError as e:
+            logger.error(f"Error {action} {len(batch)} irrigation logs, spilling {len(e.documents)} to disk: {str(e)}")
+            return e.documents
+        except Exception as e:
+            logger.error(f"Error {action} {len(batch)} irrigation logs, spilling to disk: {str(e)}")
+            return batch
+
+    def _spill(self, documents):
+        """Appends documents to the spill file as extended JSON lines"""
+        lines = ''.join(json_util.dumps(document) + '\n' for document in documents)
+        try:
+            with self._spill_lock:
+                os.makedirs(os.path.dirname(self.spill_path) or '.', exist_ok=True)
+                with open(self.spill_path, 'a', encoding='utf-8') as spill_file:
+                    spill_file.write(lines)
+            with self._stats_lock:
+                self.spilled += len(documents)
+        except OSError as e:
+            logger.error(f"Error writing spill file {self.spill_path}, {len(documents)} logs lost: {str(e)}")
+
+    def replay_spill(self):
+        """
+        Writes spilled documents back to the database
+
+        The spill file is first renamed, so a concurrent process cannot replay the same
+        documents and new spills start a fresh file. Documents that fail again are spilled again.
+
+        Returns:
+            int: Number of documents replayed
+        """
+        replay_path = f"{self.spill_path}.{os.getpid()}.replay"
+        try:
+            with self._spill_lock:
+                os.replace(self.spill_path, replay_path)
+        except FileNotFoundError:
+            return 0
+        except OSError as e:
+            logger.error(f"Error claiming spill file {self.spill_path}: {str(e)}")
+            return 0
+
+        replayed = 0
+        with open(replay_path, encoding='utf-8') as replay_file:
+            batch = []
+            for line in replay_file:
+                if not line.strip():
+                    continue
+                try:
+                    batch.append(json_util.loads(line))
+                except ValueError:
+                    logger.error(f"Skipping corrupt line in spill file: {line[:100]!r}")
+                    continue
+                if len(batch) >= self.batch_size:
+                    replayed += self._replay_batch(batch)
+                    batch = []
+            if batch:
+                replayed += self._replay_batch(batch)
+        os.remove(replay_path)
+
+        if replayed:
+            logger.info(f"Replayed {replayed} spilled irrigation logs")
+        return replayed
+
+    def _replay_batch(self, batch):
+        unsaved = self._try_flush(batch, "replaying spilled")
+        if unsaved:
+            self._spill(unsaved)
+        replayed = len(batch) - len(unsaved)
+        with self._stats_lock:
+            self.replayed += replayed
+        return replayed
+
+    def stats(self):
+        """
+        Returns queue and flush metrics
+
+        Returns:
+            dict: queue_depth, flushed, flushes, failed_flushes, spilled, replayed and
+                  last/avg/max flush latency in seconds
+        """
+        with self._stats_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'flushed': self.flushed,
+                'flushes': self.flushes,
+                'failed_flushes': self.failed_flushes,
+                'spilled': self.spilled,
+                'replayed': self.replayed,
+                'last_flush_seconds': self.last_flush_seconds,
+                'avg_flush_seconds': self.total_flush_seconds / self.flushes if self.flushes else 0.0,
+                'max_flush_seconds': self.max_flush_seconds
+            }
+
+
+_log_writer = None
+_log_writer_lock = threading.Lock()
+
+
+def get_log_writer():
+    """
+    Returns the process-wide, started irrigation log writer
+
+    Returns:
+        WriteBehindBuffer: Writer or None if write-behind is disabled
+    """
+    global _log_writer
+    if not settings.LOG_WRITE_BEHIND_ENABLED:
+        return None
+    if _log_writer is None:
+        with _log_writer_lock:
+            if _log_writer is None:
+                writer = WriteBehindBuffer(
+                    flush=persist_irrigation_logs,
+                    spill_path=settings.LOG_WRITE_SPILL_PATH,
+                    batch_size=settings.LOG_WRITE_BATCH_SIZE,
+                    flush_interval=settings.LOG_WRITE_FLUSH_INTERVAL,
+                    max_queue=settings.LOG_WRITE_QUEUE_SIZE,
+                    enqueue_timeout=settings.LOG_WRITE_ENQUEUE_TIMEOUT
+                )
+                writer.start()
+                atexit.register(writer.stop)
+                _log_writer = writer
+    return _log_writer
+
+
+def _reset_after_fork():
+    # The flush thread does not survive a fork (e.g. gunicorn --preload); the child starts
+    # its own writer on first use and the parent keeps flushing what it had queued
+    global _log_writer, _log_writer_lock
+    _log_writer = None
+    _log_writer_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _log_writer_stat(name):
+    return lambda: _log_writer.stats()[name] if _log_writer is not None else None
+
+
+REGISTRY.gauge('sis_log_write_queue_depth', "Irrigation logs waiting to be flushed", _log_writer_stat('queue_depth'))
+REGISTRY.gauge('sis_log_write_flushed', "Irrigation logs flushed to MongoDB", _log_writer_stat('flushed'))
+REGISTRY.gauge('sis_log_write_failed_flushes', "Flushes that failed and spilled to disk",
+               _log_writer_stat('failed_flushes'))
+REGISTRY.gauge('sis_log_write_spilled', "Irrigation logs spilled to disk", _log_writer_stat('spilled'))
+REGISTRY.gauge('sis_log_write_max_flush_seconds', "Slowest flush so far", _log_writer_stat('max_flush_seconds'),
+               aggregate='max')
+
+
+def start_log_writer():
+    """Starts the log writer at server startup so spilled logs are replayed right away"""
+    get_log_writer()
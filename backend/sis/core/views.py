@@ -1,137 +1,202 @@
 """
-API views for Smart Irrigation System (Temporary implementation without MongoDB)
+API views for Smart Irrigation System
+Irrigation decisions, history, statistics and sensor ingestion backed by MongoDB, with
+in-memory fallbacks when the database is unavailable
 """
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.http import JsonResponse
-import json
-import csv
-from datetime import datetime
+from rest_framework.permissions import AllowAny
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig
+from django.http import StreamingHttpResponse
+from bson import ObjectId
+from dateutil.parser import isoparse
+from datetime import datetime, timezone
+import itertools
 import logging
-import random
 
 # Import MongoDB models
-from .models import Crop, Soil, IrrigationLog, SensorData, WeatherData, IrrigationDecision
+from .models import IrrigationLog, IrrigationRollup, SensorData, WeatherData, IrrigationDecision
 
 from .utils.sensor_simulator import simulate_sensor_data
-from .utils.weather_api import get_weather_data
+from .utils.sensor_readings import (
+    current_sensor_data, get_latest_readings, parse_readings, store_readings, supported_content_types,
+    validate_readings
+)
+from .utils.weather_api import FALLBACK_WEATHER, get_weather_data, get_weather_data_many
+from .utils.batch_engine import calculate_irrigation_decisions, decisions_to_dicts
+from .utils.catalogue import get_catalogue
+from .utils.decision_cache import get_decision_cache
+from .utils.decision_engine import get_engine_version
+from .utils.decision_rules import FALLBACK_DECISION, apply_crop_rules
+from .utils.csv_export import CSV_PROJECTION, gzip_chunks, iter_csv_chunks
+from .utils.pagination import decode_cursor, keyset_query, page_cursors
+from .utils.rollups import rollups_backfilled
+from .utils.serializers import HISTORY_PROJECTION, history_entries
+from .utils.stats import (
+    TIME_BUCKETS, build_rollup_stats_pipeline, build_stats_pipeline, format_stats, rollup_query
+)
+from .utils.geo import parse_area
+from .utils.history_buffer import HistoryBuffer
+from .utils.metrics import DECISIONS, MONGO_FALLBACKS, stage
+from .utils.log_store import PartialWriteError, get_log_store, persist_irrigation_logs
+from .utils.write_behind import get_log_writer
 
 logger = logging.getLogger(__name__)
 
-# Temporary in-memory storage for demo purposes
-CROPS = {
-    "turmeric": {
-        "name": "turmeric",
-        "ideal_moisture": [65, 75],
-        "ideal_temp": [25, 30],
-        "base_water_lph": 1.2
-    },
-    "tomato": {
-        "name": "tomato",
-        "ideal_moisture": [60, 70],
-        "ideal_temp": [20, 28],
-        "base_water_lph": 0.9
-    },
-    "potato": {
-        "name": "potato",
-        "ideal_moisture": [55, 65],
-        "ideal_temp": [18, 24],
-        "base_water_lph": 0.8
-    },
-    "rice": {
-        "name": "rice",
-        "ideal_moisture": [80, 90],
-        "ideal_temp": [24, 32],
-        "base_water_lph": 1.5
-    }
-}
+# In-memory history of recent logs, bounded per worker
+IRRIGATION_HISTORY = HistoryBuffer(capacity=settings.HISTORY_BUFFER_SIZE)
+
+def validate_decision_request(data, catalogue):
+    """
+    Validates the inputs of a single irrigation decision request
+
+    Args:
+        data (dict): Request data with crop_type, soil_type, latitude, longitude
+                     and optionally the field_id of a probe-equipped field
+        catalogue (Catalogue): Crop and soil catalogue snapshot
+
+    Returns:
+        tuple: (latitude, longitude, error) - error is None when the request is valid
+    """
+    # Validate required fields
+    required_fields = ['crop_type', 'soil_type', 'latitude', 'longitude']
+    for field in required_fields:
+        if field not in data:
+            return None, None, f"Missing required field: {field}"
+
+    # Validate numeric fields
+    try:
+        latitude = float(data['latitude'])
+        longitude = float(data['longitude'])
+    except (TypeError, ValueError):
+        return None, None, "Latitude and longitude must be numeric"
+    if not (-90 <= latitude <= 90) or not (-180 <= longitude <= 180):
+        return None, None, "Invalid latitude or longitude values"
+    if data.get('field_id') is not None and not isinstance(data['field_id'], str):
+        return None, None, "field_id must be a string"
+
+    # Validate crop and soil types
+    if data['crop_type'] not in catalogue.crops:
+        return None, None, f"Crop type '{data['crop_type']}' not found"
+    if data['soil_type'] not in catalogue.soils:
+        return None, None, f"Soil type '{data['soil_type']}' not found"
+
+    return latitude, longitude, None
+
+def parse_time_filter(value):
+    """
+    Parses an ISO 8601 date or datetime query parameter into a naive UTC datetime,
+    matching how timestamps are stored in MongoDB
+
+    Args:
+        value (str): Query parameter value or None
 
-SOILS = {
-    "Red Soil": {
-        "name": "Red Soil",
-        "absorption_rate": 0.8
-    },
-    "Black Soil": {
-        "name": "Black Soil",
-        "absorption_rate": 0.7
-    },
-    "Alluvial Soil": {
-        "name": "Alluvial Soil",
-        "absorption_rate": 0.9
-    },
-    "Loamy Soil": {
-        "name": "Loamy Soil",
-        "absorption_rate": 0.85
+    Returns:
+        datetime: Parsed datetime or None if the parameter is missing
+
+    Raises:
+        ValueError: If the value is not ISO 8601
+    """
+    if not value:
+        return None
+    parsed = isoparse(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def parse_log_filters(query_params):
+    """
+    Builds a MongoDB filter on irrigation logs from request query parameters
+
+    Args:
+        query_params (QueryDict): user, crop_type, soil_type, status, start and end (ISO 8601)
+
+    Returns:
+        tuple: (query, filters, start, end) - filters maps log fields to requested values
+
+    Raises:
+        ValueError: If start or end is not ISO 8601
+    """
+    try:
+        start = parse_time_filter(query_params.get('start'))
+        end = parse_time_filter(query_params.get('end'))
+    except ValueError:
+        raise ValueError("start and end must be ISO 8601 dates")
+
+    filters = {
+        'user': query_params.get('user'),
+        'crop_type': query_params.get('crop_type'),
+        'soil_type': query_params.get('soil_type'),
+        'decision.status': query_params.get('status'),
     }
-}
 
-# In-memory history storage
-IRRIGATION_HISTORY = []
+    query = {field: value for field, value in filters.items() if value}
+    if start or end:
+        query['timestamp'] = {}
+        if start:
+            query['timestamp']['$gte'] = start
+        if end:
+            query['timestamp']['$lt'] = end
+
+    return query, filters, start, end
+
+def build_irrigation_log(user, crop_type, soil_type, latitude, longitude, sensor_data, weather_data, decision,
+                         field_id=None):
+    """
+    Builds an IrrigationLog document with its embedded sensor, weather and decision data
+    """
+    return IrrigationLog(
+        user=user,
+        crop_type=crop_type,
+        soil_type=soil_type,
+        latitude=latitude,
+        longitude=longitude,
+        field_id=field_id,
+        location=[longitude, latitude],
+        sensor_data=SensorData(
+            soil_moisture=sensor_data['soil_moisture'],
+            temperature=sensor_data['temperature'],
+            humidity=sensor_data['humidity']
+        ),
+        weather_data=WeatherData(
+            temperature=weather_data['temperature'],
+            humidity=weather_data['humidity'],
+            rain_probability=weather_data['rain_probability']
+        ),
+        decision=IrrigationDecision(
+            water_amount=decision['water_amount'],
+            duration=decision['duration'],
+            status=decision['status'],
+            engine_version=decision.get('engine_version')
+        )
+    )
 
-def calculate_irrigation_decision(crop_data, soil_data, sensor_data, weather_data):
+def decide_irrigation(catalogue, crop_data, soil_data, sensor_data, weather_data):
     """
-    Simplified decision engine for demo purposes
+    Calculates an irrigation decision with the crop's rules compiled for the configured
+    engine version, memoized when the decision cache is enabled
     """
+    engine_version = get_engine_version()
     try:
-        # Extract relevant data
-        base_water = crop_data['base_water_lph']
-        ideal_moisture_min = crop_data['ideal_moisture'][0]
-        ideal_moisture_max = crop_data['ideal_moisture'][1]
-        ideal_temp_min = crop_data['ideal_temp'][0]
-        ideal_temp_max = crop_data['ideal_temp'][1]
-        
-        soil_absorption = soil_data['absorption_rate']
-        
-        current_moisture = sensor_data['soil_moisture']
-        current_temp = sensor_data['temperature']
-        
-        rain_probability = weather_data['rain_probability']
-        
-        # Initialize water amount with base value
-        water_amount = base_water
-        
-        # Apply rule-based adjustments
-        if current_moisture < ideal_moisture_min:
-            water_amount *= 1.2  # Increase by 20%
-        elif current_moisture > ideal_moisture_max:
-            water_amount *= 0.8  # Decrease by 20%
-            
-        if current_temp > ideal_temp_max:
-            water_amount *= 1.1  # Increase by 10%
-            
-        if rain_probability > 60.0:
-            water_amount *= 0.5  # Decrease by 50%
-            
-        water_amount /= soil_absorption
-        
-        # Calculate duration
-        duration = 2.0
-        if current_moisture < ideal_moisture_min:
-            duration = 3.0
-        
-        # Determine status
-        if rain_probability > 80.0:
-            status = "Pending"
-        elif current_moisture > ideal_moisture_max * 1.2:
-            status = "Cancelled"
-        else:
-            status = "Active"
-        
-        return {
-            'water_amount': round(water_amount, 2),
-            'duration': round(duration, 1),
-            'status': status
-        }
-        
+        crop_rules = catalogue.crop_table_for(engine_version).rules_for(crop_data['name'])
+        decision_cache = get_decision_cache()
+        if decision_cache is None:
+            return apply_crop_rules(
+                crop_rules,
+                soil_data['absorption_rate'],
+                sensor_data['soil_moisture'],
+                sensor_data['temperature'],
+                weather_data['rain_probability']
+            )
+        return decision_cache.decide(
+            f"{engine_version}:{catalogue.version}",
+            crop_rules, soil_data, sensor_data, weather_data
+        )
     except Exception as e:
         logger.error(f"Error calculating irrigation decision: {str(e)}")
-        return {
-            'water_amount': 1.0,
-            'duration': 2.0,
-            'status': 'Pending'
-        }
+        return dict(FALLBACK_DECISION)
 
 class IrrigationDecisionView(APIView):
     """
@@ -145,131 +210,100 @@ class IrrigationDecisionView(APIView):
             # Extract input data
             data = request.data
             
-            # Validate required fields
-            required_fields = ['crop_type', 'soil_type', 'latitude', 'longitude']
-            for field in required_fields:
-                if field not in data:
-                    return Response(
-                        {"error": f"Missing required field: {field}"}, 
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-            
-            # Validate numeric fields
-            try:
-                latitude = float(data['latitude'])
-                longitude = float(data['longitude'])
-                if not (-90 <= latitude <= 90) or not (-180 <= longitude <= 180):
-                    return Response(
-                        {"error": "Invalid latitude or longitude values"}, 
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-            except ValueError:
-                return Response(
-                    {"error": "Latitude and longitude must be numeric"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Validate crop and soil types
-            if data['crop_type'] not in CROPS:
-                return Response(
-                    {"error": f"Crop type '{data['crop_type']}' not found"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            if data['soil_type'] not in SOILS:
-                return Response(
-                    {"error": f"Soil type '{data['soil_type']}' not found"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+            with stage('decision.validation'):
+                catalogue = get_catalogue()
+                latitude, longitude, error = validate_decision_request(data, catalogue)
+            if error:
+                return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
             
-            crop = CROPS[data['crop_type']]
-            soil = SOILS[data['soil_type']]
+            crop = catalogue.crops[data['crop_type']]
+            soil = catalogue.soils[data['soil_type']]
             
-            # Simulate sensor data
-            sensor_data = simulate_sensor_data()
+            # Use the field's latest probe reading, or simulate sensor data without one
+            field_id = data.get('field_id')
+            with stage('decision.sensor'):
+                sensor_data = current_sensor_data(field_id)
+                sensor_source = 'probe' if sensor_data else 'simulated'
+                if sensor_data is None:
+                    sensor_data = simulate_sensor_data()
             
             # Get weather data or use fallback
-            try:
-                weather_data = get_weather_data(latitude, longitude)
-            except Exception as e:
-                logger.error(f"Weather API error: {str(e)}")
-                # Fallback weather data
-                weather_data = {
-                    'temperature': 25.0,
-                    'humidity': 60.0,
-                    'rain_probability': 10.0
-                }
+            with stage('decision.weather'):
+                try:
+                    weather_data = get_weather_data(latitude, longitude)
+                except Exception as e:
+                    logger.error(f"Weather API error: {str(e)}")
+                    weather_data = dict(FALLBACK_WEATHER)
             
             # Calculate irrigation decision
-            decision = calculate_irrigation_decision(
-                crop_data=crop,
-                soil_data=soil,
-                sensor_data=sensor_data,
-                weather_data=weather_data
-            )
+            with stage('decision.decision'):
+                decision = decide_irrigation(
+                    catalogue=catalogue,
+                    crop_data=crop,
+                    soil_data=soil,
+                    sensor_data=sensor_data,
+                    weather_data=weather_data
+                )
+            DECISIONS.inc(status=decision['status'], endpoint='single', engine=decision['engine_version'])
             
             # Create log entry
             log_entry = {
-                'id': str(len(IRRIGATION_HISTORY) + 1),
+                'id': None,
                 'timestamp': datetime.now().isoformat(),
                 'user': request.user.username if request.user.is_authenticated else 'guest',
                 'crop_type': data['crop_type'],
                 'soil_type': data['soil_type'],
                 'latitude': latitude,
                 'longitude': longitude,
+                'field_id': field_id,
                 'sensor_data': sensor_data,
                 'weather_data': weather_data,
                 'decision': decision
             }
             
-            # Add to history
-            IRRIGATION_HISTORY.append(log_entry)
-            
-            # Save to MongoDB
-            try:
-                # Create embedded documents
-                sensor_doc = SensorData(
-                    soil_moisture=sensor_data['soil_moisture'],
-                    temperature=sensor_data['temperature'],
-                    humidity=sensor_data['humidity']
-                )
-                
-                weather_doc = WeatherData(
-                    temperature=weather_data['temperature'],
-                    humidity=weather_data['humidity'],
-                    rain_probability=weather_data['rain_probability']
-                )
-                
-                decision_doc = IrrigationDecision(
-                    water_amount=decision['water_amount'],
-                    duration=decision['duration'],
-                    status=decision['status']
-                )
+            # Save to MongoDB, through the write-behind buffer when enabled
+            with stage('decision.persist'):
+                try:
+                    # Create log document
+                    irrigation_log = build_irrigation_log(
+                        user=log_entry['user'],
+                        crop_type=data['crop_type'],
+                        soil_type=data['soil_type'],
+                        latitude=latitude,
+                        longitude=longitude,
+                        sensor_data=sensor_data,
+                        weather_data=weather_data,
+                        decision=decision,
+                        field_id=field_id
+                    )
+                    irrigation_log.validate()
+                    document = irrigation_log.to_mongo().to_dict()
+                    document['_id'] = ObjectId()
                 
-                # Create and save log document
-                irrigation_log = IrrigationLog(
-                    user=request.user.username if request.user.is_authenticated else 'guest',
-                    crop_type=data['crop_type'],
-                    soil_type=data['soil_type'],
-                    latitude=latitude,
-                    longitude=longitude,
-                    sensor_data=sensor_doc,
-                    weather_data=weather_doc,
-                    decision=decision_doc
-                )
-                irrigation_log.save()
+                    log_writer = get_log_writer()
+                    if log_writer is not None:
+                        log_writer.submit(document)
+                    else:
+                        persist_irrigation_logs([document])
                 
-                # Use MongoDB ID for response
-                log_entry['id'] = str(irrigation_log.id)
-            except Exception as e:
-                logger.error(f"Error saving to MongoDB: {str(e)}")
-                # Continue with in-memory storage if MongoDB fails
-                pass
+                    # Use MongoDB ID for response
+                    log_entry['id'] = str(document['_id'])
+                except Exception as e:
+                    logger.error(f"Error saving to MongoDB: {str(e)}")
+                    MONGO_FALLBACKS.inc(operation='save')
+                    # Continue with in-memory storage if MongoDB fails
+                    pass
+            
+            # Add to history (numbered in memory if MongoDB did not assign an id)
+            log_entry['id'] = IRRIGATION_HISTORY.append(log_entry)
             
             # Prepare response
             response_data = {
                 'id': log_entry['id'],
                 'timestamp': log_entry['timestamp'],
+                'field_id': field_id,
                 'sensor_data': sensor_data,
+                'sensor_source': sensor_source,
                 'weather_data': weather_data,
                 'decision': decision
             }
@@ -283,87 +317,226 @@ class IrrigationDecisionView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class BatchIrrigationDecisionView(APIView):
+    """
+    API view for making irrigation decisions for many fields at once
+    POST: Validate all field requests, fetch weather once per distinct location,
+          compute every decision in bulk and persist the logs with a single insert
+    """
+    permission_classes = [AllowAny]  # Temporarily set to AllowAny for demo
+    
+    def post(self, request):
+        try:
+            # Accept either {"fields": [...]} or a bare list of field requests
+            data = request.data
+            fields = data.get('fields') if isinstance(data, dict) else data
+            if not isinstance(fields, list) or not fields:
+                return Response(
+                    {"error": "Request body must contain a non-empty 'fields' list"}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if len(fields) > settings.IRRIGATION_BATCH_MAX_FIELDS:
+                return Response(
+                    {"error": f"Too many fields in batch (maximum {settings.IRRIGATION_BATCH_MAX_FIELDS})"}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            # Validate every field request and report all errors together
+            with stage('batch.validation'):
+                catalogue = get_catalogue()
+                coordinates = []
+                errors = []
+                for index, field in enumerate(fields):
+                    if not isinstance(field, dict):
+                        errors.append({'index': index, 'error': "Field request must be an object"})
+                        continue
+                    latitude, longitude, error = validate_decision_request(field, catalogue)
+                    if error:
+                        errors.append({'index': index, 'error': error})
+                    else:
+                        coordinates.append((latitude, longitude))
+            if errors:
+                return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Get weather data once per distinct location, fetched concurrently
+            with stage('batch.weather'):
+                locations = list(set(coordinates))
+                weather_by_location = dict(zip(locations, get_weather_data_many(locations)))
+                weather_data = [weather_by_location[location] for location in coordinates]
+            
+            # Use each field's latest probe reading, or simulate sensor data without one
+            with stage('batch.sensor'):
+                probe_data = [current_sensor_data(field.get('field_id')) for field in fields]
+                sensor_sources = ['probe' if reading else 'simulated' for reading in probe_data]
+                sensor_data = [reading or simulate_sensor_data() for reading in probe_data]
+            
+            # Calculate all irrigation decisions in one vectorized pass
+            with stage('batch.decision'):
+                crop_table = catalogue.crop_table_for(get_engine_version())
+                decisions = decisions_to_dicts(calculate_irrigation_decisions(
+                    crop_table=crop_table,
+                    soil_table=catalogue.soil_table,
+                    crop_index=crop_table.indices(field['crop_type'] for field in fields),
+                    soil_index=catalogue.soil_table.indices(field['soil_type'] for field in fields),
+                    soil_moisture=[reading['soil_moisture'] for reading in sensor_data],
+                    temperature=[reading['temperature'] for reading in sensor_data],
+                    rain_probability=[weather['rain_probability'] for weather in weather_data]
+                ))
+            for decision in decisions:
+                DECISIONS.inc(status=decision['status'], endpoint='batch', engine=decision['engine_version'])
+            
+            # Create log entries
+            user = request.user.username if request.user.is_authenticated else 'guest'
+            timestamp = datetime.now().isoformat()
+            log_entries = []
+            for field, (latitude, longitude), sensor, weather, decision in zip(
+                fields, coordinates, sensor_data, weather_data, decisions
+            ):
+                log_entries.append({
+                    'id': None,
+                    'timestamp': timestamp,
+                    'user': user,
+                    'crop_type': field['crop_type'],
+                    'soil_type': field['soil_type'],
+                    'latitude': latitude,
+                    'longitude': longitude,
+                    'field_id': field.get('field_id'),
+                    'sensor_data': sensor,
+                    'weather_data': weather,
+                    'decision': decision
+                })
+            
+            # Save to MongoDB with a single bulk insert
+            with stage('batch.persist'):
+                documents = []
+                inserted_ids = []
+                try:
+                    for entry in log_entries:
+                        irrigation_log = build_irrigation_log(
+                            user=entry['user'],
+                            crop_type=entry['crop_type'],
+                            soil_type=entry['soil_type'],
+                            latitude=entry['latitude'],
+                            longitude=entry['longitude'],
+                            sensor_data=entry['sensor_data'],
+                            weather_data=entry['weather_data'],
+                            decision=entry['decision'],
+                            field_id=entry['field_id']
+                        )
+                        irrigation_log.validate()
+                        document = irrigation_log.to_mongo().to_dict()
+                        document['_id'] = ObjectId()
+                        documents.append(document)
+                
+                    inserted_ids = persist_irrigation_logs(documents)
+                except PartialWriteError as e:
+                    logger.error(f"Error bulk saving to MongoDB: {str(e)}")
+                    MONGO_FALLBACKS.inc(operation='batch_save')
+                    # Logs MongoDB did save keep their ids
+                    inserted_ids = e.inserted_ids
+                except Exception as e:
+                    logger.error(f"Error bulk saving to MongoDB: {str(e)}")
+                    MONGO_FALLBACKS.inc(operation='batch_save')
+                    # Continue with in-memory storage if MongoDB fails
+                    pass
+            
+            # Use MongoDB IDs for response
+            inserted_ids = set(inserted_ids)
+            for entry, document in zip(log_entries, documents):
+                if document['_id'] in inserted_ids:
+                    entry['id'] = str(document['_id'])
+            
+            # Add to history (numbered in memory if MongoDB did not assign an id)
+            for entry in log_entries:
+                entry['id'] = IRRIGATION_HISTORY.append(entry)
+            
+            # Prepare response
+            response_data = {
+                'count': len(log_entries),
+                'decisions': [
+                    {
+                        'id': entry['id'],
+                        'timestamp': entry['timestamp'],
+                        'crop_type': entry['crop_type'],
+                        'soil_type': entry['soil_type'],
+                        'latitude': entry['latitude'],
+                        'longitude': entry['longitude'],
+                        'field_id': entry['field_id'],
+                        'sensor_data': entry['sensor_data'],
+                        'sensor_source': sensor_source,
+                        'weather_data': entry['weather_data'],
+                        'decision': entry['decision']
+                    }
+                    for entry, sensor_source in zip(log_entries, sensor_sources)
+                ]
+            }
+            
+            return Response(response_data, status=status.HTTP_201_CREATED)
+            
+        except Exception as e:
+            logger.error(f"Error processing batch irrigation decisions: {str(e)}")
+            return Response(
+                {"error": "An unexpected error occurred", "details": str(e)}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
 class IrrigationHistoryView(APIView):
     """
     API view for retrieving irrigation history
-    GET: Retrieve irrigation history (limit to 50 records, sorted by timestamp)
+    GET: Retrieve a page of irrigation history, newest first
+         Paging: limit (default 50), cursor (opaque next/prev cursor from a previous page)
+         Optional filters: user, crop_type, soil_type, status, start, end (ISO 8601)
     """
     permission_classes = [AllowAny]  # Temporarily set to AllowAny for demo
     
     def get(self, request):
         try:
             # Get query parameters
-            limit = int(request.query_params.get('limit', 50))
-            crop_type = request.query_params.get('crop_type', None)
+            try:
+                limit = int(request.query_params.get('limit', 50))
+                if not 1 <= limit <= settings.HISTORY_MAX_PAGE_SIZE:
+                    raise ValueError()
+            except ValueError:
+                return Response(
+                    {"error": f"limit must be between 1 and {settings.HISTORY_MAX_PAGE_SIZE}"}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            try:
+                cursor = request.query_params.get('cursor')
+                cursor = decode_cursor(cursor) if cursor else None
+                query, filters, start, end = parse_log_filters(request.query_params)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
             
             # Try to get data from MongoDB first
             try:
-                # Query MongoDB
-                if crop_type:
-                    mongo_logs = IrrigationLog.objects(crop_type=crop_type).order_by('-timestamp').limit(limit)
-                else:
-                    mongo_logs = IrrigationLog.objects.order_by('-timestamp').limit(limit)
-                
-                # Convert MongoDB documents to dictionary format
-                mongo_history = []
-                for log in mongo_logs:
-                    mongo_history.append({
-                        'id': str(log.id),
-                        'timestamp': log.timestamp.isoformat(),
-                        'user': log.user,
-                        'crop_type': log.crop_type,
-                        'soil_type': log.soil_type,
-                        'latitude': log.latitude,
-                        'longitude': log.longitude,
-                        'sensor_data': {
-                            'soil_moisture': log.sensor_data.soil_moisture,
-                            'temperature': log.sensor_data.temperature,
-                            'humidity': log.sensor_data.humidity
-                        },
-                        'weather_data': {
-                            'temperature': log.weather_data.temperature,
-                            'humidity': log.weather_data.humidity,
-                            'rain_probability': log.weather_data.rain_probability
-                        },
-                        'decision': {
-                            'water_amount': log.decision.water_amount,
-                            'duration': log.decision.duration,
-                            'status': log.decision.status
-                        }
-                    })
+                page_query, sort = keyset_query(query, cursor)
+                # Raw documents projected straight to the response shape
+                store = get_log_store()
+                with stage('history.query'):
+                    mongo_logs = list(store.collection().find(
+                        store.query(page_query), store.projection(HISTORY_PROJECTION), sort=sort, limit=limit + 1
+                    ))
+                mongo_logs, next_cursor, prev_cursor = page_cursors(mongo_logs, limit, cursor)
+                mongo_history = history_entries(mongo_logs)
                 
-                # If we have MongoDB data, use it
-                if mongo_history:
-                    filtered_history = mongo_history
-                else:
-                    # Fall back to in-memory data
-                    # Filter history
-                    if crop_type:
-                        filtered_history = [log for log in IRRIGATION_HISTORY if log['crop_type'] == crop_type]
-                    else:
-                        filtered_history = IRRIGATION_HISTORY.copy()
-                    
-                    # Sort by timestamp (newest first)
-                    filtered_history.sort(key=lambda x: x['timestamp'], reverse=True)
-                    
-                    # Apply limit
-                    filtered_history = filtered_history[:limit]
+                # If we have MongoDB data (or are paging through it), use it
+                if mongo_history or cursor:
+                    return Response({
+                        'history': mongo_history,
+                        'next': next_cursor,
+                        'prev': prev_cursor
+                    }, status=status.HTTP_200_OK)
             except Exception as e:
                 logger.error(f"Error retrieving from MongoDB: {str(e)}")
-                # Fall back to in-memory data
-                # Filter history
-                if crop_type:
-                    filtered_history = [log for log in IRRIGATION_HISTORY if log['crop_type'] == crop_type]
-                else:
-                    filtered_history = IRRIGATION_HISTORY.copy()
-                
-                # Sort by timestamp (newest first)
-                filtered_history.sort(key=lambda x: x['timestamp'], reverse=True)
-                
-                # Apply limit
-                filtered_history = filtered_history[:limit]
+                MONGO_FALLBACKS.inc(operation='history')
             
-            return Response({'history': filtered_history}, status=status.HTTP_200_OK)
+            # Fall back to in-memory data (first page only, it holds recent logs)
+            return Response({
+                'history': IRRIGATION_HISTORY.latest(limit, filters, start, end),
+                'next': None,
+                'prev': None
+            }, status=status.HTTP_200_OK)
             
         except Exception as e:
             logger.error(f"Error retrieving irrigation history: {str(e)}")
@@ -375,69 +548,50 @@ class IrrigationHistoryView(APIView):
 class ExportHistoryCSVView(APIView):
     """
     API view for exporting irrigation history as CSV
-    GET: Export irrigation history as CSV
+    GET: Stream irrigation history as CSV, newest first
+         Optional filters: user, crop_type, soil_type, status, start, end (ISO 8601)
+         Optional compression: compress=gzip
     """
     permission_classes = [AllowAny]  # Temporarily set to AllowAny for demo
     
     def get(self, request):
         try:
-            # Create CSV response
-            response = JsonResponse({})
-            response['Content-Type'] = 'text/csv'
-            response['Content-Disposition'] = 'attachment; filename="irrigation_history.csv"'
-            
-            # Write CSV data
-            writer = csv.writer(response)
-            writer.writerow([
-                'Timestamp', 'Crop Type', 'Soil Type', 'Latitude', 'Longitude',
-                'Soil Moisture (%)', 'Sensor Temp (°C)', 'Sensor Humidity (%)',
-                'Weather Temp (°C)', 'Weather Humidity (%)', 'Rain Probability (%)',
-                'Water Amount (L/h)', 'Duration (h)', 'Status'
-            ])
+            try:
+                query, filters, start, end = parse_log_filters(request.query_params)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            compress = request.query_params.get('compress', '')
+            if compress not in ('', 'gzip'):
+                return Response(
+                    {"error": "compress must be 'gzip'"}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             
-            # Try to get data from MongoDB first
+            # Try to stream from MongoDB first, over a raw cursor with a projection
             try:
-                mongo_logs = IrrigationLog.objects.order_by('-timestamp')
-                
-                # Write MongoDB data to CSV
-                for log in mongo_logs:
-                    writer.writerow([
-                        log.timestamp.isoformat(),
-                        log.crop_type,
-                        log.soil_type,
-                        log.latitude,
-                        log.longitude,
-                        log.sensor_data.soil_moisture,
-                        log.sensor_data.temperature,
-                        log.sensor_data.humidity,
-                        log.weather_data.temperature,
-                        log.weather_data.humidity,
-                        log.weather_data.rain_probability,
-                        log.decision.water_amount,
-                        log.decision.duration,
-                        log.decision.status
-                    ])
+                store = get_log_store()
+                cursor = store.collection().find(
+                    store.query(query),
+                    store.projection(CSV_PROJECTION),
+                    sort=[('timestamp', -1)],
+                    batch_size=settings.EXPORT_CSV_BATCH_SIZE
+                )
+                # Fetch the first batch now so connection errors can still fall back
+                first_log = next(cursor, None)
+                logs = itertools.chain([first_log], cursor) if first_log else iter(())
             except Exception as e:
                 logger.error(f"Error retrieving from MongoDB for CSV export: {str(e)}")
+                MONGO_FALLBACKS.inc(operation='export_csv')
                 # Fall back to in-memory data
-                for log in IRRIGATION_HISTORY:
-                    writer.writerow([
-                        log['timestamp'],
-                        log['crop_type'],
-                        log['soil_type'],
-                        log['latitude'],
-                        log['longitude'],
-                        log['sensor_data']['soil_moisture'],
-                        log['sensor_data']['temperature'],
-                        log['sensor_data']['humidity'],
-                        log['weather_data']['temperature'],
-                        log['weather_data']['humidity'],
-                        log['weather_data']['rain_probability'],
-                        log['decision']['water_amount'],
-                        log['decision']['duration'],
-                        log['decision']['status']
-                    ])
-
+                logs = IRRIGATION_HISTORY.newest(filters, start, end)
+            
+            chunks = iter_csv_chunks(logs, chunk_rows=settings.EXPORT_CSV_BATCH_SIZE)
+            if compress == 'gzip':
+                response = StreamingHttpResponse(gzip_chunks(chunks), content_type='application/gzip')
+                response['Content-Disposition'] = 'attachment; filename="irrigation_history.csv.gz"'
+            else:
+                response = StreamingHttpResponse(chunks, content_type='text/csv')
+                response['Content-Disposition'] = 'attachment; filename="irrigation_history.csv"'
             
             return response
             
@@ -448,6 +602,198 @@ class ExportHistoryCSVView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class IrrigationStatsView(APIView):
+    """
+    API view for water-usage analytics
+    GET: Totals and averages of water amount and duration per crop, soil, status
+         and time bucket, computed by a single MongoDB aggregation
+         Optional: bucket (hour, day or week; default day)
+         Optional filters: user, crop_type, soil_type, status, start, end (ISO 8601)
+         Optional: source (auto, logs or rollups; default auto)
+    
+    With source=auto the hourly/daily rollups answer the query whenever they can
+    (no status filter, time range aligned to the rollup granularity) once
+    backfill_rollups has rolled up the existing logs; before that the logs answer.
+    """
+    permission_classes = [AllowAny]  # Temporarily set to AllowAny for demo
+    
+    def get(self, request):
+        try:
+            bucket = request.query_params.get('bucket', 'day')
+            if bucket not in TIME_BUCKETS:
+                return Response(
+                    {"error": f"bucket must be one of: {', '.join(TIME_BUCKETS)}"}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            source = request.query_params.get('source', 'auto')
+            if source not in ('auto', 'logs', 'rollups'):
+                return Response(
+                    {"error": "source must be one of: auto, logs, rollups"}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            try:
+                query, filters, start, end = parse_log_filters(request.query_params)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Prefer the pre-aggregated rollups over scanning raw logs, once they cover all logs
+            use_rollups = source == 'rollups' or (source == 'auto' and rollups_backfilled())
+            rollup_filter = rollup_query(query, bucket) if use_rollups else None
+            if source == 'rollups' and rollup_filter is None:
+                return Response(
+                    {"error": "Rollups cannot answer status filters or time ranges not aligned to the bucket"}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            if rollup_filter is not None:
+                pipeline = build_rollup_stats_pipeline(rollup_filter, bucket)
+                result = next(IrrigationRollup._get_collection().aggregate(pipeline), None)
+                source = 'rollups'
+            else:
+                store = get_log_store()
+                pipeline = store.pipeline(build_stats_pipeline(query, bucket))
+                result = next(store.collection().aggregate(pipeline), None)
+                source = 'logs'
+            
+            stats = format_stats(result, bucket)
+            stats['source'] = source
+            return Response(stats, status=status.HTTP_200_OK)
+            
+        except Exception as e:
+            logger.error(f"Error computing irrigation stats: {str(e)}")
+            return Response(
+                {"error": "An unexpected error occurred", "details": str(e)}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class NearbyIrrigationView(APIView):
+    """
+    API view for recent irrigation decisions in an area, for map views
+    GET: Logs within a circle (lat, lon, radius in meters) or a polygon
+         ('lat,lon;lat,lon;...'), newest first
+         Optional: limit (default 100)
+         Optional filters: user, crop_type, soil_type, status, start, end (ISO 8601)
+    """
+    permission_classes = [AllowAny]  # Temporarily set to AllowAny for demo
+    
+    def get(self, request):
+        try:
+            try:
+                limit = int(request.query_params.get('limit', 100))
+                if not 1 <= limit <= settings.HISTORY_MAX_PAGE_SIZE:
+                    raise ValueError()
+            except ValueError:
+                return Response(
+                    {"error": f"limit must be between 1 and {settings.HISTORY_MAX_PAGE_SIZE}"}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            try:
+                area, contains = parse_area(request.query_params, settings.NEARBY_MAX_RADIUS_METERS)
+                query, filters, start, end = parse_log_filters(request.query_params)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Try MongoDB first, served by the (location 2dsphere, -timestamp) index
+            try:
+                store = get_log_store()
+                logs = list(store.collection().find(
+                    store.query(dict(query, **area)),
+                    store.projection(HISTORY_PROJECTION),
+                    sort=[('timestamp', -1)],
+                    limit=limit
+                ))
+                history = history_entries(logs)
+            except Exception as e:
+                logger.error(f"Error retrieving nearby logs from MongoDB: {str(e)}")
+                MONGO_FALLBACKS.inc(operation='nearby')
+                # Fall back to in-memory data
+                nearby = (
+                    log for log in IRRIGATION_HISTORY.newest(filters, start, end)
+                    if contains(log['latitude'], log['longitude'])
+                )
+                history = list(itertools.islice(nearby, limit))
+            
+            return Response({
+                'count': len(history),
+                'history': history
+            }, status=status.HTTP_200_OK)
+            
+        except Exception as e:
+            logger.error(f"Error retrieving nearby irrigation logs: {str(e)}")
+            return Response(
+                {"error": "An unexpected error occurred", "details": str(e)}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class SensorReadingsView(APIView):
+    """
+    API view for ingesting soil probe readings
+    POST: Validate and store a batch of readings
+          Body: JSON lines (application/x-ndjson), a JSON array or {"readings": [...]}
+          (application/json), or a msgpack array (application/msgpack, if installed)
+          Each reading: {field_id, timestamp (ISO 8601 or epoch seconds, default now),
+          soil_moisture, temperature, humidity} or the same values as an array
+    
+    Valid readings are stored even when others in the batch are rejected.
+    """
+    permission_classes = [AllowAny]  # Temporarily set to AllowAny for demo
+    
+    def post(self, request):
+        try:
+            content_type = request.content_type.split(';')[0].strip().lower()
+            if content_type not in supported_content_types():
+                return Response(
+                    {"error": f"Content type must be one of: {', '.join(supported_content_types())}"}, 
+                    status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+                )
+            try:
+                readings = parse_readings(request.body, content_type)
+            except RequestDataTooBig:
+                return Response(
+                    {"error": "Request body too large, send smaller batches"}, 
+                    status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+                )
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            if len(readings) > settings.SENSOR_INGEST_MAX_READINGS:
+                return Response(
+                    {"error": f"Too many readings in batch (maximum {settings.SENSOR_INGEST_MAX_READINGS})"}, 
+                    status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+                )
+            
+            documents, errors = validate_readings(readings)
+            if not documents:
+                return Response(
+                    {"accepted": 0, "rejected": len(errors), "errors": errors[:100]}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            try:
+                store_readings(documents)
+            except Exception as e:
+                logger.error(f"Error saving sensor readings to MongoDB: {str(e)}")
+                return Response(
+                    {"error": "Sensor readings could not be stored"}, 
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
+            
+            # Decisions read the latest readings from memory; only stored readings count,
+            # since the client retries a batch that could not be stored
+            get_latest_readings().update(documents)
+            
+            return Response({
+                'accepted': len(documents),
+                'rejected': len(errors),
+                'errors': errors[:100]
+            }, status=status.HTTP_201_CREATED)
+            
+        except Exception as e:
+            logger.error(f"Error ingesting sensor readings: {str(e)}")
+            return Response(
+                {"error": "An unexpected error occurred", "details": str(e)}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
 class CropSoilDataView(APIView):
     """
     API view for retrieving crop and soil data
@@ -457,18 +803,20 @@ class CropSoilDataView(APIView):
     
     def get(self, request):
         try:
+            catalogue = get_catalogue()
+            
             # Format response
             crop_data = []
-            for crop_name, crop in CROPS.items():
+            for crop_name, crop in catalogue.crops.items():
                 crop_data.append({
                     'name': crop['name'],
-                    'ideal_moisture': crop['ideal_moisture'],
-                    'ideal_temp': crop['ideal_temp'],
+                    'ideal_moisture': list(crop['ideal_moisture']),
+                    'ideal_temp': list(crop['ideal_temp']),
                     'base_water_lph': crop['base_water_lph']
                 })
             
             soil_data = []
-            for soil_name, soil in SOILS.items():
+            for soil_name, soil in catalogue.soils.items():
                 soil_data.append({
                     'name': soil['name'],
                     'absorption_rate': soil['absorption_rate']
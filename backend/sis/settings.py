@@ -35,7 +35,11 @@ INSTALLED_APPS = [
     'sis.core',
 ]
 
+# Async decision and history views, enabled by the ASGI entry point (sis/asgi.py)
+ASYNC_VIEWS_ENABLED = os.environ.get('ASYNC_VIEWS_ENABLED', 'False') == 'True'
+
 MIDDLEWARE = [
+    'sis.core.middleware.RequestMetricsMiddleware',  # First, so it times the whole request
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Add whitenoise for static files
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -46,6 +50,10 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
+if ASYNC_VIEWS_ENABLED:
+    # WhiteNoise is sync-only and would push every request through a thread; under
+    # ASGI static files are served by the handler wrapped around the app in sis/asgi.py
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
 
 ROOT_URLCONF = 'sis.urls'
 
@@ -66,15 +74,29 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'sis.wsgi.application'
+ASGI_APPLICATION = 'sis.asgi.application'
 
 # MongoDB Database
-import mongoengine
+from sis.core.utils.mongo_connection import register_mongodb
 
 # Use irrigation_system as the database name
 MONGODB_URI = os.environ.get('MONGODB_URI', 'mongodb://localhost:27017/irrigation_system')
 
-# Connect to MongoDB using mongoengine
-mongoengine.connect(host=MONGODB_URI)
+# Client pool and timeouts; options set in MONGODB_URI take precedence. A short server
+# selection timeout makes requests fall back to in-memory data quickly when MongoDB is down.
+MONGODB_CONNECTION_OPTIONS = {
+    'maxPoolSize': int(os.environ.get('MONGODB_MAX_POOL_SIZE', '50')),
+    'minPoolSize': int(os.environ.get('MONGODB_MIN_POOL_SIZE', '0')),
+    'connectTimeoutMS': int(os.environ.get('MONGODB_CONNECT_TIMEOUT_MS', '5000')),
+    'serverSelectionTimeoutMS': int(os.environ.get('MONGODB_SERVER_SELECTION_TIMEOUT_MS', '5000')),
+    'socketTimeoutMS': int(os.environ.get('MONGODB_SOCKET_TIMEOUT_MS', '0')) or None,  # 0: no timeout
+}
+
+# Driver of the async views: 'motor', or 'thread' to run pymongo calls in worker threads
+MONGODB_ASYNC_DRIVER = os.environ.get('MONGODB_ASYNC_DRIVER', 'motor')
+
+# Register the connection; each process connects on its first query (and again after a fork)
+register_mongodb(MONGODB_URI, MONGODB_CONNECTION_OPTIONS)
 
 
 # Default Django database (required for admin, auth, etc.)
@@ -141,6 +163,11 @@ CORS_ALLOWED_ORIGINS = [
 # For initial deployment and testing, we'll use more permissive settings
 # In production, you should enable proper authentication
 REST_FRAMEWORK = {
+    # orjson-backed JSON renderer (falls back to the standard renderer without orjson)
+    'DEFAULT_RENDERER_CLASSES': [
+        'sis.core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
     ],
@@ -153,3 +180,97 @@ REST_FRAMEWORK = {
 
 # OpenWeatherMap API key
 OPENWEATHERMAP_API_KEY = os.environ.get('OPENWEATHERMAP_API_KEY', '')
+OPENWEATHERMAP_BASE_URL = os.environ.get('OPENWEATHERMAP_BASE_URL', 'https://api.openweathermap.org/data/2.5')
+
+# Weather HTTP client: pooled keep-alive connections, bounded retries and a circuit breaker
+WEATHER_HTTP_TIMEOUT = float(os.environ.get('WEATHER_HTTP_TIMEOUT', '10'))  # seconds
+WEATHER_HTTP_POOL_SIZE = int(os.environ.get('WEATHER_HTTP_POOL_SIZE', '20'))
+WEATHER_HTTP_RETRIES = int(os.environ.get('WEATHER_HTTP_RETRIES', '2'))
+WEATHER_HTTP_BACKOFF = float(os.environ.get('WEATHER_HTTP_BACKOFF', '0.5'))  # seconds
+WEATHER_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('WEATHER_CIRCUIT_FAILURE_THRESHOLD', '5'))
+WEATHER_CIRCUIT_RESET_TIMEOUT = float(os.environ.get('WEATHER_CIRCUIT_RESET_TIMEOUT', '30'))  # seconds
+
+# Caches
+# Set REDIS_URL (requires the redis package) to share cached data between gunicorn workers
+REDIS_URL = os.environ.get('REDIS_URL', '')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+if REDIS_URL:
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+
+# Weather cache, keyed by latitude/longitude rounded to a grid cell
+WEATHER_CACHE_ENABLED = os.environ.get('WEATHER_CACHE_ENABLED', 'True') == 'True'
+WEATHER_CACHE_GRID_DEGREES = float(os.environ.get('WEATHER_CACHE_GRID_DEGREES', '0.01'))  # ~1.1 km
+WEATHER_CACHE_TTL = int(os.environ.get('WEATHER_CACHE_TTL', '600'))  # seconds
+WEATHER_CACHE_MAX_ENTRIES = int(os.environ.get('WEATHER_CACHE_MAX_ENTRIES', '4096'))
+WEATHER_CACHE_SHARED_ALIAS = 'shared' if REDIS_URL else ''
+
+# Decision engine (rule set) used by the API and recompute_decisions, recorded with every
+# logged decision: 'proportional-1' or 'simplified-1' (see core/utils/decision_engine.py)
+DECISION_ENGINE_VERSION = os.environ.get('DECISION_ENGINE_VERSION', 'proportional-1')
+
+# Memoization of irrigation decisions on inputs rounded to 0.1 (opt-in: decisions are then
+# computed from the rounded readings)
+DECISION_CACHE_ENABLED = os.environ.get('DECISION_CACHE_ENABLED', 'False') == 'True'
+DECISION_CACHE_MAX_ENTRIES = int(os.environ.get('DECISION_CACHE_MAX_ENTRIES', '65536'))
+
+# Seconds between checks of the crop/soil catalogue version stamp
+CATALOGUE_REFRESH_INTERVAL = float(os.environ.get('CATALOGUE_REFRESH_INTERVAL', '60'))
+
+# Maximum number of fields accepted by the batch irrigation decision endpoint
+IRRIGATION_BATCH_MAX_FIELDS = int(os.environ.get('IRRIGATION_BATCH_MAX_FIELDS', '10000'))
+
+# Number of rows fetched from MongoDB (and written per chunk) when streaming the CSV export
+EXPORT_CSV_BATCH_SIZE = int(os.environ.get('EXPORT_CSV_BATCH_SIZE', '1000'))
+
+# Maximum page size of the irrigation history endpoint
+HISTORY_MAX_PAGE_SIZE = int(os.environ.get('HISTORY_MAX_PAGE_SIZE', '500'))
+
+# Largest radius accepted by the nearby irrigation endpoint, in meters
+NEARBY_MAX_RADIUS_METERS = float(os.environ.get('NEARBY_MAX_RADIUS_METERS', '50000'))
+
+# Recent logs kept in memory per worker for when MongoDB is unavailable
+HISTORY_BUFFER_SIZE = int(os.environ.get('HISTORY_BUFFER_SIZE', '10000'))
+
+# Sensor ingestion: maximum readings per request, and the age after which a field's
+# latest reading is too old to base a decision on (probes report every 30 seconds)
+SENSOR_INGEST_MAX_READINGS = int(os.environ.get('SENSOR_INGEST_MAX_READINGS', '50000'))
+SENSOR_READING_MAX_AGE = int(os.environ.get('SENSOR_READING_MAX_AGE', '300'))  # seconds
+SENSOR_READINGS_SHARED_ALIAS = 'shared' if REDIS_URL else ''
+
+# Irrigation scheduler: forecasts are fetched once per grid cell (~11 km, the forecast
+# resolution is coarse), and fields are planned in batches of this many
+SCHEDULER_FORECAST_GRID_DEGREES = float(os.environ.get('SCHEDULER_FORECAST_GRID_DEGREES', '0.1'))
+SCHEDULER_HORIZON_HOURS = int(os.environ.get('SCHEDULER_HORIZON_HOURS', '48'))
+SCHEDULER_BATCH_SIZE = int(os.environ.get('SCHEDULER_BATCH_SIZE', '10000'))
+
+# Irrigation log storage: 'standard' (irrigation_logs collection) or 'timeseries'
+# (MongoDB 5.0+ time-series collection, see the migrate_logs_to_timeseries command)
+IRRIGATION_LOG_STORAGE = os.environ.get('IRRIGATION_LOG_STORAGE', 'standard')
+IRRIGATION_TIMESERIES_COLLECTION = os.environ.get('IRRIGATION_TIMESERIES_COLLECTION', 'irrigation_readings')
+# Bucket granularity matching how often a field reports: 'seconds', 'minutes' or 'hours'
+IRRIGATION_TIMESERIES_GRANULARITY = os.environ.get('IRRIGATION_TIMESERIES_GRANULARITY', 'minutes')
+
+# Write-behind persistence of irrigation logs: decisions return immediately and logs are
+# flushed to MongoDB in batches; logs that cannot be written are spilled to a local file
+# and replayed when the writer starts
+LOG_WRITE_BEHIND_ENABLED = os.environ.get('LOG_WRITE_BEHIND_ENABLED', 'True') == 'True'
+LOG_WRITE_BATCH_SIZE = int(os.environ.get('LOG_WRITE_BATCH_SIZE', '500'))
+LOG_WRITE_FLUSH_INTERVAL = float(os.environ.get('LOG_WRITE_FLUSH_INTERVAL', '1.0'))  # seconds
+LOG_WRITE_QUEUE_SIZE = int(os.environ.get('LOG_WRITE_QUEUE_SIZE', '10000'))
+LOG_WRITE_ENQUEUE_TIMEOUT = float(os.environ.get('LOG_WRITE_ENQUEUE_TIMEOUT', '0.5'))  # seconds
+LOG_WRITE_SPILL_PATH = os.environ.get('LOG_WRITE_SPILL_PATH', os.path.join(BASE_DIR, 'var', 'irrigation_logs.spill.jsonl'))
+
+# Request metrics in the Prometheus text format on /metrics, and Server-Timing response
+# headers with the duration of every request
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True') == 'True'
+# Directory where every server process writes its metrics, so /metrics reports the sum over
+# all workers (empty: each worker reports only its own). Empty it when the server restarts
+METRICS_MULTIPROCESS_DIR = os.environ.get('METRICS_MULTIPROCESS_DIR', '')
+METRICS_SNAPSHOT_INTERVAL = float(os.environ.get('METRICS_SNAPSHOT_INTERVAL', '1.0'))  # seconds
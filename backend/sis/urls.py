@@ -4,9 +4,12 @@ URL Configuration for Smart Irrigation System
 from django.contrib import admin
 from django.urls import path, include
 from django.contrib.auth import views as auth_views
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 
+from sis.core.utils.metrics import render_metrics
+
 def api_root(request):
     """
     Root view that provides information about available API endpoints
@@ -16,16 +19,31 @@ def api_root(request):
         'version': '1.0',
         'endpoints': {
             'irrigation_decision': '/api/irrigation/decision/',
+            'irrigation_decision_batch': '/api/irrigation/decisions/batch/',
             'irrigation_history': '/api/irrigation/history/',
             'export_history_csv': '/api/irrigation/export-csv/',
+            'irrigation_stats': '/api/irrigation/stats/',
+            'irrigation_nearby': '/api/irrigation/nearby/',
+            'sensor_readings': '/api/sensors/readings/',
             'crop_soil_data': '/api/crops/',
+            'metrics': '/metrics',
         },
         'documentation': 'See README.md for more details'
     }
     return JsonResponse(api_info)
 
+def metrics(request):
+    """
+    Metrics in the Prometheus text format, of all server processes when they share
+    METRICS_MULTIPROCESS_DIR and otherwise of the worker process that answers
+    """
+    if not settings.METRICS_ENABLED:
+        raise Http404()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 urlpatterns = [
     path('', api_root, name='api_root'),  # Root URL now shows API information
+    path('metrics', metrics, name='metrics'),
     path('admin/', admin.site.urls),
     path('api/', include('sis.core.urls')),
     path('api-auth/', include('rest_framework.urls')),
@@ -9,3 +9,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sis.settings')
 
 application = get_wsgi_application()
+
+# Start the irrigation log writer in each server process so spilled logs are replayed on startup
+from sis.core.utils.write_behind import start_log_writer  # noqa: E402
+
+start_log_writer()